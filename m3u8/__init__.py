@@ -1,8 +1,28 @@
 from .playlist import Playlist, MediaPlaylist, MasterPlaylist
+from .cache import PlaylistCache
+from .client import PlaylistClient
+from .diff import diff
+from .fetch import HedgedFetcher
+from .monitor import ChannelMonitor
+from .origin import Origin
+from .parser import Limits, register_tag, unregister_tag
+from .recorder import ChannelRecorder
+from .trickplay import TrickPlayIndex
 
 
 __all__ = [
     Playlist,
     MediaPlaylist,
     MasterPlaylist,
+    PlaylistCache,
+    PlaylistClient,
+    diff,
+    HedgedFetcher,
+    ChannelMonitor,
+    Origin,
+    Limits,
+    ChannelRecorder,
+    TrickPlayIndex,
+    register_tag,
+    unregister_tag,
 ]
@@ -0,0 +1,218 @@
+"""Alignment of equivalent segments across the media playlists of a master
+playlist
+"""
+from enum import Enum
+from typing import Callable, Dict, Iterator, List, Optional
+
+from . import component
+from .playlist import MasterPlaylist, MediaPlaylist
+
+
+class AlignBy(Enum):
+    MEDIA_SEQUENCE = 'MEDIA-SEQUENCE'
+    PROGRAM_DATE_TIME = 'PROGRAM-DATE-TIME'
+
+
+class Misalignment(object):
+    """A discontinuity before segment ``sequence`` of ``name`` that has no
+    counterpart before the equivalent segment of ``other``, or one with a
+    different discontinuity sequence number
+
+    ``other_sequence`` is ``None`` if ``other`` covers the same time but has
+    no segment starting at it.
+    """
+
+    def __init__(self, name: str, sequence: int, other: str,
+                 other_sequence: Optional[int]):
+        self.name = name
+        self.sequence = sequence
+        self.other = other
+        self.other_sequence = other_sequence
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is type(self):
+            return self.__dict__ == other.__dict__
+        return False
+
+    def __repr__(self) -> str:
+        return (f'Misalignment({self.name}:{self.sequence}, '
+                f'{self.other}:{self.other_sequence})')
+
+
+class _Track(object):
+    """Segment start times and discontinuities of one playlist, by media
+    sequence number
+    """
+
+    def __init__(self):
+        self.playlist: Optional[MediaPlaylist] = None
+        self.first = 0
+        self.times: Dict[int, Optional[float]] = {}
+        self.buckets: Dict[int, int] = {}
+        self.discontinuities: Dict[int, int] = {}
+        self.discontinuity = 0
+        self.end_time: Optional[float] = None
+
+    @property
+    def next(self) -> int:
+        return self.first + len(self.times)
+
+    def start_time(self) -> Optional[float]:
+        for t in self.times.values():
+            if t is not None:
+                return t
+        return None
+
+
+class AlignmentIndex(object):
+    """Equivalent segments across media playlists
+
+    Playlists are added under a name, e.g. their URI, and replaced by
+    ``update`` when they are reloaded. Only segments added to or removed
+    from the window since the previous version are indexed, so a reload
+    costs time proportional to the change. Segments already indexed are
+    taken as unchanged, a playlist that was rewritten has to be removed
+    first.
+
+    With ``AlignBy.MEDIA_SEQUENCE`` the equivalent of a segment is the one
+    with the same media sequence number. With
+    ``AlignBy.PROGRAM_DATE_TIME`` it is the one starting at the same wall
+    clock time, give or take ``tolerance`` seconds, found through a hash
+    of start times rounded to ``tolerance``. Both lookups take O(1).
+    """
+
+    def __init__(self, by: AlignBy = AlignBy.MEDIA_SEQUENCE,
+                 tolerance: float = 0.1):
+        if tolerance <= 0:
+            raise ValueError('tolerance must be positive')
+        self.by = by
+        self.tolerance = tolerance
+        self._tracks: Dict[str, _Track] = {}
+
+    @classmethod
+    def from_master(cls, master: MasterPlaylist,
+                    load: Optional[Callable[[str], MediaPlaylist]] = None,
+                    **kwargs) -> 'AlignmentIndex':
+        """Index the media playlists of the variant streams and renditions
+        of ``master``, loaded with ``load(uri)`` from their resolved URIs
+        """
+        if load is None:
+            load = MediaPlaylist.from_url
+        index = cls(**kwargs)
+        uris = [v.uri for v in master.variant_streams]
+        uris.extend(m.uri for g in master.rendition_groups
+                    for m in g.renditions if m.uri is not None)
+        for uri in dict.fromkeys(uris):
+            uri = master.resolve(uri)
+            index.update(uri, load(uri))
+        return index
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._tracks)
+
+    def playlist(self, name: str) -> MediaPlaylist:
+        return self._tracks[name].playlist
+
+    def remove(self, name: str):
+        del self._tracks[name]
+
+    def _bucket(self, t: float) -> int:
+        return int(round(t / self.tolerance))
+
+    def _pop(self, track: _Track):
+        msn = track.first
+        t = track.times.pop(msn)
+        if t is not None:
+            bucket = self._bucket(t)
+            if track.buckets.get(bucket, None) == msn:
+                del track.buckets[bucket]
+        track.discontinuities.pop(msn, None)
+        track.first += 1
+
+    def _push(self, track: _Track, segment: component.MediaSegment):
+        msn = track.next
+        t = track.end_time
+        if segment.program_date_time is not None:
+            t = segment.program_date_time.date_time.timestamp()
+        if segment.discontinuity is not None:
+            track.discontinuity += 1
+            track.discontinuities[msn] = track.discontinuity
+        track.times[msn] = t
+        if t is not None:
+            track.buckets[self._bucket(t)] = msn
+            track.end_time = t + segment.info.duration
+
+    def update(self, name: str, playlist: MediaPlaylist):
+        """Add ``playlist`` or replace the previous version of it
+        """
+        track = self._tracks.get(name, None)
+        first = playlist.first_sequence_number
+        if track is None or track.playlist is None or \
+                not track.first <= first <= track.next:
+            track = self._tracks[name] = _Track()
+            track.first = first
+            if playlist.discontinuity_sequence is not None:
+                track.discontinuity = playlist.discontinuity_sequence.number
+            start = first
+        else:
+            while track.first < first:
+                self._pop(track)
+            start = track.next
+        track.playlist = playlist
+        segments = playlist.media_segments
+        for i in range(start - first, len(segments)):
+            self._push(track, segments[i])
+
+    def _find(self, track: _Track, msn: int,
+              other: _Track) -> Optional[int]:
+        if self.by == AlignBy.MEDIA_SEQUENCE:
+            return msn if other.first <= msn < other.next else None
+        if not track.first <= msn < track.next:
+            return None
+        t = track.times[msn]
+        if t is None:
+            return None
+        bucket = self._bucket(t)
+        for b in (bucket, bucket - 1, bucket + 1):
+            m = other.buckets.get(b, None)
+            if m is not None and \
+                    abs(other.times[m] - t) <= self.tolerance:
+                return m
+        return None
+
+    def find(self, name: str, msn: int, other: str) -> Optional[int]:
+        """Media sequence number in ``other`` of the equivalent of segment
+        ``msn`` of ``name``
+        """
+        return self._find(self._tracks[name], msn, self._tracks[other])
+
+    def equivalent_segment(self, name: str, msn: int, other: str
+                           ) -> Optional[component.MediaSegment]:
+        m = self.find(name, msn, other)
+        if m is None:
+            return None
+        return self._tracks[other].playlist.get_segment(m)
+
+    def _covers(self, track: _Track, msn: int, other: _Track) -> bool:
+        if self.by == AlignBy.MEDIA_SEQUENCE:
+            return other.first <= msn < other.next
+        t = track.times[msn]
+        start = other.start_time()
+        return t is not None and start is not None and \
+            start <= t < other.end_time
+
+    def misaligned_discontinuities(self) -> Iterator[Misalignment]:
+        """Discontinuities without a counterpart in the playlists that
+        cover their position
+        """
+        for name, track in self._tracks.items():
+            for msn in sorted(track.discontinuities):
+                for other_name, other in self._tracks.items():
+                    if other is track or \
+                            not self._covers(track, msn, other):
+                        continue
+                    m = self._find(track, msn, other)
+                    if m is None or other.discontinuities.get(m, None) != \
+                            track.discontinuities[msn]:
+                        yield Misalignment(name, msn, other_name, m)
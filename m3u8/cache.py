@@ -0,0 +1,114 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Type, TypeVar, Union
+
+from . import playlist as _playlist
+
+
+P = TypeVar('P', bound='_playlist.Playlist')
+
+
+def content_hash(b: bytes) -> str:
+    return hashlib.blake2b(b, digest_size=16).hexdigest()
+
+
+class PlaylistCache(object):
+    """Parsed playlist cache keyed by content hash
+
+    Playlists are kept in memory with LRU eviction once ``max_entries`` is
+    exceeded. If ``directory`` is given, parsed playlists are also stored
+    there, so other processes and restarted workers can load them without
+    re-parsing. Cached playlists are shared, callers must not mutate them.
+    """
+
+    suffix = '.snap'
+
+    def __init__(self, max_entries: int = 1024,
+                 directory: Optional[Union[str, os.PathLike]] = None):
+        if max_entries <= 0:
+            raise ValueError('max_entries must be positive')
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[str, _playlist.Playlist]' = OrderedDict()
+        self._lock = threading.Lock()
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _get(self, key: str) -> Optional['_playlist.Playlist']:
+        with self._lock:
+            p = self._entries.get(key, None)
+            if p is not None:
+                self._entries.move_to_end(key)
+            return p
+
+    def _put(self, key: str, p: '_playlist.Playlist'):
+        with self._lock:
+            self._entries[key] = p
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key: str) -> Optional['_playlist.Playlist']:
+        if self.directory is None:
+            return None
+        # Read rather than mapped, an mmap per entry would keep a file
+        # descriptor open for as long as the entry is cached
+        try:
+            with open(self._path(key), 'rb') as f:
+                return _playlist.Playlist.from_snapshot(f.read())
+        except (OSError, ValueError, _playlist.PlaylistError):
+            return None
+
+    def _store(self, key: str, p: '_playlist.Playlist'):
+        if self.directory is None:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(p.to_snapshot())
+            os.replace(tmp, self._path(key))
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def get(self, b: bytes, cls: Type[P] = None,
+            compression: Optional[str] = None) -> P:
+        """Return the parsed playlist of UTF-8 content ``b``, compressed
+        with the declared ``compression`` or gzip
+        """
+        cls = cls or _playlist.Playlist
+        key = content_hash(b)
+        p = self._get(key)
+        if p is None:
+            p = self._load(key)
+            if p is None:
+                self.misses += 1
+                p = _playlist.Playlist._from_bytes(
+                    b, compression=compression)
+                self._store(key, p)
+            else:
+                self.hits += 1
+            self._put(key, p)
+        else:
+            self.hits += 1
+        return cls._check_type(p)
@@ -0,0 +1,239 @@
+import argparse
+import glob
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from . import constant
+from .diff import diff
+from .error import ParseError
+from .playlist import MediaPlaylist, Playlist, PlaylistError
+
+
+STDIN = '-'
+
+
+def _read(path: str) -> bytes:
+    if path == STDIN:
+        return sys.stdin.buffer.read()
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _load(path: str, errors: Optional[List[ParseError]] = None) -> Playlist:
+    return Playlist.from_bytes(_read(path), errors=errors)
+
+
+def _stats(path: str) -> Dict[str, Any]:
+    p = _load(path)
+    if isinstance(p, MediaPlaylist):
+        return {
+            'type': constant.PlaylistType.MEDIA.value,
+            'segments': len(p.media_segments),
+            'duration': round(p.timeline.duration, 6),
+            'target_duration': None if p.target_duration is None
+            else p.target_duration.duration,
+            'media_sequence': p.first_sequence_number,
+            'discontinuities': len(p.timeline.discontinuities),
+            'end_list': p.end_list is not None,
+        }
+    return {
+        'type': constant.PlaylistType.MASTER.value,
+        'variants': [{
+            'bandwidth': v.info.bandwidth,
+            'average_bandwidth': v.info.average_bandwidth,
+            'resolution': None if v.info.resolution is None else
+            f'{v.info.resolution.width}x{v.info.resolution.height}',
+            'codecs': v.info.codecs,
+            'uri': v.uri,
+        } for v in p.variant_index.variants],
+        'i_frame_streams': len(p.i_frame_stream_infs),
+        'renditions': sum(len(g.renditions) for g in p.rendition_groups),
+    }
+
+
+def _validate(path: str) -> Dict[str, Any]:
+    errors: List[ParseError] = []
+    violations: List[str] = []
+    try:
+        p = _load(path, errors=errors)
+    except ParseError as e:
+        errors.append(e)
+    else:
+        violations = [str(v) for v in p.validate()]
+    return {
+        'valid': not errors and not violations,
+        'errors': [str(e) for e in errors],
+        'violations': violations,
+    }
+
+
+def _to_json(path: str) -> Dict[str, Any]:
+    return {'playlist': _load(path).to_dict()}
+
+
+def _bench(path: str, repeat: int = 5) -> Dict[str, Any]:
+    b = _read(path)
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        Playlist.from_bytes(b)
+        best = min(best, time.perf_counter() - t)
+    return {
+        'bytes': len(b),
+        'seconds': round(best, 6),
+        'mb_per_s': round(len(b) / best / 1e6, 3) if best else None,
+    }
+
+
+_COMMANDS: Dict[str, Callable[[str], Dict[str, Any]]] = {
+    'stats': _stats,
+    'validate': _validate,
+    'to-json': _to_json,
+    'bench': _bench,
+}
+
+
+def _unexpected(e: Exception) -> str:
+    return f'{type(e).__name__}: {e}'
+
+
+def _run(command: str, path: str) -> Dict[str, Any]:
+    try:
+        result = _COMMANDS[command](path)
+    except (OSError, ParseError, PlaylistError) as e:
+        return {'path': path, 'error': str(e)}
+    except Exception as e:
+        # A bug triggered by one file must not end a bulk run
+        return {'path': path, 'error': _unexpected(e)}
+    return {'path': path, **result}
+
+
+def _run_chunk(command: str, paths: List[str]) -> List[Dict[str, Any]]:
+    return [_run(command, p) for p in paths]
+
+
+def expand_paths(patterns: Iterable[str]) -> Iterator[str]:
+    """Expand glob patterns, ``-`` stands for standard input
+
+    Patterns without matches are passed through so their errors get
+    reported.
+    """
+    for pattern in patterns:
+        if pattern == STDIN or not any(c in pattern for c in '*?['):
+            yield pattern
+            continue
+        yield from sorted(glob.iglob(pattern, recursive=True))
+
+
+def _read_lines(file: str) -> Iterator[str]:
+    if file == STDIN:
+        lines = (line.strip() for line in sys.stdin)
+        yield from (line for line in lines if line)
+        return
+    with open(file, 'r', encoding='utf-8') as f:
+        lines = (line.strip() for line in f)
+        yield from (line for line in lines if line)
+
+
+def _chunks(paths: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(command: str, paths: Iterable[str], jobs: int = 1,
+        chunk_size: int = 64) -> Iterator[Dict[str, Any]]:
+    """Run ``command`` on each path and yield results in input order
+
+    With ``jobs`` above one, paths are sent in chunks to a process pool so
+    the per-task overhead is paid once per chunk.
+    """
+    if jobs <= 1:
+        for path in paths:
+            yield _run(command, path)
+        return
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Keep a bounded number of chunks in flight
+        pending = []
+        for chunk in _chunks(paths, chunk_size):
+            pending.append(executor.submit(_run_chunk, command, chunk))
+            if len(pending) >= jobs * 2:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def _write(result: Dict[str, Any]):
+    sys.stdout.write(json.dumps(result, separators=(',', ':')) + '\n')
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='m3u8', description='Inspect HLS playlists')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help in [
+            ('stats', 'segment count, duration and bitrate ladder'),
+            ('validate', 'report parse errors and spec violations'),
+            ('to-json', 'convert playlists to JSON'),
+            ('bench', 'measure parse time')]:
+        p = subparsers.add_parser(command, help=help)
+        p.add_argument('paths', nargs='*',
+                       help='files or glob patterns, - for standard input')
+        p.add_argument('--files-from', metavar='FILE',
+                       help='read paths from FILE, one per line, '
+                            '- for standard input')
+        p.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                       help='number of worker processes')
+    p = subparsers.add_parser('diff', help='changes between two playlists')
+    p.add_argument('old')
+    p.add_argument('new')
+    return parser
+
+
+def _diff(old: str, new: str) -> int:
+    try:
+        changes = diff(_load(old), _load(new))
+    except (OSError, ParseError, PlaylistError) as e:
+        _write({'error': str(e)})
+        return 1
+    except Exception as e:
+        _write({'error': _unexpected(e)})
+        return 1
+    for c in changes:
+        _write({'type': c.type.value, 'sequence': c.sequence,
+                'name': c.name})
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    if args.command == 'diff':
+        return _diff(args.old, args.new)
+
+    paths: Iterable[str] = expand_paths(args.paths)
+    stdin = STDIN in args.paths
+    if args.files_from is not None:
+        paths = itertools.chain(paths, _read_lines(args.files_from))
+    elif not args.paths:
+        paths = [STDIN]
+        stdin = True
+
+    # Standard input cannot be shared with worker processes
+    jobs = 1 if stdin else args.jobs
+    status = 0
+    for result in run(args.command, paths, jobs=jobs):
+        if 'error' in result or result.get('valid', True) is False:
+            status = 1
+        _write(result)
+    sys.stdout.flush()
+    return status
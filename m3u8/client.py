@@ -0,0 +1,106 @@
+from typing import Dict, Optional
+from urllib.parse import urlencode, urlsplit, urlunsplit
+
+import requests
+
+from . import constant
+from .playlist import MediaPlaylist, PlaylistError
+
+
+def add_query(url: str, params: Dict[str, str]) -> str:
+    """Append the delivery directives ``params`` to the query of ``url``,
+    replacing the ``_HLS_`` directives it already has
+
+    The rest of the query is kept as it is, signed or tokenized CDN URLs
+    would no longer validate if it were re-encoded.
+    """
+    if not params:
+        return url
+    parts = urlsplit(url)
+    query = [pair for pair in parts.query.split('&')
+             if pair and not pair.startswith('_HLS_')]
+    query.append(urlencode(sorted(params.items()), safe='/'))
+    return urlunsplit(parts._replace(query='&'.join(query)))
+
+
+class PlaylistClient(object):
+    """Reloads a Low-Latency HLS media playlist
+
+    Once the server advertises ``CAN-BLOCK-RELOAD``, every reload asks for
+    the next part (or segment) with ``_HLS_msn``/``_HLS_part`` and the server
+    holds the response until it is available. If the server also allows
+    skipping, delta updates are requested with ``_HLS_skip`` and merged
+    into the previous playlist.
+    """
+
+    def __init__(self, url: str,
+                 session: Optional[requests.Session] = None,
+                 delta: bool = True,
+                 **kwargs):
+        self.url = url
+        self.session = session or requests.Session()
+        self.delta = delta
+        self.kwargs = kwargs
+        self.playlist: Optional[MediaPlaylist] = None
+
+    def reload_params(self) -> Dict[str, str]:
+        p = self.playlist
+        if p is None or p.end_list is not None:
+            return {}
+        server_control = p.server_control
+        if server_control is None:
+            return {}
+        params: Dict[str, str] = {}
+        if server_control.can_block_reload == constant.Yes.YES:
+            params['_HLS_msn'] = str(p.next_sequence_number)
+            if p.part_inf is not None:
+                params['_HLS_part'] = str(len(p.pending_parts))
+        if self.delta and server_control.can_skip_until is not None:
+            if server_control.can_skip_date_ranges == constant.Yes.YES:
+                params['_HLS_skip'] = 'v2'
+            else:
+                params['_HLS_skip'] = 'YES'
+        return params
+
+    def reload_url(self) -> str:
+        return add_query(self.url, self.reload_params())
+
+    def _timeout(self) -> Optional[float]:
+        if 'timeout' in self.kwargs:
+            return self.kwargs['timeout']
+        p = self.playlist
+        if p is None or p.target_duration is None:
+            return None
+        # A blocked request may be held for up to three target durations
+        return 3 * p.target_duration.duration + 1
+
+    def _get(self, params: Dict[str, str]) -> MediaPlaylist:
+        kwargs = dict(self.kwargs)
+        kwargs['timeout'] = self._timeout()
+        res = self.session.get(add_query(self.url, params), **kwargs)
+        res.raise_for_status()
+        playlist = MediaPlaylist.from_bytes(res.content)
+        playlist.base_uri = res.url
+        return playlist
+
+    def reload(self) -> MediaPlaylist:
+        """Reload the playlist
+
+        A delta update that cannot be merged, e.g. because it skips
+        segments the previous playlist does not have, is replaced by a
+        full reload.
+        """
+        params = self.reload_params()
+        playlist = self._get(params)
+        if playlist.skip is not None:
+            try:
+                if self.playlist is None:
+                    raise PlaylistError('Unexpected delta update')
+                playlist = self.playlist.merge_delta(playlist)
+            except PlaylistError:
+                params.pop('_HLS_skip', None)
+                playlist = self._get(params)
+                if playlist.skip is not None:
+                    raise PlaylistError('Delta update without _HLS_skip')
+        self.playlist = playlist
+        return playlist
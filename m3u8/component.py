@@ -14,7 +14,10 @@ class MediaSegment(object):
                  key: Optional[tag.Key] = None,
                  map: Optional[tag.Map] = None,
                  program_date_time: Optional[tag.ProgramDateTime] = None,
-                 date_range: Optional[tag.DateRange] = None):
+                 date_range: Optional[tag.DateRange] = None,
+                 parts: Optional[List[tag.Part]] = None,
+                 custom_tags: Optional[List[tag.CustomTag]] = None,
+                 custom_tag_anchors: Optional[List[Optional[str]]] = None):
         self.info = info
         self.uri = uri
         self.byte_range = byte_range
@@ -23,6 +26,27 @@ class MediaSegment(object):
         self.map = map
         self.program_date_time = program_date_time
         self.date_range = date_range
+        self.parts: List[tag.Part] = parts or []
+        self.custom_tags: List[tag.CustomTag] = custom_tags or []
+        # Name of the tag each custom tag follows, ``None`` or missing for
+        # the start of the segment
+        self.custom_tag_anchors: List[Optional[str]] = \
+            custom_tag_anchors or []
+
+    def fingerprint(self) -> int:
+        return hash((
+            self.uri,
+            self.info,
+            self.byte_range,
+            self.discontinuity,
+            self.key,
+            self.map,
+            self.program_date_time,
+            self.date_range,
+            tuple(self.parts),
+            tuple(self.custom_tags),
+            tuple(self.custom_tag_anchors),
+        ))
 
 
 class RenditionGroup(object):
@@ -44,7 +68,8 @@ class VariantStream(object):
                  audio: Optional[RenditionGroup] = None,
                  video: Optional[RenditionGroup] = None,
                  subtitles: Optional[RenditionGroup] = None,
-                 closed_captions: Optional[RenditionGroup] = None):
+                 closed_captions: Optional[RenditionGroup] = None,
+                 custom_tags: Optional[List[tag.CustomTag]] = None):
 
         self.info = info
         self.uri = uri
@@ -52,3 +77,4 @@ class VariantStream(object):
         self.video = video
         self.subtitles = subtitles
         self.closed_captions = closed_captions
+        self.custom_tags: List[tag.CustomTag] = custom_tags or []
@@ -0,0 +1,193 @@
+"""Compressed playlist input and output
+
+gzip is always supported, brotli when the ``brotli`` package is installed.
+Data is processed in chunks, so a compressed playlist is decompressed
+straight into the parser without holding the whole text in memory.
+"""
+import codecs
+import os
+import zlib
+from typing import Iterable, Iterator, List, Optional, Union
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+GZIP = 'gzip'
+BROTLI = 'br'
+
+CHUNK_SIZE = 1 << 16
+
+_GZIP_MAGIC = b'\x1f\x8b'
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+_EXTENSIONS = {
+    '.gz': GZIP,
+    '.br': BROTLI,
+}
+
+_ENCODINGS = {
+    'gzip': GZIP,
+    'x-gzip': GZIP,
+    'br': BROTLI,
+}
+
+
+class CompressionError(Exception):
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _check(compression: str):
+    if compression == BROTLI:
+        if brotli is None:
+            raise CompressionError('Brotli requires the brotli package')
+    elif compression != GZIP:
+        raise CompressionError(f'Unknown compression {compression}')
+
+
+def detect(head: bytes, declared: Optional[str] = None) -> Optional[str]:
+    """Guess the compression of data starting with ``head``
+
+    Brotli has no magic number, so data is only taken as brotli if
+    ``declared``, the compression named by a Content-Encoding header or a
+    file extension, is brotli and it does not start like a playlist, as it
+    does once a client decoded it already.
+    """
+    if head[:2] == _GZIP_MAGIC:
+        return GZIP
+    if declared != BROTLI:
+        return None
+    text = bytes(head).lstrip(b'\xef\xbb\xbf \t\r\n')[:7]
+    if not text or b'#EXTM3U'.startswith(text):
+        return None
+    return BROTLI
+
+
+def from_extension(path: Union[str, bytes, os.PathLike]) -> Optional[str]:
+    ext = os.path.splitext(os.fsdecode(path))[1].lower()
+    return _EXTENSIONS.get(ext, None)
+
+
+def from_content_encoding(value: Optional[str]) -> Optional[str]:
+    """Compression of a body with Content-Encoding ``value``, the last of
+    the listed codings
+    """
+    if not value:
+        return None
+    coding = value.rsplit(',', 1)[-1].strip().lower()
+    return _ENCODINGS.get(coding, None)
+
+
+def _gunzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    d = zlib.decompressobj(_GZIP_WBITS)
+    pending = False
+    for chunk in chunks:
+        # Concatenated gzip members are decompressed one after another
+        while chunk:
+            pending = True
+            try:
+                yield d.decompress(chunk)
+            except zlib.error:
+                raise CompressionError('Invalid gzip data')
+            chunk = b''
+            if d.eof:
+                chunk, pending = d.unused_data, False
+                d = zlib.decompressobj(_GZIP_WBITS)
+    if pending:
+        raise CompressionError('Truncated gzip data')
+
+
+def _unbrotli(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    d = brotli.Decompressor()
+    for chunk in chunks:
+        try:
+            yield d.process(bytes(chunk))
+        except brotli.error:
+            raise CompressionError('Invalid brotli data')
+    if not d.is_finished():
+        raise CompressionError('Truncated brotli data')
+
+
+def decompress(chunks: Iterable[bytes],
+               compression: str) -> Iterator[bytes]:
+    _check(compression)
+    if compression == GZIP:
+        return _gunzip(chunks)
+    return _unbrotli(chunks)
+
+
+def _compress(chunks: Iterable[bytes], compression: str,
+              level: Optional[int]) -> Iterator[bytes]:
+    if compression == GZIP:
+        c = zlib.compressobj(
+            zlib.Z_DEFAULT_COMPRESSION if level is None else level,
+            zlib.DEFLATED, _GZIP_WBITS)
+        process, finish = c.compress, c.flush
+    else:
+        c = brotli.Compressor() if level is None else \
+            brotli.Compressor(quality=level)
+        process, finish = c.process, c.finish
+    for chunk in chunks:
+        b = process(chunk)
+        if b:
+            yield b
+    yield finish()
+
+
+def compress(chunks: Iterable[bytes], compression: str,
+             level: Optional[int] = None) -> Iterator[bytes]:
+    _check(compression)
+    return _compress(chunks, compression, level)
+
+
+def iter_lines(chunks: Iterable[bytes],
+               max_line_length: Optional[int] = None) -> Iterator[str]:
+    """Decode UTF-8 chunks into lines, line breaks are not kept
+
+    The start of a line longer than ``max_line_length`` is yielded as soon
+    as it exceeds the limit, so that the line is not buffered whole.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')('strict')
+    # Pieces of a line without a line break yet, joined once it has one
+    rest: List[str] = []
+    rest_length = 0
+    # A CR ending a chunk may be the first half of a CRLF
+    pending = ''
+    for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        pending = ''
+        if text.endswith('\r'):
+            text, pending = text[:-1], '\r'
+        lines = text.splitlines(True)
+        if not lines:
+            continue
+        last = None
+        if lines[-1].splitlines()[0] == lines[-1]:
+            last = lines.pop()
+        if lines and rest:
+            rest.append(lines[0])
+            lines[0] = ''.join(rest)
+            rest, rest_length = [], 0
+        for line in lines:
+            yield line.rstrip('\r\n')
+        if last is not None:
+            rest.append(last)
+            rest_length += len(last)
+            if max_line_length is not None and \
+                    rest_length > max_line_length:
+                yield ''.join(rest)
+                rest, rest_length = [], 0
+    rest.append(pending + decoder.decode(b'', final=True))
+    yield from ''.join(rest).splitlines()
+
+
+def iter_chunks(b: bytes,
+                chunk_size: int = CHUNK_SIZE) -> Iterator[memoryview]:
+    view = memoryview(b)
+    for i in range(0, len(view), chunk_size):
+        yield view[i:i + chunk_size]
@@ -33,6 +33,14 @@ EXT_X_SESSION_KEY = '#EXT-X-SESSION-KEY'
 EXT_X_INDEPENDENT_SEGMENTS = '#EXT-X-INDEPENDENT-SEGMENTS'
 EXT_X_START = '#EXT-X-START'
 
+# Low-Latency Media Playlist Tags
+EXT_X_SERVER_CONTROL = '#EXT-X-SERVER-CONTROL'
+EXT_X_PART_INF = '#EXT-X-PART-INF'
+EXT_X_PART = '#EXT-X-PART'
+EXT_X_PRELOAD_HINT = '#EXT-X-PRELOAD-HINT'
+EXT_X_RENDITION_REPORT = '#EXT-X-RENDITION-REPORT'
+EXT_X_SKIP = '#EXT-X-SKIP'
+
 
 class PlaylistType(Enum):
     MEDIA = 'MEDIA'
@@ -71,6 +79,11 @@ class Yes(Enum):
     YES = 'YES'
 
 
+class PreloadHintType(Enum):
+    PART = 'PART'
+    MAP = 'MAP'
+
+
 class HdcpLevel(Enum):
     TYPE_0 = 'TYPE-0'
     NONE = 'NONE'
@@ -90,3 +103,14 @@ class Resolution(object):
             raise ValueError('Invalid resolution')
         self.width = width
         self.height = height
+
+    def __str__(self) -> str:
+        return f'{self.width}x{self.height}'
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Resolution):
+            return (self.width, self.height) == (other.width, other.height)
+        return False
+
+    def __hash__(self) -> int:
+        return hash((self.width, self.height))
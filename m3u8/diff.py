@@ -0,0 +1,195 @@
+from enum import Enum
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional
+
+from .playlist import MasterPlaylist, MediaPlaylist, Playlist, PlaylistError
+
+
+class ChangeType(Enum):
+    ATTRIBUTE_CHANGED = 'ATTRIBUTE-CHANGED'
+    SEGMENT_ADDED = 'SEGMENT-ADDED'
+    SEGMENT_REMOVED = 'SEGMENT-REMOVED'
+    SEGMENT_CHANGED = 'SEGMENT-CHANGED'
+    KEY_ROTATED = 'KEY-ROTATED'
+    MAP_CHANGED = 'MAP-CHANGED'
+    DISCONTINUITY = 'DISCONTINUITY'
+    DATE_RANGE_ADDED = 'DATE-RANGE-ADDED'
+    DATE_RANGE_REMOVED = 'DATE-RANGE-REMOVED'
+    DATE_RANGE_CHANGED = 'DATE-RANGE-CHANGED'
+    VARIANT_ADDED = 'VARIANT-ADDED'
+    VARIANT_REMOVED = 'VARIANT-REMOVED'
+    VARIANT_CHANGED = 'VARIANT-CHANGED'
+    RENDITION_ADDED = 'RENDITION-ADDED'
+    RENDITION_REMOVED = 'RENDITION-REMOVED'
+    RENDITION_CHANGED = 'RENDITION-CHANGED'
+
+
+class Change(object):
+
+    def __init__(self,
+                 type: ChangeType,
+                 old: Any = None,
+                 new: Any = None,
+                 sequence: Optional[int] = None,
+                 name: Optional[str] = None):
+        self.type = type
+        self.old = old
+        self.new = new
+        self.sequence = sequence
+        self.name = name
+
+    def __repr__(self) -> str:
+        where = self.name if self.sequence is None else self.sequence
+        return f'Change({self.type.value}, {where})'
+
+
+class Diff(object):
+
+    def __init__(self, changes: Optional[List[Change]] = None):
+        self.changes = changes or []
+
+    def __iter__(self) -> Iterator[Change]:
+        return iter(self.changes)
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def __bool__(self) -> bool:
+        return bool(self.changes)
+
+    def of_type(self, type: ChangeType) -> List[Change]:
+        return [c for c in self.changes if c.type == type]
+
+
+_MEDIA_ATTRIBUTES = [
+    'version', 'target_duration', 'discontinuity_sequence', 'end_list',
+    'media_playlist_type', 'i_frames_only', 'independent_segments', 'start',
+    'server_control', 'part_inf', 'custom_tags', 'trailing_tags',
+]
+
+_MASTER_ATTRIBUTES = [
+    'version', 'independent_segments', 'start', 'custom_tags',
+    'trailing_tags',
+]
+
+
+def _equal(x: Any, y: Any) -> bool:
+    return x is y or x == y
+
+
+def _diff_attributes(old: Playlist, new: Playlist, names: List[str],
+                     changes: List[Change]):
+    for name in names:
+        a, b = getattr(old, name, None), getattr(new, name, None)
+        if not _equal(a, b):
+            changes.append(Change(ChangeType.ATTRIBUTE_CHANGED, a, b,
+                                  name=name))
+
+
+def _diff_keyed(old: List[Any], new: List[Any],
+                key: Callable[[Any], Hashable],
+                added: ChangeType, removed: ChangeType, changed: ChangeType,
+                changes: List[Change],
+                equal: Callable[[Any, Any], bool] = _equal):
+    old_map: Dict[Hashable, Any] = {key(x): x for x in old}
+    new_map: Dict[Hashable, Any] = {key(x): x for x in new}
+    for k, x in old_map.items():
+        y = new_map.get(k, None)
+        if y is None:
+            changes.append(Change(removed, x, None, name=k))
+        elif not equal(x, y):
+            changes.append(Change(changed, x, y, name=k))
+    for k, y in new_map.items():
+        if k not in old_map:
+            changes.append(Change(added, None, y, name=k))
+
+
+def _diff_media(old: MediaPlaylist, new: MediaPlaylist,
+                changes: List[Change]):
+    _diff_attributes(old, new, _MEDIA_ATTRIBUTES, changes)
+
+    old_segments, new_segments = old.media_segments, new.media_segments
+    o0, n0 = old.first_sequence_number, new.first_sequence_number
+    o1, n1 = o0 + len(old_segments), n0 + len(new_segments)
+
+    for msn in range(o0, min(n0, o1)):
+        changes.append(Change(ChangeType.SEGMENT_REMOVED,
+                              old_segments[msn - o0], None, sequence=msn))
+
+    # Overlapping segments are compared as fingerprint arrays first, so
+    # unchanged reloads cost a single memcmp-like comparison
+    start, stop = max(o0, n0), min(o1, n1)
+    if start < stop:
+        old_fp, new_fp = old.fingerprints, new.fingerprints
+        a = old_fp[start - o0:stop - o0]
+        b = new_fp[start - n0:stop - n0]
+        if a != b:
+            for i in range(stop - start):
+                if a[i] != b[i]:
+                    msn = start + i
+                    changes.append(Change(
+                        ChangeType.SEGMENT_CHANGED, old_segments[msn - o0],
+                        new_segments[msn - n0], sequence=msn))
+
+    for msn in range(max(o1, n0), n1):
+        segment = new_segments[msn - n0]
+        changes.append(Change(ChangeType.SEGMENT_ADDED, None, segment,
+                              sequence=msn))
+        if msn > n0:
+            previous = new_segments[msn - n0 - 1]
+        elif o0 <= msn - 1 < o1:
+            previous = old_segments[msn - 1 - o0]
+        else:
+            previous = None
+        if segment.discontinuity is not None:
+            changes.append(Change(ChangeType.DISCONTINUITY, None, segment,
+                                  sequence=msn))
+        if previous is not None:
+            if not _equal(segment.key, previous.key):
+                changes.append(Change(ChangeType.KEY_ROTATED, previous.key,
+                                      segment.key, sequence=msn))
+            if not _equal(segment.map, previous.map):
+                changes.append(Change(ChangeType.MAP_CHANGED, previous.map,
+                                      segment.map, sequence=msn))
+
+    for msn in range(max(n1, o0), o1):
+        changes.append(Change(ChangeType.SEGMENT_REMOVED,
+                              old_segments[msn - o0], None, sequence=msn))
+
+    _diff_keyed(old.timeline.date_ranges, new.timeline.date_ranges,
+                lambda d: d.id,
+                ChangeType.DATE_RANGE_ADDED, ChangeType.DATE_RANGE_REMOVED,
+                ChangeType.DATE_RANGE_CHANGED, changes)
+
+
+def _diff_master(old: MasterPlaylist, new: MasterPlaylist,
+                 changes: List[Change]):
+    _diff_attributes(old, new, _MASTER_ATTRIBUTES, changes)
+    _diff_keyed(old.variant_streams, new.variant_streams,
+                lambda v: v.uri, ChangeType.VARIANT_ADDED,
+                ChangeType.VARIANT_REMOVED, ChangeType.VARIANT_CHANGED,
+                changes, equal=lambda x, y: _equal(x.info, y.info))
+    _diff_keyed(old.i_frame_stream_infs, new.i_frame_stream_infs,
+                lambda i: i.uri, ChangeType.VARIANT_ADDED,
+                ChangeType.VARIANT_REMOVED, ChangeType.VARIANT_CHANGED,
+                changes)
+    old_renditions = [m for g in old.rendition_groups for m in g.renditions]
+    new_renditions = [m for g in new.rendition_groups for m in g.renditions]
+    _diff_keyed(old_renditions, new_renditions,
+                lambda m: (m.type.value, m.group_id, m.name),
+                ChangeType.RENDITION_ADDED, ChangeType.RENDITION_REMOVED,
+                ChangeType.RENDITION_CHANGED, changes)
+
+
+def diff(old: Playlist, new: Playlist) -> Diff:
+    """Structured changes from ``old`` to ``new``
+
+    Media segments are aligned by media sequence number.
+    """
+    changes: List[Change] = []
+    if isinstance(old, MediaPlaylist) and isinstance(new, MediaPlaylist):
+        _diff_media(old, new, changes)
+    elif isinstance(old, MasterPlaylist) and isinstance(new, MasterPlaylist):
+        _diff_master(old, new, changes)
+    else:
+        raise PlaylistError('Cannot diff playlists of different types')
+    return Diff(changes)
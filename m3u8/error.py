@@ -1,5 +1,24 @@
+from typing import Optional
+
+
 class ParseError(Exception):
 
-    def __init__(self, message):
+    def __init__(self, message, line_number: Optional[int] = None,
+                 line: Optional[str] = None):
         self.message = message
+        self.line_number = line_number
+        self.line = line
         super().__init__(self.message)
+
+    def __str__(self) -> str:
+        if self.line_number is None:
+            return self.message
+        if self.line is None:
+            return f'{self.message} (line {self.line_number})'
+        return f'{self.message} (line {self.line_number}: {self.line!r})'
+
+
+class LimitError(ParseError):
+    """Input exceeds a ``parser.Limits`` limit, parsing stops even when
+    errors are collected
+    """
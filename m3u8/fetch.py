@@ -0,0 +1,140 @@
+"""Hedged and failover fetches across redundant URIs
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED, Future, ThreadPoolExecutor, wait)
+from typing import Deque, List, Optional, Sequence, Set, Tuple, Type, TypeVar
+
+import requests
+
+from .playlist import Playlist
+
+
+P = TypeVar('P', bound=Playlist)
+
+
+class FetchError(Exception):
+
+    def __init__(self, message, errors: Optional[List[Exception]] = None):
+        self.message = message
+        self.errors = errors or []
+        super().__init__(self.message)
+
+
+class HedgedFetcher(object):
+    """Fetches a resource from a list of redundant URIs
+
+    The first URI is requested first. If it has not answered once the
+    ``percentile`` of recent response times has passed, the next URI is
+    requested as well and the first successful response wins. Until
+    ``min_samples`` responses have been timed, ``default_delay`` is used
+    instead. Failed requests, including non-2xx responses, fail over to
+    the next URI at once.
+
+    Losing requests are not cancelled, they finish in the background and
+    their responses are dropped.
+    """
+
+    def __init__(self,
+                 session: Optional[requests.Session] = None,
+                 percentile: float = 95.0,
+                 window: int = 128,
+                 min_samples: int = 16,
+                 default_delay: float = 1.0,
+                 max_workers: int = 8,
+                 **kwargs):
+        if not 0 < percentile <= 100:
+            raise ValueError('percentile must be in (0, 100]')
+        self.session = session or requests.Session()
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.kwargs = kwargs
+        self.hedges = 0
+        self.failovers = 0
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for a request before sending a backup request
+        """
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.default_delay
+            latencies = sorted(self._latencies)
+        # Nearest rank
+        rank = -(-len(latencies) * self.percentile // 100)
+        return latencies[max(int(rank), 1) - 1]
+
+    def record(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _get(self, uri: str) -> Tuple[requests.Response, float]:
+        t = time.monotonic()
+        res = self.session.get(uri, **self.kwargs)
+        res.raise_for_status()
+        return res, time.monotonic() - t
+
+    def fetch(self, uris: Sequence[str]) -> requests.Response:
+        if not uris:
+            raise ValueError('No URI to fetch')
+        errors: List[Exception] = []
+        pending: Set[Future] = set()
+        n = 0
+        delay = self.hedge_delay()
+        deadline = 0.0
+
+        def launch():
+            nonlocal n, deadline
+            pending.add(self._executor.submit(self._get, uris[n]))
+            n += 1
+            deadline = time.monotonic() + delay
+
+        launch()
+        while pending:
+            timeout = None
+            if n < len(uris):
+                timeout = max(deadline - time.monotonic(), 0)
+            done, _ = wait(pending, timeout=timeout,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                self.hedges += 1
+                launch()
+                continue
+            for f in done:
+                pending.discard(f)
+                try:
+                    res, latency = f.result()
+                except requests.RequestException as e:
+                    errors.append(e)
+                    continue
+                self.record(latency)
+                return res
+            if n < len(uris):
+                self.failovers += 1
+                launch()
+        raise FetchError(
+            f'All {len(uris)} URIs failed: {errors[-1]}', errors)
+
+    def fetch_playlist(self, uris: Sequence[str],
+                       cls: Type[P] = Playlist) -> P:
+        """Fetch and parse a playlist, ``base_uri`` is set to the URL that
+        answered
+        """
+        res = self.fetch(uris)
+        p = cls.from_bytes(res.content)
+        p.base_uri = res.url
+        return p
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self) -> 'HedgedFetcher':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,349 @@
+"""JSON export and import of playlists
+
+Each class is described by a ``Schema`` of field converters derived once
+from its ``__init__`` annotations, so converting a playlist runs a flat
+loop per object instead of inspecting types value by value. Tags shared by
+several segments, e.g. keys and the interned EXTINF of a constant segment
+duration, are converted once.
+
+The column-oriented layout replaces ``media_segments`` with
+``media_segment_columns``: parallel ``duration``, ``title`` and ``uri``
+arrays, run-length encoded ``key``, ``map`` and ``date_range`` and sparse
+``index``/``values`` pairs for the remaining segment fields.
+"""
+import inspect
+import itertools
+import json
+import typing
+from collections.abc import Sequence
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from dateutil.parser import isoparse as iso8601_parse
+
+from . import component
+from . import constant
+from . import tag
+from .parser import Parser
+
+
+Encoder = Callable[[Any, Dict[Any, Any]], Any]
+Decoder = Callable[[Any, Dict[Any, Any]], Any]
+
+SEGMENTS = 'media_segments'
+SEGMENT_COLUMNS = 'media_segment_columns'
+
+_RUN_FIELDS = ('key', 'map', 'date_range')
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'))
+
+
+def _identity(v: Any, memo: Dict[Any, Any]) -> Any:
+    return v
+
+
+def _optional_type(t: Any) -> Any:
+    if getattr(t, '__origin__', None) is typing.Union:
+        args = [a for a in t.__args__ if a is not type(None)]
+        if len(args) == 1:
+            return args[0]
+    return t
+
+
+def _encode_hexadecimal(v: int, memo: Dict[Any, Any]) -> str:
+    # A 128-bit IV does not fit the doubles of most JSON readers
+    return f'0x{v:032x}'
+
+
+def _decode_hexadecimal(v: Any, memo: Dict[Any, Any]) -> int:
+    return v if isinstance(v, int) else tag.hexadecimal(v)
+
+
+def _converters(t: Any) -> Tuple[Encoder, Decoder]:
+    t = _optional_type(t)
+    if getattr(t, '__origin__', None) is list:
+        encode_item, decode_item = _converters(t.__args__[0])
+        return (lambda v, memo: [encode_item(x, memo) for x in v],
+                lambda v, memo: [decode_item(x, memo) for x in v])
+    if t == tag.CustomTag:
+        return (lambda v, memo: v if isinstance(v, str) else v.dumps(),
+                lambda v, memo: Parser.loads_custom_tag(v))
+    if t in (str, int, bool):
+        return _identity, _identity
+    if t is float:
+        return _identity, lambda v, memo: float(v)
+    if t is datetime:
+        return (lambda v, memo: v.isoformat(),
+                lambda v, memo: iso8601_parse(v))
+    if t is constant.Resolution:
+        return (lambda v, memo: f'{v.width}x{v.height}',
+                lambda v, memo: constant.Resolution(v))
+    if isinstance(t, type) and issubclass(t, Enum):
+        return lambda v, memo: v.value, lambda v, memo: t(v)
+    if isinstance(t, type):
+        s = schema(t)
+        return s.encode, s.decode
+    raise TypeError(f'Unsupported field type {t!r}')
+
+
+class Schema(object):
+    """Field converters of a class, derived from its ``__init__``
+    annotations
+
+    Fields are encoded in ``__init__`` order, ``None`` and empty lists are
+    left out.
+    """
+
+    def __init__(self, cls: type, exclude: Tuple[str, ...] = ()):
+        self.cls = cls
+        hints = typing.get_type_hints(cls.__init__)
+        hexadecimals = {a.name for a in getattr(cls, 'attrs', ())
+                        if a.type is tag.hexadecimal}
+        self.fields: List[Tuple[str, Optional[Encoder],
+                                Optional[Decoder]]] = []
+        for name in inspect.signature(cls.__init__).parameters:
+            if name == 'self' or name in exclude:
+                continue
+            if name in hexadecimals:
+                encode, decode = _encode_hexadecimal, _decode_hexadecimal
+            else:
+                encode, decode = _converters(hints[name])
+            self.fields.append((
+                name,
+                None if encode is _identity else encode,
+                None if decode is _identity else decode,
+            ))
+        self.shared = issubclass(cls, tag.Tag)
+
+    def encode(self, obj: Any, memo: Dict[Any, Any]) -> Dict[str, Any]:
+        if self.shared:
+            # The tag is kept with its id, which is not reused while the
+            # memo is alive
+            hit = memo.get(id(obj), None)
+            if hit is not None:
+                return hit[1]
+        d = {}
+        for name, encode, _ in self.fields:
+            v = getattr(obj, name)
+            if v is None:
+                continue
+            if encode is not None:
+                v = encode(v, memo)
+                if v == []:
+                    continue
+            d[name] = v
+        if self.shared:
+            memo[id(obj)] = (obj, d)
+        return d
+
+    def kwargs(self, d: Dict[str, Any],
+               memo: Dict[Any, Any]) -> Dict[str, Any]:
+        kwargs = {}
+        for name, _, decode in self.fields:
+            v = d.get(name, None)
+            if v is not None:
+                kwargs[name] = v if decode is None else decode(v, memo)
+        return kwargs
+
+    def decode(self, d: Dict[str, Any], memo: Dict[Any, Any]) -> Any:
+        if self.shared:
+            # Attributes of tags are scalars, equal tags are decoded once
+            key = (self.cls, tuple(d.items()))
+            obj = memo.get(key, None)
+            if obj is None:
+                obj = memo[key] = self.cls(**self.kwargs(d, memo))
+            return obj
+        return self.cls(**self.kwargs(d, memo))
+
+
+_schemas: Dict[Tuple[type, Tuple[str, ...]], Schema] = {}
+
+
+def schema(cls: type, exclude: Tuple[str, ...] = ()) -> Schema:
+    s = _schemas.get((cls, exclude), None)
+    if s is None:
+        if cls is component.VariantStream:
+            # Rendition groups are linked again from the GROUP-IDs of info
+            exclude += ('audio', 'video', 'subtitles', 'closed_captions')
+        s = _schemas[(cls, exclude)] = Schema(cls, exclude)
+    return s
+
+
+def _encode_columns(segments: Sequence,
+                    memo: Dict[Any, Any]) -> Iterator[Tuple[str, Any]]:
+    yield 'duration', [s.info.duration for s in segments]
+    titles = [s.info.title for s in segments]
+    if any(t is not None for t in titles):
+        yield 'title', titles
+    yield 'uri', [s.uri for s in segments]
+    for name, encode, _ in schema(component.MediaSegment).fields:
+        if name in ('info', 'uri'):
+            continue
+        if name in _RUN_FIELDS:
+            values: List[Any] = []
+            runs: List[List[Optional[int]]] = []
+            indexes: Dict[int, Tuple[Any, int]] = {}
+            last: Any = runs
+            for i, s in enumerate(segments):
+                v = getattr(s, name)
+                if v is last:
+                    continue
+                last = v
+                k = None
+                if v is not None:
+                    hit = indexes.get(id(v), None)
+                    if hit is None:
+                        k = len(values)
+                        indexes[id(v)] = (v, k)
+                        values.append(encode(v, memo))
+                    else:
+                        k = hit[1]
+                runs.append([i, k])
+            if values:
+                yield name, {'values': values, 'runs': runs}
+        else:
+            index = []
+            values = []
+            for i, s in enumerate(segments):
+                v = getattr(s, name)
+                if v is not None and v != []:
+                    index.append(i)
+                    values.append(encode(v, memo))
+            if index:
+                yield name, {'index': index, 'values': values}
+
+
+def _decode_columns(columns: Dict[str, Any],
+                    memo: Dict[Any, Any]) -> List[component.MediaSegment]:
+    uris = columns['uri']
+    n = len(uris)
+    durations = columns['duration']
+    titles = columns.get('title', None) or itertools.repeat(None)
+    infos = []
+    for duration, title in zip(durations, titles):
+        key = (tag.ExtInf, duration, title)
+        info = memo.get(key, None)
+        if info is None:
+            info = memo[key] = tag.ExtInf(float(duration), title)
+        infos.append(info)
+    if len(infos) != n:
+        raise ValueError('Columns of different lengths')
+
+    fields = []
+    for name, _, decode in schema(component.MediaSegment).fields:
+        if name == 'info':
+            fields.append(infos)
+            continue
+        if name == 'uri':
+            fields.append(uris)
+            continue
+        c = columns.get(name, None)
+        if c is None:
+            fields.append(itertools.repeat(None))
+            continue
+        column: List[Any] = [None] * n
+        if name in _RUN_FIELDS:
+            values = [decode(v, memo) for v in c['values']]
+            runs = c['runs']
+            for j, (start, k) in enumerate(runs):
+                stop = runs[j + 1][0] if j + 1 < len(runs) else n
+                if k is not None:
+                    column[start:stop] = [values[k]] * (stop - start)
+        else:
+            for i, v in zip(c['index'], c['values']):
+                column[i] = decode(v, memo)
+        fields.append(column)
+    return [component.MediaSegment(*row) for row in zip(*fields)]
+
+
+def _kind(playlist: Any) -> constant.PlaylistType:
+    from .playlist import MasterPlaylist, MediaPlaylist
+
+    if isinstance(playlist, MediaPlaylist):
+        return constant.PlaylistType.MEDIA
+    elif isinstance(playlist, MasterPlaylist):
+        return constant.PlaylistType.MASTER
+    raise TypeError('Unknown playlist type')
+
+
+def to_dict(playlist: Any, columnar: bool = False) -> Dict[str, Any]:
+    kind = _kind(playlist)
+    memo: Dict[Any, Any] = {}
+    d: Dict[str, Any] = {'type': kind.value}
+    if kind == constant.PlaylistType.MEDIA and columnar:
+        d.update(schema(type(playlist), (SEGMENTS,)).encode(playlist, memo))
+        d[SEGMENT_COLUMNS] = dict(
+            _encode_columns(playlist.media_segments, memo))
+    else:
+        d.update(schema(type(playlist)).encode(playlist, memo))
+    return d
+
+
+def iter_json(playlist: Any, columnar: bool = False,
+              batch_size: int = 1024) -> Iterator[str]:
+    """Encode a playlist as JSON in chunks
+
+    The header is encoded first, followed by segments in batches of
+    ``batch_size`` or by one column at a time, so memory use does not grow
+    with the size of the whole document.
+    """
+    kind = _kind(playlist)
+    memo: Dict[Any, Any] = {}
+    head: Dict[str, Any] = {'type': kind.value}
+    if kind == constant.PlaylistType.MASTER:
+        head.update(schema(type(playlist)).encode(playlist, memo))
+        yield _json_encoder.encode(head)
+        return
+    head.update(schema(type(playlist), (SEGMENTS,)).encode(playlist, memo))
+    yield _json_encoder.encode(head)[:-1]
+
+    segments = playlist.media_segments
+    if columnar:
+        yield f',"{SEGMENT_COLUMNS}":{{'
+        for i, (name, column) in enumerate(_encode_columns(segments, memo)):
+            yield f'{"," if i else ""}"{name}":'
+            yield _json_encoder.encode(column)
+        yield '}}'
+        return
+
+    encode = schema(component.MediaSegment).encode
+    yield f',"{SEGMENTS}":['
+    for start in range(0, len(segments), batch_size):
+        batch = [encode(s, memo)
+                 for s in segments[start:start + batch_size]]
+        yield ('' if start == 0 else ',') + \
+            _json_encoder.encode(batch)[1:-1]
+    yield ']}'
+
+
+def _link_variant_streams(playlist: Any):
+    groups = {(g.group_id, g.type): g for g in playlist.rendition_groups}
+    for v in playlist.variant_streams:
+        info = v.info
+        for name, media_type in [
+                ('audio', constant.MediaType.AUDIO),
+                ('video', constant.MediaType.VIDEO),
+                ('subtitles', constant.MediaType.SUBTITLES),
+                ('closed_captions', constant.MediaType.CLOSED_CAPTIONS)]:
+            group_id = getattr(info, name)
+            if group_id is not None:
+                setattr(v, name, groups.get((group_id, media_type), None))
+
+
+def from_dict(d: Dict[str, Any]) -> Any:
+    """Decode a dict produced by ``to_dict`` or ``iter_json``
+    """
+    from .playlist import MasterPlaylist, MediaPlaylist
+
+    kind = constant.PlaylistType(d['type'])
+    memo: Dict[Any, Any] = {}
+    if kind == constant.PlaylistType.MEDIA:
+        kwargs = schema(MediaPlaylist).kwargs(d, memo)
+        columns = d.get(SEGMENT_COLUMNS, None)
+        if columns is not None:
+            kwargs[SEGMENTS] = _decode_columns(columns, memo)
+        return MediaPlaylist(**kwargs)
+    playlist = MasterPlaylist(**schema(MasterPlaylist).kwargs(d, memo))
+    _link_variant_streams(playlist)
+    return playlist
@@ -0,0 +1,772 @@
+"""Sharded monitoring of many live media playlists
+
+A ``ChannelMonitor`` spreads playlist URLs over worker processes by
+rendezvous hashing, so adding or removing a worker only moves the URLs
+that worker gains or loses. Each worker runs one asyncio loop that reloads
+its playlists over keep-alive HTTP/1.1 connections, parses them with
+``MediaPlaylist.from_bytes`` and sends compact ``ChannelEvent`` objects
+back through a pipe.
+
+Workers send no more events than the supervisor has granted credits for.
+Events that cannot be sent yet are coalesced per URL, the latest one wins,
+so a slow consumer bounds the memory of the workers and sees the current
+state of every channel once it catches up.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import ssl
+import time
+from collections import OrderedDict, deque
+from enum import Enum
+from multiprocessing.connection import Connection, wait
+from typing import (
+    Any, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple)
+from urllib.parse import urljoin, urlsplit
+
+from .cache import content_hash
+from .error import ParseError
+from .playlist import MediaPlaylist, PlaylistError
+
+
+class MonitorError(Exception):
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class EventKind(Enum):
+    UPDATED = 'UPDATED'
+    STALLED = 'STALLED'
+    ENDED = 'ENDED'
+    ERROR = 'ERROR'
+
+
+class ChannelStatus(object):
+    """The parts of a reloaded media playlist a monitor reports
+    """
+
+    def __init__(self, first_sequence_number: int,
+                 next_sequence_number: int, segments: int, parts: int,
+                 duration: float, target_duration: Optional[int],
+                 discontinuity_sequence: int, end_list: bool):
+        self.first_sequence_number = first_sequence_number
+        self.next_sequence_number = next_sequence_number
+        self.segments = segments
+        self.parts = parts
+        self.duration = duration
+        self.target_duration = target_duration
+        self.discontinuity_sequence = discontinuity_sequence
+        self.end_list = end_list
+
+    @classmethod
+    def from_playlist(cls, p: MediaPlaylist) -> 'ChannelStatus':
+        return cls(
+            p.first_sequence_number, p.next_sequence_number,
+            len(p.media_segments), len(p.pending_parts), p.timeline.duration,
+            None if p.target_duration is None else p.target_duration.duration,
+            0 if p.discontinuity_sequence is None
+            else p.discontinuity_sequence.number,
+            p.end_list is not None)
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is type(self):
+            return self.__dict__ == other.__dict__
+        return False
+
+    def __repr__(self) -> str:
+        return (f'ChannelStatus({self.first_sequence_number}-'
+                f'{self.next_sequence_number}, {self.duration:.3f}s)')
+
+
+class ChannelEvent(object):
+    """A change of a channel seen by a worker at wall clock ``time``
+
+    ``status`` is that of the last successful reload, ``error`` describes
+    the failure of an ``ERROR`` event.
+    """
+
+    def __init__(self, kind: EventKind, url: str, time: float,
+                 status: Optional[ChannelStatus] = None,
+                 error: Optional[str] = None):
+        self.kind = kind
+        self.url = url
+        self.time = time
+        self.status = status
+        self.error = error
+
+    def __repr__(self) -> str:
+        detail = self.error if self.kind == EventKind.ERROR else self.status
+        return f'ChannelEvent({self.kind.value}, {self.url}, {detail})'
+
+
+class _Response(object):
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+class _HTTPClient(object):
+    """Minimal asyncio HTTP/1.1 GET client keeping up to ``max_idle`` idle
+    connections per origin
+    """
+
+    max_redirects = 5
+
+    def __init__(self, timeout: float, max_idle: int = 64,
+                 max_body: int = 1 << 26):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_body = max_body
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[
+            asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+        self._ssl: Optional[ssl.SSLContext] = None
+
+    async def get(self, url: str, headers: Dict[str, str]) -> _Response:
+        return await asyncio.wait_for(self._get(url, headers), self.timeout)
+
+    async def _get(self, url: str, headers: Dict[str, str]) -> _Response:
+        for _ in range(self.max_redirects + 1):
+            res = await self._request(url, headers)
+            location = res.headers.get('location', None)
+            if res.status not in (301, 302, 303, 307, 308) or not location:
+                return res
+            url = urljoin(url, location)
+        raise MonitorError(f'Too many redirects for {url}')
+
+    async def _connect(self, origin: Tuple[str, str, int]) -> Tuple[
+            asyncio.StreamReader, asyncio.StreamWriter, bool]:
+        idle = self._idle.get(origin, None)
+        while idle:
+            reader, writer = idle.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return reader, writer, True
+            writer.close()
+        scheme, host, port = origin
+        context = None
+        if scheme == 'https':
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            context = self._ssl
+        reader, writer = await asyncio.open_connection(
+            host, port, ssl=context)
+        return reader, writer, False
+
+    async def _request(self, url: str,
+                       headers: Dict[str, str]) -> _Response:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f'Unsupported URL {url}')
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        origin = (parts.scheme, parts.hostname, port)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        lines = [f'GET {target} HTTP/1.1', f'Host: {parts.netloc}',
+                 'Accept-Encoding: gzip']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        request = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+        while True:
+            reader, writer, reused = await self._connect(origin)
+            try:
+                writer.write(request)
+                res, keep_alive = await self._response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    # The server closed the idle connection, try another
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            break
+        idle = self._idle.setdefault(origin, [])
+        if keep_alive and len(idle) < self.max_idle:
+            idle.append((reader, writer))
+        else:
+            writer.close()
+        return res
+
+    async def _response(self, reader: asyncio.StreamReader
+                        ) -> Tuple[_Response, bool]:
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        version, status = lines[0].split(' ', 2)[:2]
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive = connection != 'close'
+        else:
+            keep_alive = connection == 'keep-alive'
+
+        code = int(status)
+        if code in (204, 304) or code < 200:
+            body = b''
+        elif 'chunked' in headers.get('transfer-encoding', '').lower():
+            body = await self._chunked(reader)
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length > self.max_body:
+                raise MonitorError(f'Response of {length} bytes')
+            body = await reader.readexactly(length)
+        else:
+            body = await reader.read(self.max_body + 1)
+            if len(body) > self.max_body:
+                raise MonitorError(f'Response over {self.max_body} bytes')
+            keep_alive = False
+        return _Response(code, headers, body), keep_alive
+
+    async def _chunked(self, reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        length = 0
+        while True:
+            line = await reader.readuntil(b'\r\n')
+            size = int(line.split(b';', 1)[0], 16)
+            if size == 0:
+                # Skip the trailers
+                while await reader.readuntil(b'\r\n') != b'\r\n':
+                    pass
+                return b''.join(chunks)
+            length += size
+            if length > self.max_body:
+                raise MonitorError(f'Response over {self.max_body} bytes')
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+
+    def close(self):
+        for idle in self._idle.values():
+            for _, writer in idle:
+                writer.close()
+        self._idle.clear()
+
+
+class _Channel(object):
+    """Reload state of one URL in a worker
+    """
+
+    def __init__(self, url: str):
+        self.url = url
+        self.etag: Optional[str] = None
+        self.digest: Optional[str] = None
+        self.status: Optional[ChannelStatus] = None
+        self.changed = 0.0
+        self.stalled = False
+        self.error: Optional[str] = None
+        self.failures = 0
+
+
+_RELOAD_ERRORS = (OSError, EOFError, ValueError, asyncio.TimeoutError,
+                  asyncio.LimitOverrunError, ParseError, PlaylistError,
+                  MonitorError)
+
+
+class _Worker(object):
+    """The asyncio loop of one worker process
+
+    Commands arrive on ``commands``, batches of events and the counters
+    go out on ``events`` from an executor thread, one batch at a time, so
+    the loop never blocks on a full pipe.
+    """
+
+    heartbeat = 1.0
+    max_backoff = 30.0
+
+    def __init__(self, commands: Connection, events: Connection,
+                 credits: int, concurrency: int = 256,
+                 interval: Optional[float] = None, timeout: float = 10.0,
+                 stall_factor: float = 3.0, conditional: bool = True):
+        self.commands = commands
+        self.events = events
+        self.credits = credits
+        self.concurrency = concurrency
+        self.interval = interval
+        self.stall_factor = stall_factor
+        self.conditional = conditional
+        self.client = _HTTPClient(timeout, max_idle=concurrency)
+        self.counters = {'fetches': 0, 'not_modified': 0, 'unchanged': 0,
+                         'parsed': 0, 'errors': 0, 'bytes': 0}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._outbox: 'OrderedDict[str, ChannelEvent]' = OrderedDict()
+        self._sending: Optional[asyncio.Future] = None
+        self._heartbeat_due = False
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopped = self._loop.create_future()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._loop.add_reader(self.commands.fileno(), self._command)
+        heartbeat = self._loop.create_task(self._beat())
+        try:
+            await self._stopped
+        finally:
+            self._loop.remove_reader(self.commands.fileno())
+            tasks = list(self._tasks.values()) + [heartbeat]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.client.close()
+
+    def _stop(self):
+        if not self._stopped.done():
+            self._stopped.set_result(None)
+
+    def _command(self):
+        try:
+            while self.commands.poll():
+                command, arg = self.commands.recv()
+                if command == 'add':
+                    for url in arg:
+                        if url not in self._tasks:
+                            self._tasks[url] = self._loop.create_task(
+                                self._poll(url))
+                elif command == 'remove':
+                    for url in arg:
+                        task = self._tasks.pop(url, None)
+                        if task is not None:
+                            task.cancel()
+                        self._outbox.pop(url, None)
+                elif command == 'credit':
+                    self.credits += arg
+                    self._flush()
+                elif command == 'stop':
+                    self._stop()
+                    return
+        except (EOFError, OSError):
+            # The supervisor is gone
+            self._stop()
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            self._heartbeat_due = True
+            self._flush()
+
+    def _emit(self, kind: EventKind, channel: _Channel):
+        # An event still waiting for credits keeps its place in the outbox
+        self._outbox[channel.url] = ChannelEvent(
+            kind, channel.url, time.time(), channel.status, channel.error)
+        self._flush()
+
+    def _flush(self):
+        if self._sending is not None:
+            return
+        n = min(self.credits, len(self._outbox))
+        if n == 0 and not self._heartbeat_due:
+            return
+        batch = [self._outbox.popitem(last=False)[1] for _ in range(n)]
+        self.credits -= n
+        self._heartbeat_due = False
+        counters = dict(self.counters, channels=len(self._tasks))
+        self._sending = self._loop.run_in_executor(
+            None, self.events.send, (batch, counters))
+        self._sending.add_done_callback(self._sent)
+
+    def _sent(self, future: asyncio.Future):
+        self._sending = None
+        if future.cancelled() or future.exception() is not None:
+            self._stop()
+            return
+        self._flush()
+
+    async def _poll(self, url: str):
+        channel = _Channel(url)
+        while True:
+            delay = await self._reload(channel)
+            if delay is None:
+                self._tasks.pop(url, None)
+                return
+            await asyncio.sleep(delay)
+
+    def _delay(self, channel: _Channel, changed: bool) -> float:
+        """Reload after the target duration if the playlist changed, half
+        of it otherwise
+        """
+        if self.interval is not None:
+            return self.interval
+        target = channel.status.target_duration or 1
+        return target if changed else target / 2
+
+    async def _reload(self, channel: _Channel) -> Optional[float]:
+        headers = {}
+        if self.conditional and channel.etag is not None and \
+                channel.error is None:
+            headers['If-None-Match'] = channel.etag
+        try:
+            async with self._semaphore:
+                res = await self.client.get(channel.url, headers)
+            self.counters['fetches'] += 1
+            self.counters['bytes'] += len(res.body)
+            if res.status == 304 and channel.status is not None:
+                self.counters['not_modified'] += 1
+                return self._unchanged(channel)
+            if res.status != 200:
+                raise MonitorError(f'HTTP {res.status}')
+            digest = content_hash(res.body)
+            if digest == channel.digest and channel.error is None:
+                self.counters['unchanged'] += 1
+                return self._unchanged(channel)
+            playlist = MediaPlaylist.from_bytes(res.body)
+        except _RELOAD_ERRORS as e:
+            return self._failed(channel, e)
+        self.counters['parsed'] += 1
+        channel.etag = res.headers.get('etag', None)
+        channel.digest = digest
+
+        status = ChannelStatus.from_playlist(playlist)
+        previous, channel.status = channel.status, status
+        if status.end_list:
+            self._emit(EventKind.ENDED, channel)
+            return None
+        if previous is not None and channel.error is None and (
+                status.first_sequence_number,
+                status.next_sequence_number, status.parts) == (
+                previous.first_sequence_number,
+                previous.next_sequence_number, previous.parts):
+            return self._unchanged(channel)
+        channel.changed = self._loop.time()
+        channel.stalled = False
+        channel.error = None
+        channel.failures = 0
+        self._emit(EventKind.UPDATED, channel)
+        return self._delay(channel, True)
+
+    def _unchanged(self, channel: _Channel) -> float:
+        target = channel.status.target_duration
+        if not channel.stalled and target and \
+                self._loop.time() - channel.changed > \
+                self.stall_factor * target:
+            channel.stalled = True
+            self._emit(EventKind.STALLED, channel)
+        return self._delay(channel, False)
+
+    def _failed(self, channel: _Channel, e: Exception) -> float:
+        self.counters['errors'] += 1
+        channel.failures += 1
+        error = str(e) or type(e).__name__
+        if error != channel.error:
+            channel.error = error
+            self._emit(EventKind.ERROR, channel)
+        base = 0.5 if self.interval is None else max(self.interval, 0.01)
+        return min(base * 2 ** (channel.failures - 1), self.max_backoff)
+
+
+def _run_worker(commands: Connection, events: Connection, credits: int,
+                kwargs: Dict[str, Any]):
+    worker = _Worker(commands, events, credits, **kwargs)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(worker.run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.close()
+
+
+class _Slot(object):
+    """A worker process and the URLs assigned to it
+    """
+
+    def __init__(self, index: int):
+        self.index = index
+        self.seed = index.to_bytes(4, 'little')
+        self.process: Optional[multiprocessing.process.BaseProcess] = None
+        self.commands: Optional[Connection] = None
+        self.events: Optional[Connection] = None
+        self.urls: Set[str] = set()
+        self.active = True
+        self.restarts = 0
+        self.generation = 0
+        self.credits = 0
+        self.returned = 0
+        self.last_seen = 0.0
+        self.counters: Dict[str, int] = {}
+
+
+class ChannelMonitor(object):
+    """Reloads live media playlists in ``workers`` processes and reports
+    their changes as ``ChannelEvent`` objects
+
+    Each worker polls up to ``concurrency`` playlists at a time. Reloads
+    follow the target duration, after the full target duration if the
+    playlist changed and half of it otherwise, unless ``interval`` fixes
+    the delay. Conditional requests with the ETag of the last version and
+    a content hash skip parsing unchanged playlists. A channel whose
+    playlist has not grown for ``stall_factor`` target durations gets one
+    ``STALLED`` event, failed reloads back off exponentially.
+
+    Up to about ``queue_size`` events are in flight between the workers
+    and ``get``. A worker that dies, or stays silent for ``hang_timeout``
+    seconds, is restarted with its URLs. After ``max_restarts`` restarts
+    it is retired and its URLs move to the other workers.
+    """
+
+    def __init__(self, workers: Optional[int] = None,
+                 concurrency: int = 256, queue_size: int = 4096,
+                 interval: Optional[float] = None, timeout: float = 10.0,
+                 stall_factor: float = 3.0, conditional: bool = True,
+                 max_restarts: int = 3, hang_timeout: float = 30.0,
+                 start_method: Optional[str] = None):
+        if queue_size < 1:
+            raise ValueError('queue_size must be positive')
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.max_restarts = max_restarts
+        self.hang_timeout = hang_timeout
+        self.restarts = 0
+        self._kwargs = {'concurrency': concurrency, 'interval': interval,
+                        'timeout': timeout, 'stall_factor': stall_factor,
+                        'conditional': conditional}
+        self._context = multiprocessing.get_context(start_method)
+        self._slots: List[_Slot] = []
+        self._urls: Dict[str, _Slot] = {}
+        self._pending: Deque[Tuple[_Slot, int, ChannelEvent]] = deque()
+
+    @property
+    def urls(self) -> List[str]:
+        return list(self._urls)
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        """Reload counters summed over the workers
+        """
+        totals: Dict[str, int] = {}
+        for slot in self._slots:
+            for name, value in slot.counters.items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def _active(self) -> List[_Slot]:
+        return [s for s in self._slots if s.active]
+
+    def start(self):
+        if self._slots:
+            return
+        self.resize(self.workers)
+
+    def _owner(self, url: str, slots: List[_Slot]) -> _Slot:
+        if not slots:
+            raise MonitorError('No worker left')
+        key = url.encode('utf-8')
+        return max(slots, key=lambda s: hashlib.blake2b(
+            key, digest_size=8, salt=s.seed).digest())
+
+    def shard_of(self, url: str) -> int:
+        """Index of the worker ``url`` is, or would be, assigned to
+        """
+        slot = self._urls.get(url, None)
+        if slot is None:
+            slot = self._owner(url, self._active())
+        return slot.index
+
+    def _send(self, slot: _Slot, command: str, arg: Any = None):
+        if slot.process is None:
+            return
+        try:
+            slot.commands.send((command, arg))
+        except OSError:
+            # Noticed through the sentinel of the process
+            pass
+
+    def _send_urls(self, slot: _Slot, command: str, urls: List[str]):
+        for i in range(0, len(urls), 1024):
+            self._send(slot, command, urls[i:i + 1024])
+
+    def _spawn(self, slot: _Slot):
+        commands, worker_commands = self._context.Pipe(duplex=False)
+        worker_events, events = self._context.Pipe(duplex=False)
+        slot.credits = max(1, self.queue_size // max(len(self._active()), 1))
+        slot.process = self._context.Process(
+            target=_run_worker, name=f'ChannelMonitor-{slot.index}',
+            args=(commands, events, slot.credits, self._kwargs),
+            daemon=True)
+        slot.process.start()
+        commands.close()
+        events.close()
+        slot.commands = worker_commands
+        slot.events = worker_events
+        slot.generation += 1
+        slot.returned = 0
+        slot.last_seen = time.monotonic()
+        self._send_urls(slot, 'add', sorted(slot.urls))
+
+    def _reap(self, slot: _Slot, timeout: float = 1.0):
+        if slot.process is None:
+            return
+        slot.process.join(timeout)
+        if slot.process.exitcode is None:
+            slot.process.terminate()
+            slot.process.join(timeout)
+        slot.commands.close()
+        slot.events.close()
+        slot.process = slot.commands = slot.events = None
+
+    def _stop(self, slot: _Slot):
+        self._send(slot, 'stop')
+        self._reap(slot)
+
+    def _rebalance(self):
+        slots = self._active()
+        moves: Dict[Tuple[_Slot, _Slot], List[str]] = {}
+        for url, slot in self._urls.items():
+            owner = self._owner(url, slots)
+            if owner is not slot:
+                moves.setdefault((slot, owner), []).append(url)
+        for (slot, owner), urls in moves.items():
+            slot.urls.difference_update(urls)
+            owner.urls.update(urls)
+            for url in urls:
+                self._urls[url] = owner
+            if slot.active:
+                self._send_urls(slot, 'remove', urls)
+            self._send_urls(owner, 'add', urls)
+
+    def resize(self, workers: int):
+        """Run ``workers`` worker processes, moving the URLs whose worker
+        changes
+        """
+        if workers < 1:
+            raise ValueError('workers must be positive')
+        self.workers = workers
+        active = self._active()
+        leaving = active[workers:]
+        joining: List[_Slot] = []
+        for slot in self._slots:
+            if len(active) + len(joining) >= workers:
+                break
+            if not slot.active:
+                joining.append(slot)
+        while len(active) + len(joining) < workers:
+            slot = _Slot(len(self._slots))
+            self._slots.append(slot)
+            joining.append(slot)
+        for slot in leaving:
+            slot.active = False
+        for slot in joining:
+            slot.active = True
+            slot.restarts = 0
+        self._rebalance()
+        for slot in leaving:
+            self._stop(slot)
+        for slot in joining:
+            self._spawn(slot)
+
+    def add(self, urls: Iterable[str]):
+        self.start()
+        slots = self._active()
+        added: Dict[_Slot, List[str]] = {}
+        for url in urls:
+            if url not in self._urls:
+                slot = self._urls[url] = self._owner(url, slots)
+                slot.urls.add(url)
+                added.setdefault(slot, []).append(url)
+        for slot, urls in added.items():
+            self._send_urls(slot, 'add', urls)
+
+    def remove(self, urls: Iterable[str]):
+        """Stop polling ``urls``, their events already received are still
+        returned by ``get``
+        """
+        removed: Dict[_Slot, List[str]] = {}
+        for url in urls:
+            slot = self._urls.pop(url, None)
+            if slot is not None:
+                slot.urls.discard(url)
+                removed.setdefault(slot, []).append(url)
+        for slot, urls in removed.items():
+            self._send_urls(slot, 'remove', urls)
+
+    def _drain(self, slot: _Slot):
+        try:
+            while slot.events.poll():
+                batch, counters = slot.events.recv()
+                slot.counters = counters
+                slot.last_seen = time.monotonic()
+                self._pending.extend(
+                    (slot, slot.generation, event) for event in batch)
+        except (EOFError, OSError):
+            pass
+
+    def _restart(self, slot: _Slot):
+        self._reap(slot)
+        if slot.restarts >= self.max_restarts:
+            slot.active = False
+            self._rebalance()
+            return
+        slot.restarts += 1
+        self.restarts += 1
+        self._spawn(slot)
+
+    def _receive(self, timeout: Optional[float]) -> bool:
+        """Wait up to ``timeout`` seconds for messages or dead workers
+        """
+        slots = [s for s in self._slots if s.process is not None]
+        if not slots:
+            raise MonitorError('No worker running')
+        handles: List[Any] = [s.events for s in slots]
+        handles.extend(s.process.sentinel for s in slots)
+        ready = wait(handles, timeout)
+        now = time.monotonic()
+        for slot in slots:
+            if slot.events in ready:
+                self._drain(slot)
+        for slot in slots:
+            if slot.process.sentinel in ready or \
+                    now - slot.last_seen > self.hang_timeout:
+                self._restart(slot)
+        return bool(ready)
+
+    def _credit(self, slot: _Slot, generation: int):
+        if generation != slot.generation or slot.process is None:
+            return
+        slot.returned += 1
+        if slot.returned >= max(slot.credits // 4, 1):
+            self._send(slot, 'credit', slot.returned)
+            slot.returned = 0
+
+    def get(self, timeout: Optional[float] = None) -> Optional[ChannelEvent]:
+        """Next event, or ``None`` if none arrives within ``timeout``
+        seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._pending:
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - time.monotonic(), 0)
+            if not self._receive(remaining) and remaining == 0:
+                return None
+        slot, generation, event = self._pending.popleft()
+        self._credit(slot, generation)
+        return event
+
+    def events(self, timeout: Optional[float] = None
+               ) -> Iterator[ChannelEvent]:
+        """Events until none arrives within ``timeout`` seconds
+        """
+        while True:
+            event = self.get(timeout)
+            if event is None:
+                return
+            yield event
+
+    def close(self):
+        for slot in self._slots:
+            self._send(slot, 'stop')
+        for slot in self._slots:
+            self._reap(slot)
+            slot.active = False
+
+    def __enter__(self) -> 'ChannelMonitor':
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
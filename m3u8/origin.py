@@ -0,0 +1,349 @@
+"""In-memory HLS origin server
+
+Playlists are published under a path and rendered once per version: the
+text, its gzip copy, their ETags and the response headers are prepared when a
+playlist is first requested, so plain, conditional and blocked LL-HLS
+requests are answered by writing prepared bytes.
+"""
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from . import compress
+from . import constant
+from .cache import content_hash
+from .playlist import MasterPlaylist, MediaPlaylist, Playlist
+
+
+CONTENT_TYPE = 'application/vnd.apple.mpegurl'
+
+_REASONS = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    503: 'Service Unavailable',
+}
+
+
+def _head(status: int, headers: List[Tuple[str, str]]) -> bytes:
+    lines = [f'HTTP/1.1 {status} {_REASONS[status]}']
+    lines.extend(f'{name}: {value}' for name, value in headers)
+    lines.extend(['', ''])
+    return '\r\n'.join(lines).encode('latin-1')
+
+
+_ERRORS = {
+    status: _head(status, [('Content-Length', '0'),
+                           ('Cache-Control', 'no-cache')])
+    for status in [400, 404, 405, 503]
+}
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        if coding.strip().lower() in ('gzip', '*'):
+            q = params.replace(' ', '').lower()
+            if not q.startswith('q=') or q[2:].strip('0.') != '':
+                return True
+    return False
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    for item in if_none_match.split(','):
+        item = item.strip()
+        if item == '*' or item == etag or item == 'W/' + etag:
+            return True
+    return False
+
+
+def _reached(playlist: MediaPlaylist, msn: int, part: Optional[int]) -> bool:
+    """Whether ``playlist`` contains segment ``msn``, or part ``part`` of
+    it, or a later one
+    """
+    if playlist.end_list is not None:
+        return True
+    n = playlist.next_sequence_number
+    if msn < n:
+        return True
+    return part is not None and msn == n and \
+        part < len(playlist.pending_parts)
+
+
+class _Rendered(object):
+    """A playlist version with its prepared bodies and headers
+    """
+
+    def __init__(self, playlist: Playlist, max_age: int):
+        self.playlist = playlist
+        self.max_age = max_age
+        body = playlist.to_bytes()
+        gzip = b''.join(compress.compress([body], compress.GZIP))
+        self.bodies = {False: body, True: gzip}
+        # Tiny playlists can grow when compressed
+        self.gzip = len(gzip) < len(body)
+        digest = content_hash(body)
+        # Each encoding is a representation of its own
+        self.etags = {False: f'"{digest}"', True: f'"{digest}-gz"'}
+        self._heads: Dict[Tuple[int, bool, int], bytes] = {}
+        self._deltas: Dict[bool, '_Rendered'] = {}
+
+    def head(self, status: int, gzip: bool, max_age: int) -> bytes:
+        key = (status, gzip, max_age)
+        head = self._heads.get(key, None)
+        if head is None:
+            headers = []
+            if status == 200:
+                headers.append(('Content-Type', CONTENT_TYPE))
+                headers.append(
+                    ('Content-Length', str(len(self.bodies[gzip]))))
+                if gzip:
+                    headers.append(('Content-Encoding', 'gzip'))
+            headers.extend([
+                ('ETag', self.etags[gzip]),
+                ('Cache-Control', f'max-age={max_age}'),
+                ('Vary', 'Accept-Encoding'),
+            ])
+            head = self._heads[key] = _head(status, headers)
+        return head
+
+    def delta(self, skip_date_ranges: bool) -> '_Rendered':
+        rendered = self._deltas.get(skip_date_ranges, None)
+        if rendered is None:
+            playlist = self.playlist
+            if isinstance(playlist, MediaPlaylist):
+                delta = playlist.delta_update(skip_date_ranges)
+                if delta is not playlist:
+                    rendered = _Rendered(delta, self.max_age)
+            self._deltas[skip_date_ranges] = rendered or self
+        return self._deltas[skip_date_ranges]
+
+
+class _Channel(object):
+
+    def __init__(self, playlist: Playlist):
+        self.playlist = playlist
+        self.rendered: Optional[_Rendered] = None
+        self.updated = asyncio.Event()
+
+
+class Origin(object):
+    """HLS origin serving published playlists over HTTP/1.1
+
+    Live media playlists may be cached for half a target duration, ended
+    ones for ``vod_max_age`` and master playlists for ``master_max_age``
+    seconds. If a media playlist allows blocking reloads, requests with
+    ``_HLS_msn`` (and ``_HLS_part``) are held until a playlist containing
+    that segment (or part) is published, or answered with 503 after
+    ``block_timeout`` seconds, by default three target durations. Delta
+    updates are served for ``_HLS_skip``.
+
+    ``publish`` and ``unpublish`` must be called from the event loop of
+    the server, e.g. through ``loop.call_soon_threadsafe``.
+    """
+
+    vod_max_age = 86400
+    master_max_age = 60
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 block_timeout: Optional[float] = None):
+        self.host = host
+        self.port = port
+        self.block_timeout = block_timeout
+        self.server: Optional[asyncio.AbstractServer] = None
+        self._channels: Dict[str, _Channel] = {}
+
+    @property
+    def url(self) -> str:
+        if self.server is None:
+            return f'http://{self.host}:{self.port}'
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f'http://{host}:{port}'
+
+    def publish(self, path: str, playlist: Playlist):
+        """Serve ``playlist`` at ``path`` from now on and release the
+        blocked requests it satisfies
+        """
+        channel = self._channels.get(path, None)
+        if channel is None:
+            self._channels[path] = _Channel(playlist)
+            return
+        channel.playlist = playlist
+        channel.rendered = None
+        updated, channel.updated = channel.updated, asyncio.Event()
+        updated.set()
+
+    def unpublish(self, path: str):
+        channel = self._channels.pop(path)
+        channel.updated.set()
+
+    def get(self, path: str) -> Optional[Playlist]:
+        channel = self._channels.get(path, None)
+        return None if channel is None else channel.playlist
+
+    def max_age(self, playlist: Playlist) -> int:
+        if isinstance(playlist, MasterPlaylist):
+            return self.master_max_age
+        if playlist.end_list is not None:
+            return self.vod_max_age
+        if playlist.target_duration is None:
+            return 1
+        return max(1, playlist.target_duration.duration // 2)
+
+    def _rendered(self, channel: _Channel) -> _Rendered:
+        if channel.rendered is None:
+            channel.rendered = _Rendered(
+                channel.playlist, self.max_age(channel.playlist))
+        return channel.rendered
+
+    async def start(self):
+        self.server = await asyncio.start_server(
+            self._serve, self.host, self.port)
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+
+    async def __aenter__(self) -> 'Origin':
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def _serve(self, reader: asyncio.StreamReader,
+                     writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError,
+                        asyncio.LimitOverrunError, ConnectionError):
+                    return
+                keep_alive = await self._respond(head, writer)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, head: bytes,
+                       writer: asyncio.StreamWriter) -> bool:
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            writer.write(_ERRORS[400])
+            return False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.1':
+            keep_alive = connection != 'close'
+        else:
+            keep_alive = connection == 'keep-alive'
+
+        if method not in ('GET', 'HEAD'):
+            writer.write(_ERRORS[405])
+            return False
+        path, _, query = target.partition('?')
+        if path.startswith('http://') or path.startswith('https://'):
+            path = urlsplit(path).path
+        channel = self._channels.get(path, None)
+        if channel is None:
+            writer.write(_ERRORS[404])
+            return keep_alive
+
+        rendered = self._rendered(channel)
+        max_age = rendered.max_age
+        if query:
+            try:
+                rendered, max_age = await self._reload(
+                    path, channel, dict(parse_qsl(query)))
+            except ValueError:
+                writer.write(_ERRORS[400])
+                return keep_alive
+            if rendered is None:
+                writer.write(_ERRORS[503])
+                return keep_alive
+
+        gzip = rendered.gzip and \
+            _accepts_gzip(headers.get('accept-encoding', ''))
+        if_none_match = headers.get('if-none-match', None)
+        if if_none_match is not None and \
+                _matches(if_none_match, rendered.etags[gzip]):
+            writer.write(rendered.head(304, gzip, max_age))
+        elif method == 'HEAD':
+            writer.write(rendered.head(200, gzip, max_age))
+        else:
+            writer.writelines([rendered.head(200, gzip, max_age),
+                               rendered.bodies[gzip]])
+        return keep_alive
+
+    async def _reload(self, path: str, channel: _Channel,
+                      query: Dict[str, str]
+                      ) -> Tuple[Optional[_Rendered], int]:
+        """Wait for the version asked for by ``_HLS_msn``/``_HLS_part`` and
+        pick its delta update for ``_HLS_skip``
+
+        Raises ValueError for invalid parameters, returns ``None`` on
+        timeout.
+        """
+        rendered = self._rendered(channel)
+        max_age = rendered.max_age
+        playlist = rendered.playlist
+        if not isinstance(playlist, MediaPlaylist):
+            return rendered, max_age
+        server_control = playlist.server_control
+        if server_control is None:
+            return rendered, max_age
+
+        msn, part = query.get('_HLS_msn', None), query.get('_HLS_part', None)
+        if part is not None and msn is None:
+            raise ValueError('_HLS_part without _HLS_msn')
+        if msn is not None and \
+                server_control.can_block_reload == constant.Yes.YES:
+            msn = int(msn)
+            part = None if part is None else int(part)
+            if msn < 0 or (part is not None and part < 0) or \
+                    msn > playlist.next_sequence_number + 1:
+                raise ValueError('_HLS_msn out of range')
+            target_duration = 0
+            if playlist.target_duration is not None:
+                target_duration = playlist.target_duration.duration
+            timeout = self.block_timeout
+            if timeout is None:
+                timeout = 3 * target_duration
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            while not _reached(channel.playlist, msn, part):
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return None, max_age
+                try:
+                    await asyncio.wait_for(channel.updated.wait(), remaining)
+                except asyncio.TimeoutError:
+                    return None, max_age
+                if self._channels.get(path, None) is not channel:
+                    return None, max_age
+            rendered = self._rendered(channel)
+            # The response of a blocked request belongs to a unique URL and
+            # does not go stale
+            max_age = max(rendered.max_age, 6 * target_duration)
+
+        skip = query.get('_HLS_skip', None)
+        if skip in ('YES', 'v2') and server_control.can_skip_until is not None:
+            # Date ranges are only skipped if the playlist allows it, a
+            # plain delta update is served otherwise
+            rendered = rendered.delta(
+                skip == 'v2' and server_control.can_skip_date_ranges ==
+                constant.Yes.YES)
+        return rendered, max_age
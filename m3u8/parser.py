@@ -1,10 +1,68 @@
-from typing import Any, Dict, List, Optional, Tuple
+import itertools
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple,
+    Type, Union)
 
 from . import component
 from . import constant
 from . import tag
 from . import util
-from .error import ParseError
+from .error import LimitError, ParseError
+
+
+class Limits(object):
+    """Limits on the input of a parser, ``None`` for no limit
+
+    Inputs beyond a limit raise ``LimitError``. Lines are checked a batch
+    at a time, before any line of the batch is parsed. ``max_attributes``
+    applies to tag lines, it counts the equals signs outside quoted
+    strings.
+    """
+
+    def __init__(self,
+                 max_line_length: Optional[int] = 1 << 20,
+                 max_lines: Optional[int] = None,
+                 max_attributes: Optional[int] = 1024,
+                 max_segments: Optional[int] = None,
+                 max_renditions: Optional[int] = None,
+                 max_variants: Optional[int] = None):
+        self.max_line_length = max_line_length
+        self.max_lines = max_lines
+        self.max_attributes = max_attributes
+        self.max_segments = max_segments
+        self.max_renditions = max_renditions
+        self.max_variants = max_variants
+
+
+def _check_limit(n: int, limit: Optional[int], what: str):
+    if limit is not None and n > limit:
+        raise LimitError(f'More than {limit} {what}')
+
+
+def _count_attributes(line: str) -> int:
+    return sum(s.count('=') for s in line.split('"')[::2])
+
+
+def _batches(content: Union[str, Iterable[str]],
+             batch_size: int = 1024) -> Iterator[List[str]]:
+    """Lines in batches, split like ``str.splitlines`` splits a string but
+    without holding a list of all of them
+    """
+    if isinstance(content, str):
+        # Chunks end after a newline, so a CRLF is never split
+        start, n = 0, len(content)
+        while start < n:
+            end = content.find('\n', start + batch_size * 64)
+            end = n if end < 0 else end + 1
+            yield content[start:end].splitlines()
+            start = end
+        return
+    lines = iter(content)
+    while True:
+        batch = list(itertools.islice(lines, batch_size))
+        if not batch:
+            return
+        yield batch
 
 
 class ParserMeta(type):
@@ -12,17 +70,48 @@ class ParserMeta(type):
     def __new__(cls, name: str, bases: Tuple, attrs: Dict[str, Any]):
         c = super().__new__(cls, name, bases, attrs)
         c._tag_parsers = {}
+        for b in reversed(c.__mro__[1:]):
+            c._tag_parsers.update(getattr(b, '_tag_parsers', {}))
         tag_parser_prefix = '_parse_tag_'
         for k, v in attrs.items():
             if k.startswith(tag_parser_prefix) and callable(v):
                 c._tag_parsers[k[len(tag_parser_prefix):]] = v
+        c._tag_dispatch = {
+            t.name: (t, c._tag_parsers.get(util.camel_to_snake(t.__name__)))
+            for t in tag.all_tags
+        }
         return c
 
 
 class Parser(object, metaclass=ParserMeta):
+    """M3U8 Parser
+
+    ``content`` is the playlist text or an iterable of its lines, which is
+    consumed as it is parsed. A strict parser raises the first
+    ``ParseError``. Otherwise bad lines are skipped and their errors
+    collected in ``errors``, leaving a partial playlist.
+
+    Tags not known to the parser are kept as raw lines in ``custom_tags``
+    of the segment they precede, with the name of the segment tag they
+    follow in ``custom_tag_anchors``, or of the playlist if they come
+    before the first segment. In master playlists, tags after the first
+    entry go to the variant stream they precede. Tags after the last
+    segment or variant stream go to ``trailing_tags``.
+
+    Input is checked against ``limits``, by default ``Parser.limits``.
+    """
+
+    limits = Limits()
+
+    _custom_tag_names: Set[str] = set()
 
-    def __init__(self, content: str):
+    def __init__(self, content: Union[str, Iterable[str]],
+                 strict: bool = True, limits: Optional[Limits] = None):
         self.content = content
+        self.strict = strict
+        if limits is not None:
+            self.limits = limits
+        self.errors: List[ParseError] = []
 
         self.playlist_type: Optional[constant.PlaylistType] = None
 
@@ -48,13 +137,82 @@ class Parser(object, metaclass=ParserMeta):
         self.i_frame_stream_infs: List[tag.IFrameStreamInf] = []
         self.session_datas: List[tag.SessionData] = []
         self.session_keys: List[tag.SessionKey] = []
+        self.rendition_groups: Dict[Tuple[str, constant.MediaType],
+                                    component.RenditionGroup] = {}
+        self.session_data_ids: Set[Tuple[str, Optional[str]]] = set()
+        self.preload_hint_types: Set[constant.PreloadHintType] = set()
+        self.session_key_set: Set[tag.SessionKey] = set()
 
         self.independent_segments: Optional[tag.IndependentSegments] = None
         self.start: Optional[tag.Start] = None
 
-    @staticmethod
-    def _has_tag(line: str, name: str) -> bool:
-        return line == name or line.startswith(name + ':')
+        self.server_control: Optional[tag.ServerControl] = None
+        self.part_inf: Optional[tag.PartInf] = None
+        self.skip: Optional[tag.Skip] = None
+        self.preload_hints: List[tag.PreloadHint] = []
+        self.rendition_reports: List[tag.RenditionReport] = []
+        self.pending_parts: List[tag.Part] = []
+
+        self.custom_tags: List[tag.CustomTag] = []
+        self.trailing_tags: List[tag.CustomTag] = []
+        # Name of the last tag of the current segment, which the custom
+        # tags that follow it are anchored to
+        self.anchor: Optional[str] = None
+        # Custom tags between master playlist entries, written before the
+        # next variant stream
+        self.variant_custom_tags: List[tag.CustomTag] = []
+
+        # Tags of identical lines are parsed once and shared
+        self.interned_tags: Dict[str, tag.Tag] = {}
+        self.interned_uris: Dict[str, str] = {}
+
+    @classmethod
+    def register_tag(cls, t: Type[tag.Tag],
+                     handler: Optional[
+                         Callable[['Parser', tag.Tag], None]] = None):
+        """Parse lines of tag class ``t`` with ``t.loads``
+
+        The tag is passed to ``handler`` or, by default, kept like an
+        unknown tag by ``add_custom_tag``. Dispatch is a dict lookup by tag
+        name, so the number of registered tags does not affect parse speed.
+        """
+        if t.name in cls._tag_dispatch:
+            raise ValueError(f'Tag {t.name} already registered')
+        if handler is None:
+            handler = Parser.add_custom_tag
+
+        def tag_parser(parser: 'Parser', line: str):
+            handler(parser, t.loads(line))
+
+        cls._tag_dispatch[t.name] = (t, tag_parser)
+        cls._custom_tag_names = cls._custom_tag_names | {t.name}
+
+    @classmethod
+    def unregister_tag(cls, t: Type[tag.Tag]):
+        if t.name not in cls._custom_tag_names:
+            raise ValueError(f'Tag {t.name} not registered')
+        del cls._tag_dispatch[t.name]
+        cls._custom_tag_names = cls._custom_tag_names - {t.name}
+
+    @classmethod
+    def loads_custom_tag(cls, line: str) -> tag.CustomTag:
+        """Parse ``line`` if it is a registered tag, else return it as is
+        """
+        name = line.partition(':')[0]
+        if name in cls._custom_tag_names:
+            return cls._tag_dispatch[name][0].loads(line)
+        return line
+
+    def add_custom_tag(self, t: tag.CustomTag):
+        if self.current_media_segment or self.media_segments:
+            segment = self.current_media_segment
+            tags = segment.setdefault('custom_tags', [])
+            tags.append(t)
+            segment.setdefault('custom_tag_anchors', []).append(self.anchor)
+        elif self.playlist_type == constant.PlaylistType.MASTER:
+            self.variant_custom_tags.append(t)
+        else:
+            self.custom_tags.append(t)
 
     def _check_playlist_type(self,
                              playlist_type: Optional[constant.PlaylistType]):
@@ -66,11 +224,25 @@ class Parser(object, metaclass=ParserMeta):
             if self.playlist_type != playlist_type:
                 raise ParseError('Mixed playlist type')
 
+    def _intern_tag(self, t: Type[tag.Tag], line: str) -> tag.Tag:
+        interned = self.interned_tags.get(line, None)
+        if interned is None:
+            interned = self.interned_tags[line] = t.loads(line)
+        return interned
+
+    def _intern_uri(self, uri: str) -> str:
+        return self.interned_uris.setdefault(uri, uri)
+
     def _check_unique(self, name: str):
         if getattr(self, name, None) is not None:
             name = name.replace('_', ' ')
             raise ParseError(f'Duplicated {name}')
 
+    def _check_variants(self):
+        _check_limit(
+            len(self.stream_infs) + len(self.i_frame_stream_infs) + 1,
+            self.limits.max_variants, 'variant streams')
+
     def _parse_tag_version(self, line: str):
         if self.version is not None:
             raise ParseError('Duplicated version')
@@ -79,7 +251,8 @@ class Parser(object, metaclass=ParserMeta):
     def _parse_tag_ext_inf(self, line: str):
         if 'info' in self.current_media_segment:
             raise ParseError('Unexpected EXTINF')
-        self.current_media_segment['info'] = tag.ExtInf.loads(line)
+        self.current_media_segment['info'] = \
+            self._intern_tag(tag.ExtInf, line)
 
     def _parse_tag_byte_range(self, line: str):
         if 'byte_range' in self.current_media_segment:
@@ -87,14 +260,14 @@ class Parser(object, metaclass=ParserMeta):
         self.current_media_segment['byte_range'] = tag.ByteRange.loads(line)
 
     def _parse_tag_discontinuity(self, line: str):
-        discontinuity = tag.Discontinuity.loads(line)
+        discontinuity = self._intern_tag(tag.Discontinuity, line)
         self.current_media_segment['discontinuity'] = discontinuity
 
     def _parse_tag_key(self, line: str):
-        self.keys.append(tag.Key.loads(line))
+        self.keys.append(self._intern_tag(tag.Key, line))
 
     def _parse_tag_map(self, line: str):
-        self.maps.append(tag.Map.loads(line))
+        self.maps.append(self._intern_tag(tag.Map, line))
 
     def _parse_tag_program_date_time(self, line: str):
         if 'program_date_time' in self.current_media_segment:
@@ -130,10 +303,19 @@ class Parser(object, metaclass=ParserMeta):
         self.i_frames_only = tag.IFramesOnly.loads(line)
 
     def _parse_tag_media(self, line: str):
+        _check_limit(len(self.medias) + 1, self.limits.max_renditions,
+                     'renditions')
         media = tag.Media.loads(line)
         self.medias.append(media)
+        key = (media.group_id, media.type)
+        group = self.rendition_groups.get(key, None)
+        if group is None:
+            group = self.rendition_groups[key] = component.RenditionGroup(
+                media.group_id, media.type)
+        group.renditions.append(media)
 
     def _parse_tag_stream_inf(self, line: str):
+        self._check_variants()
         stream_inf = tag.StreamInf.loads(line)
         if 'info' in self.current_variant_stream:
             raise ParseError('Unexpected STREAM-INF')
@@ -141,21 +323,23 @@ class Parser(object, metaclass=ParserMeta):
         self.current_variant_stream['info'] = stream_inf
 
     def _parse_tag_i_frame_stream_inf(self, line: str):
+        self._check_variants()
         i_frame_stream_inf = tag.IFrameStreamInf.loads(line)
         self.i_frame_stream_infs.append(i_frame_stream_inf)
 
     def _parse_tag_session_data(self, line: str):
         session_data = tag.SessionData.loads(line)
-        for s in self.session_datas:
-            if (session_data.data_id == s.data_id and
-                    session_data.language == s.language):
-                raise ParseError('Duplicated SESSION-DATA')
+        key = (session_data.data_id, session_data.language)
+        if key in self.session_data_ids:
+            raise ParseError('Duplicated SESSION-DATA')
+        self.session_data_ids.add(key)
         self.session_datas.append(session_data)
 
     def _parse_tag_session_key(self, line: str):
         session_key = tag.SessionKey.loads(line)
-        if session_key in self.session_keys:
+        if session_key in self.session_key_set:
             raise ParseError('Duplicated SESSION-KEY')
+        self.session_key_set.add(session_key)
         self.session_keys.append(session_key)
 
     def _parse_tag_independent_segments(self, line: str):
@@ -166,75 +350,168 @@ class Parser(object, metaclass=ParserMeta):
         self._check_unique('start')
         self.start = tag.Start.loads(line)
 
+    def _parse_tag_server_control(self, line: str):
+        self._check_unique('server_control')
+        self.server_control = tag.ServerControl.loads(line)
+
+    def _parse_tag_part_inf(self, line: str):
+        self._check_unique('part_inf')
+        self.part_inf = tag.PartInf.loads(line)
+
+    def _parse_tag_part(self, line: str):
+        if 'info' in self.current_media_segment:
+            raise ParseError('Unexpected PART')
+        self.current_media_segment.setdefault('parts', []).append(
+            tag.Part.loads(line))
+
+    def _parse_tag_preload_hint(self, line: str):
+        preload_hint = tag.PreloadHint.loads(line)
+        if preload_hint.type in self.preload_hint_types:
+            raise ParseError('Duplicated PRELOAD-HINT')
+        self.preload_hint_types.add(preload_hint.type)
+        self.preload_hints.append(preload_hint)
+
+    def _parse_tag_rendition_report(self, line: str):
+        self.rendition_reports.append(tag.RenditionReport.loads(line))
+
+    def _parse_tag_skip(self, line: str):
+        if self.media_segments or self.current_media_segment:
+            raise ParseError('Unexpected SKIP')
+        self._check_unique('skip')
+        self.skip = tag.Skip.loads(line)
+
+    def _rendition_group(self, group_id: Optional[str],
+                         media_type: constant.MediaType
+                         ) -> Optional[component.RenditionGroup]:
+        if group_id is None:
+            return None
+        group = self.rendition_groups.get((group_id, media_type), None)
+        if group is None:
+            self._error(ParseError(f'Group for {media_type} not found'))
+        return group
+
     def _patch_variant_streams(self):
-        rendition_groups: Dict[Tuple[str, constant.MediaType],
-                               component.RenditionGroup] = {}
-        for media in self.medias:
-            key = (media.group_id, media.type)
-            if key not in rendition_groups:
-                rendition_groups[key] = component.RenditionGroup(
-                    media.group_id, media.type)
-            rendition_groups[key].renditions.append(media)
-        media_types: List[Tuple[str, constant.MediaType]] = [
-            ('audio', constant.MediaType.AUDIO),
-            ('video', constant.MediaType.VIDEO),
-            ('subtitles', constant.MediaType.SUBTITLES),
-            ('closed_captions', constant.MediaType.CLOSED_CAPTIONS),
-        ]
-        for i, variant_stream in enumerate(self.variant_streams):
-            for name, media_type in media_types:
-                group_id: Optional[str] = getattr(
-                    variant_stream.info, name, None)
-                if group_id is not None:
-                    group = rendition_groups.get((group_id, media_type), None)
-                    if group is None:
-                        raise ParseError(f'Group for {media_type} not found')
-                    setattr(self.variant_streams[i], name, group)
+        for variant_stream in self.variant_streams:
+            info = variant_stream.info
+            variant_stream.audio = self._rendition_group(
+                info.audio, constant.MediaType.AUDIO)
+            variant_stream.video = self._rendition_group(
+                info.video, constant.MediaType.VIDEO)
+            variant_stream.subtitles = self._rendition_group(
+                info.subtitles, constant.MediaType.SUBTITLES)
+            variant_stream.closed_captions = self._rendition_group(
+                info.closed_captions, constant.MediaType.CLOSED_CAPTIONS)
+
+    def _error(self, e: ParseError):
+        if self.strict or isinstance(e, LimitError):
+            raise e
+        self.errors.append(e)
+
+    def _parse_line(self, line: str):
+        entry = self._tag_dispatch.get(line.partition(':')[0], None)
+        if entry is not None:
+            t, tag_parser = entry
+            if tag_parser is None:
+                raise ParseError(f'Unknown parse for {t.name}')
+            self._check_playlist_type(t.playlist_type)
+            tag_parser(self, line)
+            if t.name not in self._custom_tag_names:
+                self.anchor = t.name
+        elif line.startswith('#EXT'):
+            self.add_custom_tag(line)
+        elif self.current_media_segment:
+            if 'info' not in self.current_media_segment:
+                self.current_media_segment = {}
+                raise ParseError('Missing EXTINF')
+            _check_limit(len(self.media_segments) + 1,
+                         self.limits.max_segments, 'segments')
+            self.current_media_segment['uri'] = self._intern_uri(line)
+            if self.keys:
+                self.current_media_segment['key'] = self.keys[-1]
+            if self.maps:
+                self.current_media_segment['map'] = self.maps[-1]
+            if self.date_ranges:
+                self.current_media_segment['date_range'] = \
+                    self.date_ranges[-1]
+            anchors = self.current_media_segment.get(
+                'custom_tag_anchors', None)
+            if anchors is not None and not any(anchors):
+                del self.current_media_segment['custom_tag_anchors']
+            self.media_segments.append(
+                component.MediaSegment(**self.current_media_segment))
+            self.current_media_segment = {}
+            self.anchor = None
+        elif self.current_variant_stream:
+            self.current_variant_stream['uri'] = line
+            if self.variant_custom_tags:
+                self.current_variant_stream['custom_tags'] = \
+                    self.variant_custom_tags
+                self.variant_custom_tags = []
+            self.variant_streams.append(
+                component.VariantStream(**self.current_variant_stream))
+            self.current_variant_stream = {}
+        else:
+            raise ParseError('Unknown line')
+
+    def _check_limits(self, batch: List[str], line_number: int):
+        """Check a batch of lines following line ``line_number`` against
+        the limits on lines, which are per batch to keep them cheap
+        """
+        limits = self.limits
+        if limits.max_lines is not None and \
+                line_number + len(batch) > limits.max_lines:
+            raise LimitError(f'More than {limits.max_lines} lines',
+                             limits.max_lines + 1)
+        longest = max(map(len, batch), default=0)
+        if limits.max_line_length is not None and \
+                longest > limits.max_line_length:
+            i = next(i for i, line in enumerate(batch)
+                     if len(line) > limits.max_line_length)
+            raise LimitError(
+                f'Line longer than {limits.max_line_length} characters',
+                line_number + i + 1)
+        # Only lines longer than the limit can have too many equals signs
+        if limits.max_attributes is not None and \
+                longest > limits.max_attributes:
+            for i, line in enumerate(batch):
+                if len(line) > limits.max_attributes and \
+                        line.lstrip().startswith('#EXT') and \
+                        _count_attributes(line) > limits.max_attributes:
+                    raise LimitError(
+                        f'More than {limits.max_attributes} attributes',
+                        line_number + i + 1)
 
     def parse(self):
-        lines = [r.strip() for r in self.content.splitlines()]
-        lines = [r for r in lines if r]
-
-        if not lines:
+        header_parsed = False
+        line_number = 0
+        for batch in _batches(self.content):
+            self._check_limits(batch, line_number)
+            for line_number, line in enumerate(batch, line_number + 1):
+                line = line.strip()
+                if not line:
+                    continue
+                if not header_parsed:
+                    if line != constant.EXTM3U:
+                        raise ParseError(
+                            'Unknown file type', line_number, line)
+                    header_parsed = True
+                    continue
+                if line.startswith('#') and not line.startswith('#EXT'):
+                    continue
+                try:
+                    self._parse_line(line)
+                except ParseError as e:
+                    e.line_number, e.line = line_number, line
+                    self._error(e)
+                except Exception as e:
+                    # A bug of a tag parser fails this line only
+                    error = ParseError(f'Invalid line: {e}', line_number,
+                                       line)
+                    error.__cause__ = e
+                    self._error(error)
+
+        if not header_parsed:
             raise ParseError('Empty input')
-        if lines[0] != constant.EXTM3U:
-            raise ParseError('Unknown file type')
-
-        for line in lines[1:]:
-            if line.startswith('#') and not line.startswith('#EXT'):
-                continue
-
-            line_parsed = False
-            for t in tag.all_tags:
-                if self._has_tag(line, t.name):
-                    k = util.camel_to_snake(t.__name__)
-                    if k not in self._tag_parsers:
-                        raise ParseError(f'Unknown parse for {t.name}')
-                    self._check_playlist_type(t.playlist_type)
-                    self._tag_parsers[k](self, line)
-                    line_parsed = True
-                    break
-
-            if not line_parsed:
-                if self.current_media_segment:
-                    self.current_media_segment['uri'] = line
-                    if self.keys:
-                        self.current_media_segment['key'] = self.keys[-1]
-                    if self.maps:
-                        self.current_media_segment['map'] = self.maps[-1]
-                    if self.date_ranges:
-                        self.current_media_segment['date_range'] = \
-                            self.date_ranges[-1]
-                    self.media_segments.append(
-                        component.MediaSegment(**self.current_media_segment))
-                    self.current_media_segment = {}
-                elif self.current_variant_stream:
-                    self.current_variant_stream['uri'] = line
-                    self.variant_streams.append(
-                        component.VariantStream(**self.current_variant_stream))
-                    self.current_variant_stream = {}
-                else:
-                    raise ParseError('Unknown line')
 
         if self.playlist_type == constant.PlaylistType.MEDIA:
             ...
@@ -244,5 +521,20 @@ class Parser(object, metaclass=ParserMeta):
             raise ParseError('Unknown playlist type')
 
         if self.current_variant_stream:
-            raise ParseError('Incomplete variant stream')
+            self._error(ParseError('Incomplete variant stream'))
+            self.current_variant_stream = {}
+        self.pending_parts = self.current_media_segment.get('parts', [])
+        self.trailing_tags = self.current_media_segment.get(
+            'custom_tags', []) + self.variant_custom_tags
         self._patch_variant_streams()
+
+
+def register_tag(t: Type[tag.Tag],
+                 handler: Optional[Callable[[Parser, tag.Tag], None]] = None):
+    """See ``Parser.register_tag``
+    """
+    Parser.register_tag(t, handler)
+
+
+def unregister_tag(t: Type[tag.Tag]):
+    Parser.unregister_tag(t)
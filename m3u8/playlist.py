@@ -1,12 +1,32 @@
+import bisect
+import copy
+import itertools
+import json
 import os
-from typing import List, Optional, Type, TypeVar, Union
+from array import array
+from datetime import datetime, timedelta
+from typing import (
+    IO, TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List,
+    Optional, Tuple, Type, TypeVar, Union)
+from urllib.parse import urlsplit
 
 import requests
 
-from .parser import Parser
+from .error import ParseError
+from .parser import Limits, Parser
 from . import component
+from . import compress
 from . import constant
+from . import jsonio
+from . import selection
+from . import snapshot
 from . import tag
+from . import validation
+from .segments import SegmentRope, Span, Spans, Timeline
+from .uri import resolver
+
+if TYPE_CHECKING:
+    from .cache import PlaylistCache
 
 
 class PlaylistError(Exception):
@@ -33,35 +53,364 @@ class Playlist(object):
             raise PlaylistError('Unknown playlist type')
 
     @classmethod
-    def from_str(cls: Type[P], s: str) -> P:
-        parser = Parser(s)
+    def _from_str(cls: Type[P], s: Union[str, Iterable[str]],
+                  errors: Optional[List[ParseError]] = None,
+                  limits: Optional[Limits] = None) -> P:
+        parser = Parser(s, strict=errors is None, limits=limits)
         parser.parse()
+        if errors is not None:
+            errors.extend(parser.errors)
         return cls._from_parser(parser)
 
     @classmethod
-    def from_bytes(cls: Type[P], b: bytes) -> P:
+    def _from_chunks(cls: Type[P], chunks: Iterable[bytes],
+                     errors: Optional[List[ParseError]] = None,
+                     limits: Optional[Limits] = None,
+                     compression: Optional[str] = None) -> P:
+        """Parse a playlist from chunks of bytes, decompressing gzip or
+        brotli data on the fly
+
+        ``compression`` is the declared one, see ``compress.detect``.
+        """
+        chunks = iter(chunks)
+        head = next(chunks, b'')
+        stream = itertools.chain([head], chunks)
+        max_line_length = (limits or Parser.limits).max_line_length
+        try:
+            compression = compress.detect(head, compression)
+            if compression is not None:
+                stream = compress.decompress(stream, compression)
+            return cls._from_str(
+                compress.iter_lines(stream, max_line_length=max_line_length),
+                errors=errors, limits=limits)
+        except UnicodeDecodeError:
+            raise PlaylistError('Invalid encoding, UTF-8 required')
+        except compress.CompressionError as e:
+            raise PlaylistError(e.message)
+
+    @classmethod
+    def _from_bytes(cls: Type[P], b: bytes,
+                    errors: Optional[List[ParseError]] = None,
+                    limits: Optional[Limits] = None,
+                    compression: Optional[str] = None) -> P:
+        if compress.detect(b[:compress.CHUNK_SIZE], compression) is not None:
+            return cls._from_chunks(compress.iter_chunks(b), errors=errors,
+                                    limits=limits, compression=compression)
         try:
             s = b.decode('utf-8', errors='strict')
         except UnicodeDecodeError:
             raise PlaylistError('Invalid encoding, UTF-8 required')
-        return cls._from_str(s)
+        return cls._from_str(s, errors=errors, limits=limits)
+
+    @classmethod
+    def from_str(cls: Type[P], s: str,
+                 cache: Optional['PlaylistCache'] = None,
+                 errors: Optional[List[ParseError]] = None,
+                 limits: Optional[Limits] = None) -> P:
+        """Parse a playlist
+
+        If ``errors`` is given, bad lines are skipped and their errors are
+        appended to it instead of raised. Such partial parses bypass
+        ``cache``, as do parses with ``limits`` other than the default
+        ``Parser.limits``.
+        """
+        if cache is not None and errors is None and limits is None:
+            return cache.get(s.encode('utf-8'), cls)
+        return cls._from_str(s, errors=errors, limits=limits)
+
+    @classmethod
+    def from_bytes(cls: Type[P], b: bytes,
+                   cache: Optional['PlaylistCache'] = None,
+                   errors: Optional[List[ParseError]] = None,
+                   limits: Optional[Limits] = None,
+                   compression: Optional[str] = None) -> P:
+        """Parse a playlist, which may be compressed with gzip or with
+        brotli if ``compression`` says so
+        """
+        if cache is not None and errors is None and limits is None:
+            return cache.get(b, cls, compression=compression)
+        return cls._from_bytes(b, errors=errors, limits=limits,
+                               compression=compression)
+
+    @classmethod
+    def from_file(cls: Type[P], file: Union[str, bytes, os.PathLike],
+                  cache: Optional['PlaylistCache'] = None,
+                  errors: Optional[List[ParseError]] = None,
+                  limits: Optional[Limits] = None) -> P:
+        """Parse a playlist file, which may be compressed with gzip or
+        with brotli if its extension is ``.br``
+        """
+        compression = compress.from_extension(file)
+        with open(file, 'rb') as f:
+            head = f.read(compress.CHUNK_SIZE)
+            if cache is not None or \
+                    compress.detect(head, compression) is None:
+                return cls.from_bytes(head + f.read(), cache=cache,
+                                      errors=errors, limits=limits,
+                                      compression=compression)
+            chunks = iter(lambda: f.read(compress.CHUNK_SIZE), b'')
+            return cls._from_chunks(itertools.chain([head], chunks),
+                                    errors=errors, limits=limits,
+                                    compression=compression)
+
+    @classmethod
+    def from_url(cls, url: str, cache: Optional['PlaylistCache'] = None,
+                 errors: Optional[List[ParseError]] = None,
+                 limits: Optional[Limits] = None, **kwargs) -> P:
+        """Fetch and parse a playlist
+
+        Without ``cache`` the response is parsed while it is downloaded.
+        ``base_uri`` is set to the final URL of the response.
+        """
+        if cache is not None:
+            res = requests.get(url, **kwargs)
+            res.raise_for_status()
+            # Cached playlists are shared, the URL goes on a shallow copy
+            p = copy.copy(cls.from_bytes(
+                res.content, cache=cache, errors=errors, limits=limits,
+                compression=_declared_compression(res)))
+        else:
+            kwargs.setdefault('stream', True)
+            with requests.get(url, **kwargs) as res:
+                res.raise_for_status()
+                p = cls._from_chunks(
+                    res.iter_content(compress.CHUNK_SIZE), errors=errors,
+                    limits=limits, compression=_declared_compression(res))
+        p.base_uri = res.url
+        return p
+
+    @classmethod
+    def _check_type(cls: Type[P], p: 'Playlist') -> P:
+        if not isinstance(p, cls):
+            raise PlaylistError(
+                f'Playlist type {cls._playlist_type.value} required')
+        return p
 
     @classmethod
-    def from_file(cls: Type[P], file: Union[str, bytes, os.PathLike]) -> P:
-        with open(file, 'r', encoding='utf-8') as f:
-            s = f.read()
-        return cls.from_str(s)
+    def from_snapshot(cls: Type[P],
+                      buffer: Union[bytes, bytearray, memoryview],
+                      lazy: bool = True) -> P:
+        try:
+            p = snapshot.loads(buffer, lazy=lazy)
+        except snapshot.SnapshotError as e:
+            raise PlaylistError(e.message)
+        return cls._check_type(p)
 
     @classmethod
-    def from_url(cls, url: str, **kwargs) -> P:
-        res = requests.get(url, **kwargs)
-        res.raise_for_status()
-        return cls.from_bytes(res.content)
+    def from_snapshot_file(cls: Type[P],
+                           file: Union[str, bytes, os.PathLike]) -> P:
+        try:
+            p = snapshot.load(file)
+        except snapshot.SnapshotError as e:
+            raise PlaylistError(e.message)
+        return cls._check_type(p)
+
+    def to_snapshot(self) -> bytes:
+        return snapshot.dumps(self)
+
+    @classmethod
+    def from_dict(cls: Type[P], d: Dict[str, Any]) -> P:
+        try:
+            p = jsonio.from_dict(d)
+        except (KeyError, TypeError, ValueError, ParseError) as e:
+            raise PlaylistError(f'Invalid playlist dict: {e}')
+        return cls._check_type(p)
+
+    @classmethod
+    def from_json(cls: Type[P], s: Union[str, bytes]) -> P:
+        try:
+            d = json.loads(s)
+        except ValueError as e:
+            raise PlaylistError(f'Invalid JSON: {e}')
+        return cls.from_dict(d)
+
+    def to_dict(self, columnar: bool = False) -> Dict[str, Any]:
+        """Convert to JSON-compatible types
+
+        With ``columnar``, media segments are stored as parallel arrays, see
+        ``jsonio``.
+        """
+        return jsonio.to_dict(self, columnar=columnar)
+
+    def to_json(self, file: Optional[IO[str]] = None,
+                columnar: bool = False) -> Optional[str]:
+        """Encode as JSON, written to ``file`` in chunks if given
+        """
+        chunks = jsonio.iter_json(self, columnar=columnar)
+        if file is None:
+            return ''.join(chunks)
+        for chunk in chunks:
+            file.write(chunk)
+        return None
+
+    def validate(self, rules: Optional[Iterable[str]] = None,
+                 previous: Optional['Playlist'] = None) -> validation.Report:
+        """Check conformance with ``rules``, names from
+        ``validation.RULES``, by default all rules for the playlist type
+
+        ``previous`` is the prior version of a live playlist, which some
+        rules compare against.
+        """
+        return validation.validate(self, rules=rules, previous=previous)
+
+    def iter_lines(self) -> Iterator[str]:
+        """Lines of the M3U8 text of the playlist
+        """
+        raise NotImplementedError
+
+    def dumps(self) -> str:
+        return '\n'.join(self.iter_lines()) + '\n'
+
+    def _iter_bytes(self, compression: Optional[str] = None,
+                    batch_size: int = 1024) -> Iterator[bytes]:
+        def chunks():
+            lines = self.iter_lines()
+            while True:
+                batch = list(itertools.islice(lines, batch_size))
+                if not batch:
+                    return
+                batch.append('')
+                yield '\n'.join(batch).encode('utf-8')
+
+        if compression is None:
+            return chunks()
+        return compress.compress(chunks(), compression)
+
+    def to_bytes(self, compression: Optional[str] = None) -> bytes:
+        """Encode the playlist as UTF-8, compressed with ``compression``
+        (``'gzip'`` or ``'br'``) if given
+        """
+        try:
+            return b''.join(self._iter_bytes(compression))
+        except compress.CompressionError as e:
+            raise PlaylistError(e.message)
+
+    def write(self, file: Union[str, bytes, os.PathLike],
+              compression: Optional[str] = None):
+        """Write the playlist to ``file`` in chunks
+
+        ``compression`` defaults to the one implied by the extension of
+        ``file``, i.e. ``.gz`` or ``.br``.
+        """
+        if compression is None:
+            compression = compress.from_extension(file)
+        try:
+            chunks = self._iter_bytes(compression)
+            with open(file, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+        except compress.CompressionError as e:
+            raise PlaylistError(e.message)
+
+    def _uris(self) -> List[str]:
+        raise NotImplementedError
+
+    def resolve(self, uri: str) -> str:
+        """Resolve ``uri`` against ``base_uri`` like ``urljoin``
+        """
+        if self.base_uri is None:
+            return uri
+        return resolver(self.base_uri).resolve(uri)
+
+    def resolved_uris(self) -> List[str]:
+        """URIs of the media segments, or of the variant streams of a
+        master playlist, resolved against ``base_uri``
+
+        The list is built once per ``base_uri`` and shared, callers must
+        not mutate it.
+        """
+        cached = self._resolved_uris
+        if cached is None or cached[0] != self.base_uri:
+            uris = self._uris()
+            if self.base_uri is not None:
+                uris = resolver(self.base_uri).resolve_all(uris)
+            cached = self._resolved_uris = (self.base_uri, uris)
+        return cached[1]
+
+    def _attributes(self) -> Dict[str, Any]:
+        return {k: v for k, v in self.__dict__.items()
+                if not k.startswith('_')}
+
+
+_NO_KEY = tag.Key(constant.EncryptionMethod.NONE).dumps()
+
+
+def _declared_compression(res: requests.Response) -> Optional[str]:
+    """Compression of a response named by its Content-Encoding header or
+    else by the extension of its URL
+    """
+    compression = compress.from_content_encoding(
+        res.headers.get('Content-Encoding', None))
+    if compression is None:
+        compression = compress.from_extension(urlsplit(res.url).path)
+    return compression
+
+
+def _dumps_custom_tags(tags: Iterable[tag.CustomTag]) -> Iterator[str]:
+    for t in tags:
+        yield t if isinstance(t, str) else t.dumps()
+
+
+def _segment_lines(segment: component.MediaSegment,
+                   key: Optional[tag.Key], map: Optional[tag.Map],
+                   date_range: Optional[tag.DateRange]) -> Iterator[str]:
+    """Lines of ``segment`` without its custom tags, following a segment
+    with ``key``, ``map`` and ``date_range``
+    """
+    if segment.discontinuity is not None:
+        yield segment.discontinuity.dumps()
+    if segment.key is not key and segment.key != key:
+        if segment.key is None:
+            yield _NO_KEY
+        else:
+            yield segment.key.dumps()
+    if segment.map is not None and segment.map is not map and \
+            segment.map != map:
+        yield segment.map.dumps()
+    if segment.program_date_time is not None:
+        yield segment.program_date_time.dumps()
+    if segment.date_range is not None and \
+            segment.date_range is not date_range and \
+            segment.date_range != date_range:
+        yield segment.date_range.dumps()
+    for part in segment.parts:
+        yield part.dumps()
+    yield segment.info.dumps()
+    if segment.byte_range is not None:
+        yield segment.byte_range.dumps()
+    yield segment.uri
+
+
+def _with_custom_tags(lines: Iterable[str], tags: List[tag.CustomTag],
+                      anchors: List[Optional[str]]) -> Iterator[str]:
+    """``lines`` of a segment with its custom tags put back after the first
+    line of the tag they followed, or before the URI if that tag is not
+    written
+    """
+    pending = list(zip(anchors, tags))
+    pending += [(None, t) for t in tags[len(pending):]]
+    yield from _dumps_custom_tags(t for a, t in pending if a is None)
+    pending = [(a, t) for a, t in pending if a is not None]
+    for line in lines:
+        if not pending:
+            yield line
+        elif not line.startswith('#'):
+            yield from _dumps_custom_tags(t for _, t in pending)
+            pending = []
+            yield line
+        else:
+            yield line
+            name = line.partition(':')[0]
+            yield from _dumps_custom_tags(t for a, t in pending if a == name)
+            pending = [(a, t) for a, t in pending if a != name]
 
 
 class MediaPlaylist(Playlist):
     """HLS M3U8 Media Playlist
     """
+
+    _playlist_type = constant.PlaylistType.MEDIA
+
     def __init__(
             self,
             version: Optional[tag.Version] = None,
@@ -73,7 +422,16 @@ class MediaPlaylist(Playlist):
             media_playlist_type: Optional[tag.PlaylistType] = None,
             i_frames_only: Optional[tag.IFramesOnly] = None,
             independent_segments: Optional[tag.IndependentSegments] = None,
-            start: Optional[tag.Start] = None):
+            start: Optional[tag.Start] = None,
+            server_control: Optional[tag.ServerControl] = None,
+            part_inf: Optional[tag.PartInf] = None,
+            skip: Optional[tag.Skip] = None,
+            preload_hints: Optional[List[tag.PreloadHint]] = None,
+            rendition_reports: Optional[List[tag.RenditionReport]] = None,
+            pending_parts: Optional[List[tag.Part]] = None,
+            custom_tags: Optional[List[tag.CustomTag]] = None,
+            trailing_tags: Optional[List[tag.CustomTag]] = None,
+            base_uri: Optional[str] = None):
         self.version = version
         self.media_segments = media_segments or []
         self.target_duration = target_duration
@@ -84,6 +442,469 @@ class MediaPlaylist(Playlist):
         self.i_frames_only = i_frames_only
         self.independent_segments = independent_segments
         self.start = start
+        self.server_control = server_control
+        self.part_inf = part_inf
+        self.skip = skip
+        self.preload_hints = preload_hints or []
+        self.rendition_reports = rendition_reports or []
+        self.pending_parts = pending_parts or []
+        self.custom_tags = custom_tags or []
+        self.trailing_tags = trailing_tags or []
+        self.base_uri = base_uri
+        self._caches: Dict[str, Tuple[Any, int, Any]] = {}
+        self._resolved_uris: Optional[Tuple[Optional[str], List[str]]] = None
+
+    def _cached(self, name: str, build: Callable[[], Any]) -> Any:
+        """Value of cache ``name``, built by ``build`` on first access and
+        again once ``media_segments`` is replaced or changes length
+        """
+        segments = self.media_segments
+        cached = self._caches.get(name, None)
+        if cached is None or cached[0] is not segments or \
+                cached[1] != len(segments):
+            cached = self._caches[name] = (segments, len(segments), build())
+        return cached[2]
+
+    def invalidate(self):
+        """Drop the timeline, fingerprints and spans built so far
+
+        Replacing ``media_segments`` or changing its length is detected,
+        this is only needed after changing segments in place.
+        """
+        self._caches.clear()
+
+    @property
+    def timeline(self) -> Timeline:
+        """Segment start times, discontinuities and program date times,
+        built on first access
+        """
+        return self._cached('timeline',
+                            lambda: Timeline(self.media_segments))
+
+    @property
+    def fingerprints(self) -> array:
+        """Segment fingerprints, built on first access
+        """
+        return self._cached('fingerprints', lambda: array(
+            'q', (s.fingerprint() for s in self.media_segments)))
+
+    def _uris(self) -> List[str]:
+        return [s.uri for s in self.media_segments]
+
+    @property
+    def key_spans(self) -> Spans:
+        """Runs of segments sharing a key, ``None`` for unencrypted ones,
+        built on first access
+        """
+        return self._cached('key_spans', lambda: Spans.of(
+            self.media_segments, lambda s: s.key))
+
+    @property
+    def map_spans(self) -> Spans:
+        """Runs of segments sharing a media initialization section, built
+        on first access
+        """
+        return self._cached('map_spans', lambda: Spans.of(
+            self.media_segments, lambda s: s.map))
+
+    def _build_discontinuity_spans(self) -> Spans:
+        number = 0
+        if self.discontinuity_sequence is not None:
+            number = self.discontinuity_sequence.number
+        n = len(self.media_segments)
+        starts = list(self.timeline.discontinuities)
+        if starts and starts[0] == 0:
+            number += 1
+            starts.pop(0)
+        spans = []
+        for start, stop in zip([0] + starts, starts + [n]):
+            spans.append(Span(start, stop, number))
+            number += 1
+        return Spans(spans if n else [])
+
+    @property
+    def discontinuity_spans(self) -> Spans:
+        """Runs of segments between discontinuities with their
+        discontinuity sequence number, built on first access
+        """
+        number = None
+        if self.discontinuity_sequence is not None:
+            number = self.discontinuity_sequence.number
+        return self._cached(f'discontinuity_spans.{number}',
+                            self._build_discontinuity_spans)
+
+    def segments_with_key(self, key: Optional[tag.Key]
+                          ) -> Iterator[component.MediaSegment]:
+        """Segments encrypted with ``key``, or with a key equal to it,
+        unencrypted ones for ``None``
+        """
+        segments = self.media_segments
+        for span in self.key_spans.spans_of(key):
+            yield from segments[span.start:span.stop]
+
+    @property
+    def first_sequence_number(self) -> int:
+        """Media sequence number of the first segment in ``media_segments``
+        """
+        number = 0
+        if self.media_sequence is not None:
+            number = self.media_sequence.number
+        if self.skip is not None:
+            number += self.skip.skipped_segments
+        return number
+
+    @property
+    def next_sequence_number(self) -> int:
+        """Media sequence number of the segment after the last one, which
+        ``pending_parts`` belong to
+        """
+        return self.first_sequence_number + len(self.media_segments)
+
+    def get_segment(self, msn: int) -> Optional[component.MediaSegment]:
+        i = msn - self.first_sequence_number
+        if 0 <= i < len(self.media_segments):
+            return self.media_segments[i]
+        return None
+
+    def get_part(self, msn: int, part: int) -> Optional[tag.Part]:
+        if msn == self.next_sequence_number:
+            parts = self.pending_parts
+        else:
+            segment = self.get_segment(msn)
+            if segment is None:
+                return None
+            parts = segment.parts
+        if 0 <= part < len(parts):
+            return parts[part]
+        return None
+
+    def window(self, start: int,
+               end: Optional[int] = None) -> 'MediaPlaylist':
+        """Return the playlist of ``media_segments[start:end]``
+
+        Segments are shared, not copied. MEDIA-SEQUENCE and
+        DISCONTINUITY-SEQUENCE are recomputed, and if the first segment has
+        no PROGRAM-DATE-TIME, a copy of it gets one derived from an earlier
+        segment.
+        """
+        n = len(self.media_segments)
+        start, end, _ = slice(start, end).indices(n)
+        end = max(start, end)
+        timeline = self.timeline
+        segments = SegmentRope.of(self.media_segments, start, end)
+        if start < end and \
+                self.media_segments[start].program_date_time is None:
+            date_time = timeline.program_date_time(start)
+            if date_time is not None:
+                first = copy.copy(self.media_segments[start])
+                first.program_date_time = tag.ProgramDateTime(date_time)
+                segments = SegmentRope(
+                    [([first], 0, 1), (segments, 1, len(segments))])
+
+        attrs = self._attributes()
+        attrs['media_segments'] = segments
+        attrs['skip'] = None
+        attrs['media_sequence'] = tag.MediaSequence(
+            self.first_sequence_number + start)
+        discontinuities = timeline.discontinuities_before(start)
+        if self.discontinuity_sequence is not None or discontinuities:
+            number = discontinuities
+            if self.discontinuity_sequence is not None:
+                number += self.discontinuity_sequence.number
+            attrs['discontinuity_sequence'] = \
+                tag.DiscontinuitySequence(number)
+        if start > 0 and self.media_playlist_type is not None and \
+                self.media_playlist_type.type == \
+                constant.MediaPlaylistType.EVENT:
+            attrs['media_playlist_type'] = None
+        if end < n:
+            attrs['pending_parts'] = None
+            attrs['trailing_tags'] = None
+            attrs['preload_hints'] = None
+            attrs['rendition_reports'] = None
+        return MediaPlaylist(**attrs)
+
+    def clip(self, t0: Optional[Union[float, datetime]] = None,
+             t1: Optional[Union[float, datetime]] = None) -> 'MediaPlaylist':
+        """Return the window of segments overlapping ``[t0, t1)``
+
+        Times are offsets in seconds from the first segment, or wall clock
+        times matched against PROGRAM-DATE-TIME.
+        """
+        timeline = self.timeline
+        n = len(self.media_segments)
+
+        def offset(t: Union[float, datetime]) -> float:
+            if isinstance(t, datetime):
+                o = timeline.offset_of(t)
+                if o is None:
+                    raise PlaylistError('Missing PROGRAM-DATE-TIME')
+                return o
+            return t
+
+        start, end = 0, n
+        if t0 is not None:
+            o = offset(t0)
+            start = n if o >= timeline.duration else \
+                max(timeline.index_at(o), 0)
+        if t1 is not None:
+            end = bisect.bisect_left(timeline.start_times, offset(t1), hi=n)
+        return self.window(start, end)
+
+    def _splice_position(
+            self, at: Union[float, datetime, tag.DateRange, tag.MediaSequence]
+    ) -> int:
+        timeline = self.timeline
+        n = len(self.media_segments)
+        if isinstance(at, tag.MediaSequence):
+            i = at.number - self.first_sequence_number
+        else:
+            if isinstance(at, tag.DateRange):
+                at = at.start_date
+            if isinstance(at, datetime):
+                offset = timeline.offset_of(at)
+                if offset is None:
+                    raise PlaylistError('Missing PROGRAM-DATE-TIME')
+                at = offset
+            # Splice at the first segment boundary at or after ``at``
+            i = bisect.bisect_left(timeline.start_times, at - 1e-3, hi=n)
+        if not 0 <= i <= n:
+            raise PlaylistError('Splice point out of range')
+        return i
+
+    def _boundary_segment(self, segment: component.MediaSegment,
+                          date_time: Optional[datetime]
+                          ) -> component.MediaSegment:
+        s = copy.copy(segment)
+        s.discontinuity = tag.Discontinuity(True)
+        if date_time is not None and s.program_date_time is None:
+            s.program_date_time = tag.ProgramDateTime(date_time)
+        return s
+
+    def splice_many(
+            self,
+            breaks: Iterable[Tuple['MediaPlaylist',
+                                   Union[float, datetime, tag.DateRange,
+                                         tag.MediaSequence],
+                                   float]]
+    ) -> 'MediaPlaylist':
+        """Insert playlists at several points, see ``splice``
+
+        ``breaks`` holds ``(playlist, at, replace)`` tuples, ``at`` being an
+        offset in seconds, a wall clock time, a DATERANGE cue or a
+        ``MediaSequence`` tag. All points refer to this playlist, which keeps
+        the cost at O(number of breaks).
+        """
+        segments = self.media_segments
+        n = len(segments)
+        timeline = self.timeline
+        positions = []
+        for k, (other, at, replace) in enumerate(breaks):
+            i = self._splice_position(at)
+            j = i
+            if replace:
+                j = bisect.bisect_left(
+                    timeline.start_times,
+                    timeline.start_times[i] + replace - 1e-3, hi=n)
+            positions.append((i, k, j, other))
+        positions.sort()
+
+        pieces: List[Tuple[Any, int, int, float]] = []
+        boundary = False
+        # Seconds the content after the breaks so far plays later than in
+        # this playlist, by which its PROGRAM-DATE-TIME tags move
+        shift = 0.0
+
+        def date_time(i: int) -> Optional[datetime]:
+            t = timeline.program_date_time(i)
+            if t is None or not shift:
+                return t
+            return t + timedelta(seconds=shift)
+
+        def add_content(start: int, stop: int):
+            if start < stop and boundary:
+                s = self._boundary_segment(segments[start], None)
+                t = date_time(start)
+                if t is not None:
+                    s.program_date_time = tag.ProgramDateTime(t)
+                pieces.append(([s], 0, 1, 0.0))
+                start += 1
+            # Later date times are moved as the segments are read
+            pieces.append((segments, start, stop, shift))
+
+        target_duration = self.target_duration
+        version = self.version
+        content_from = 0
+        for i, _, j, other in positions:
+            if i < content_from:
+                raise PlaylistError('Overlapping splices')
+            add_content(content_from, i)
+            inserted = other.media_segments
+            if len(inserted):
+                pieces.append(([self._boundary_segment(
+                    inserted[0], date_time(i))], 0, 1, 0.0))
+                pieces.append((inserted, 1, len(inserted), 0.0))
+                boundary = True
+            elif j > i:
+                boundary = True
+            content_from = j
+            shift += other.timeline.duration - (
+                timeline.start_times[j] - timeline.start_times[i])
+
+            duration = other.target_duration
+            if duration is None and len(inserted):
+                duration = tag.TargetDuration(
+                    int(round(max(s.info.duration for s in inserted))))
+            if duration is not None and (
+                    target_duration is None or
+                    duration.duration > target_duration.duration):
+                target_duration = duration
+            if other.version is not None and (
+                    version is None or
+                    other.version.version > version.version):
+                version = other.version
+        add_content(content_from, n)
+
+        attrs = self._attributes()
+        attrs['media_segments'] = SegmentRope(pieces)
+        attrs['media_sequence'] = tag.MediaSequence(self.first_sequence_number)
+        attrs['skip'] = None
+        attrs['target_duration'] = target_duration
+        attrs['version'] = version
+        return MediaPlaylist(**attrs)
+
+    def splice(self, other: 'MediaPlaylist',
+               at_time: Union[float, datetime, tag.DateRange, None] = None,
+               replace: float = 0, at_sequence: Optional[int] = None
+               ) -> 'MediaPlaylist':
+        """Insert the segments of ``other`` at ``at_time``, an offset in
+        seconds, a wall clock time or a DATERANGE cue, or before the segment
+        with media sequence number ``at_sequence``
+
+        The point is rounded up to a segment boundary. ``replace`` seconds
+        of content after that point are left out. Both ends of the insertion
+        get a DISCONTINUITY, and a PROGRAM-DATE-TIME if this playlist has
+        one. The content after the insertion plays later or earlier by the
+        difference between the inserted and replaced durations, its
+        PROGRAM-DATE-TIME tags are shifted by as much so that wall clock
+        time keeps increasing. Only the two boundary segments are copied,
+        the rest is shared through a ``SegmentRope`` which shifts the date
+        times as segments are read.
+        """
+        if (at_time is None) == (at_sequence is None):
+            raise PlaylistError('Give one of at_time and at_sequence')
+        if at_sequence is not None:
+            return self.splice_many(
+                [(other, tag.MediaSequence(at_sequence), replace)])
+        return self.splice_many([(other, at_time, replace)])
+
+    @staticmethod
+    def concat(*playlists: 'MediaPlaylist') -> 'MediaPlaylist':
+        """Join playlists with a DISCONTINUITY between each
+        """
+        if not playlists:
+            raise PlaylistError('No playlist to concatenate')
+        first, others = playlists[0], playlists[1:]
+        p = first.splice_many(
+            [(o, tag.MediaSequence(first.next_sequence_number), 0)
+             for o in others])
+        p.end_list = playlists[-1].end_list
+        return p
+
+    def merge_delta(self, delta: 'MediaPlaylist') -> 'MediaPlaylist':
+        """Return ``delta`` with its skipped segments taken from this
+        playlist
+
+        Skipped segments are reused as they are, segments of ``delta`` that
+        have no key or map inherit the ones of the last skipped segment.
+        """
+        if delta.skip is None:
+            return delta
+        start = 0
+        if delta.media_sequence is not None:
+            start = delta.media_sequence.number
+        n = delta.skip.skipped_segments
+        first = start - self.first_sequence_number
+        if first < 0 or first + n > len(self.media_segments):
+            raise PlaylistError('Skipped segments not found')
+        skipped = list(self.media_segments[first:first + n])
+        if skipped:
+            last = skipped[-1]
+            for segment in delta.media_segments:
+                if segment.key is None and last.key is not None:
+                    segment.key = last.key
+                if segment.map is None and last.map is not None:
+                    segment.map = last.map
+        attrs = delta._attributes()
+        attrs['media_segments'] = skipped + list(delta.media_segments)
+        attrs['skip'] = None
+        return MediaPlaylist(**attrs)
+
+    def delta_update(self,
+                     skip_date_ranges: bool = False) -> 'MediaPlaylist':
+        """Return the delta update of this playlist, in which the segments
+        ending at least CAN-SKIP-UNTIL seconds before the end of the
+        playlist are replaced by EXT-X-SKIP
+
+        Unless ``skip_date_ranges`` is true, no segment with a DATERANGE is
+        skipped. The playlist itself is returned if nothing can be skipped.
+        """
+        server_control = self.server_control
+        if self.skip is not None or server_control is None or \
+                server_control.can_skip_until is None:
+            return self
+        timeline = self.timeline
+        n = bisect.bisect_right(
+            timeline.start_times,
+            timeline.duration - server_control.can_skip_until) - 1
+        n = min(n, len(self.media_segments))
+        if not skip_date_ranges:
+            for i in range(max(n, 0)):
+                if self.media_segments[i].date_range is not None:
+                    n = i
+                    break
+        if n <= 0:
+            return self
+        attrs = self._attributes()
+        attrs['media_segments'] = SegmentRope.of(self.media_segments, n)
+        attrs['skip'] = tag.Skip(n)
+        if self.version is None or self.version.version < 9:
+            attrs['version'] = tag.Version(9)
+        return MediaPlaylist(**attrs)
+
+    def iter_lines(self) -> Iterator[str]:
+        """Lines of the M3U8 text of the playlist
+
+        KEY, MAP and DATERANGE tags are written where they change. A key
+        that changes to ``None`` is written as ``METHOD=NONE``. Custom tags
+        are written after the segment tag they followed when parsed.
+        """
+        yield constant.EXTM3U
+        for t in [self.version, self.target_duration, self.media_sequence,
+                  self.discontinuity_sequence, self.media_playlist_type,
+                  self.i_frames_only, self.independent_segments, self.start,
+                  self.server_control, self.part_inf, self.skip]:
+            if t is not None:
+                yield t.dumps()
+        yield from _dumps_custom_tags(self.custom_tags)
+        key = map = date_range = None
+        for segment in self.media_segments:
+            lines = _segment_lines(segment, key, map, date_range)
+            if segment.custom_tags:
+                lines = _with_custom_tags(lines, segment.custom_tags,
+                                          segment.custom_tag_anchors)
+            yield from lines
+            key, map = segment.key, segment.map
+            date_range = segment.date_range
+        for part in self.pending_parts:
+            yield part.dumps()
+        yield from _dumps_custom_tags(self.trailing_tags)
+        for preload_hint in self.preload_hints:
+            yield preload_hint.dumps()
+        for rendition_report in self.rendition_reports:
+            yield rendition_report.dumps()
+        if self.end_list is not None:
+            yield self.end_list.dumps()
 
     @classmethod
     def _from_parser(cls, parser: Parser) -> 'MediaPlaylist':
@@ -100,6 +921,14 @@ class MediaPlaylist(Playlist):
             i_frames_only=parser.i_frames_only,
             independent_segments=parser.independent_segments,
             start=parser.start,
+            server_control=parser.server_control,
+            part_inf=parser.part_inf,
+            skip=parser.skip,
+            preload_hints=parser.preload_hints,
+            rendition_reports=parser.rendition_reports,
+            pending_parts=parser.pending_parts,
+            custom_tags=parser.custom_tags,
+            trailing_tags=parser.trailing_tags,
         )
 
 
@@ -107,6 +936,8 @@ class MasterPlaylist(Playlist):
     """HLS M3U8 Master Playlist
     """
 
+    _playlist_type = constant.PlaylistType.MASTER
+
     def __init__(
             self,
             version: Optional[tag.Version] = None,
@@ -115,7 +946,12 @@ class MasterPlaylist(Playlist):
             session_datas: Optional[List[tag.SessionData]] = None,
             session_keys: Optional[List[tag.SessionKey]] = None,
             independent_segments: Optional[tag.IndependentSegments] = None,
-            start: Optional[tag.Start] = None):
+            start: Optional[tag.Start] = None,
+            rendition_groups: Optional[
+                List[component.RenditionGroup]] = None,
+            custom_tags: Optional[List[tag.CustomTag]] = None,
+            trailing_tags: Optional[List[tag.CustomTag]] = None,
+            base_uri: Optional[str] = None):
         self.version = version
         self.variant_streams = variant_streams or []
         self.i_frame_stream_infs = i_frame_stream_infs or []
@@ -123,6 +959,76 @@ class MasterPlaylist(Playlist):
         self.session_keys = session_keys or []
         self.independent_segments = independent_segments
         self.start = start
+        self.rendition_groups = rendition_groups or []
+        self.custom_tags = custom_tags or []
+        self.trailing_tags = trailing_tags or []
+        self.base_uri = base_uri
+        self._variant_index: Optional[selection.VariantIndex] = None
+        self._resolved_uris: Optional[Tuple[Optional[str], List[str]]] = None
+        self._redundant_variants: Optional[
+            List[List[component.VariantStream]]] = None
+
+    @property
+    def variant_index(self) -> selection.VariantIndex:
+        if self._variant_index is None:
+            self._variant_index = selection.VariantIndex(
+                self.variant_streams, self.rendition_groups)
+        return self._variant_index
+
+    def _uris(self) -> List[str]:
+        return [v.uri for v in self.variant_streams]
+
+    @property
+    def redundant_variants(self) -> List[List[component.VariantStream]]:
+        """Variant streams grouped with their redundant copies, i.e. those
+        with the same ``selection.redundancy_key``, built on first access
+        """
+        if self._redundant_variants is None:
+            self._redundant_variants = selection.redundant_groups(
+                self.variant_streams)
+        return self._redundant_variants
+
+    def alternates(self, variant: component.VariantStream
+                   ) -> List[component.VariantStream]:
+        """``variant`` followed by its redundant copies
+        """
+        for group in self.redundant_variants:
+            if any(v is variant for v in group):
+                return [variant] + [v for v in group if v is not variant]
+        return [variant]
+
+    def alternate_uris(self, variant: component.VariantStream) -> List[str]:
+        """Resolved URIs of ``alternates(variant)``
+        """
+        return [self.resolve(v.uri) for v in self.alternates(variant)]
+
+    def best_variant(self, **kwargs) -> Optional[component.VariantStream]:
+        """See ``selection.VariantIndex.best_variant``
+        """
+        return self.variant_index.best_variant(**kwargs)
+
+    def iter_lines(self) -> Iterator[str]:
+        """Lines of the M3U8 text of the playlist
+        """
+        yield constant.EXTM3U
+        for t in [self.version, self.independent_segments, self.start]:
+            if t is not None:
+                yield t.dumps()
+        yield from _dumps_custom_tags(self.custom_tags)
+        for session_data in self.session_datas:
+            yield session_data.dumps()
+        for session_key in self.session_keys:
+            yield session_key.dumps()
+        for group in self.rendition_groups:
+            for media in group.renditions:
+                yield media.dumps()
+        for variant_stream in self.variant_streams:
+            yield from _dumps_custom_tags(variant_stream.custom_tags)
+            yield variant_stream.info.dumps()
+            yield variant_stream.uri
+        for i_frame_stream_inf in self.i_frame_stream_infs:
+            yield i_frame_stream_inf.dumps()
+        yield from _dumps_custom_tags(self.trailing_tags)
 
     @classmethod
     def _from_parser(cls, parser: Parser) -> 'MasterPlaylist':
@@ -136,4 +1042,7 @@ class MasterPlaylist(Playlist):
             session_keys=parser.session_keys,
             independent_segments=parser.independent_segments,
             start=parser.start,
+            rendition_groups=list(parser.rendition_groups.values()),
+            custom_tags=parser.custom_tags,
+            trailing_tags=parser.trailing_tags,
         )
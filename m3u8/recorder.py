@@ -0,0 +1,596 @@
+"""Append-only on-disk recording of a live media playlist for DVR
+
+A recording directory holds
+
+- ``segments.journal``: one record per media segment in media sequence
+  order, with its duration, URI, byte range, KEY and MAP references and
+  PROGRAM-DATE-TIME
+- ``segments.index``: one fixed-size entry per record with its media
+  sequence number, start offset, wall clock time, discontinuity sequence
+  number and journal position, searched by bisection through ``mmap``
+- ``tags.journal``: the KEY and MAP tag lines records refer to by number
+- ``channel.json``: playlist attributes used for rendering and the shift
+  of media sequence numbers after resets
+
+Records are appended to the journal before their index entries. When a
+recording is opened again, index entries are rebuilt for records the
+index misses and a torn record at the end of the journal is dropped.
+"""
+import bisect
+import json
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, IO, List, Optional, Tuple, Union
+
+import requests
+
+from . import component
+from . import tag
+from .client import PlaylistClient
+from .playlist import MediaPlaylist, PlaylistError
+
+
+MAGIC = b'M3U8JRNL'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sH6x')
+# size, msn, duration, program date time, byte range length and start, key
+# and map references, flags, URI and title lengths
+_RECORD = struct.Struct('<IqddqqiiBII')
+# msn, offset, wall clock time, discontinuity sequence, journal position
+_ENTRY = struct.Struct('<qddqQ')
+_TAG = struct.Struct('<I')
+_MSN = (0, struct.Struct('<q'))
+_OFFSET = (8, struct.Struct('<d'))
+_WALL = (16, struct.Struct('<d'))
+
+_DISCONTINUITY = 1
+_TITLE = 2
+
+# Wall clock time of entries before the first PROGRAM-DATE-TIME, which
+# keeps the wall clock column sorted
+_UNKNOWN = float('-inf')
+
+
+class RecorderError(Exception):
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _timestamp(dt: datetime) -> float:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+class _Column(object):
+    """Field ``offset`` of the index entries, for ``bisect``
+    """
+
+    def __init__(self, buffer: Any, n: int, offset: int,
+                 field: struct.Struct):
+        self.buffer = buffer
+        self.n = n
+        self.offset = offset
+        self.field = field
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __getitem__(self, i: int) -> Any:
+        return self.field.unpack_from(
+            self.buffer, i * _ENTRY.size + self.offset)[0]
+
+
+class _Map(object):
+    """Read-only ``mmap`` of a growing file, remapped once it has grown
+    past the mapped size
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.buffer: Any = b''
+
+    def get(self, size: int) -> Any:
+        if len(self.buffer) < size:
+            self.close()
+            with open(self.path, 'rb') as f:
+                self.buffer = mmap.mmap(f.fileno(), 0,
+                                        access=mmap.ACCESS_READ)
+        return self.buffer
+
+    def close(self):
+        if isinstance(self.buffer, mmap.mmap):
+            self.buffer.close()
+        self.buffer = b''
+
+
+class ChannelRecorder(object):
+    """Records the segments of a live media playlist into ``directory``
+
+    ``record`` appends the segments of a playlist that follow the last
+    recorded one, deduplicated by media sequence number. Missed segments
+    become a discontinuity. When the media sequence of the playlist
+    restarts, i.e. a media sequence number below the next expected one
+    comes back with another URI or was never recorded, the new segments
+    are numbered on from the last recorded one after a discontinuity and
+    counted in ``resets``. ``poll`` and ``run`` reload the playlist from
+    ``url`` with a ``PlaylistClient``, which takes ``session`` and
+    ``kwargs``.
+
+    Any range of recorded segments can be rendered as a playlist with
+    ``window`` or ``live_window``. Segments are looked up by media
+    sequence number, by offset in seconds from the start of the recording
+    or by wall clock time, and only the records of the window are read.
+    """
+
+    journal_name = 'segments.journal'
+    index_name = 'segments.index'
+    tags_name = 'tags.journal'
+    channel_name = 'channel.json'
+
+    def __init__(self, directory: Union[str, os.PathLike],
+                 url: Optional[str] = None,
+                 session: Optional[requests.Session] = None,
+                 sync: bool = False,
+                 **kwargs):
+        self.directory = directory
+        self.sync = sync
+        self.client: Optional[PlaylistClient] = None
+        if url is not None:
+            self.client = PlaylistClient(url, session=session, **kwargs)
+        self.gaps = 0
+        self.resets = 0
+        self.errors = 0
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._journal_map = _Map(self._path(self.journal_name))
+        self._index_map = _Map(self._path(self.index_name))
+        self._channel: Dict[str, Any] = {
+            'version': None, 'target_duration': None, 'end_list': False,
+            'msn_shift': 0}
+        self._tags: List[Union[tag.Key, tag.Map]] = []
+        self._tag_refs: Dict[str, int] = {}
+        self._discontinuity = tag.Discontinuity(True)
+        self._open()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _open(self):
+        try:
+            with open(self._path(self.channel_name)) as f:
+                self._channel.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        self._tags_file = self._open_tags()
+        self._journal = self._open_journal()
+        self._index = open(self._path(self.index_name), 'ab')
+        self._recover()
+
+    def _open_tags(self) -> IO[bytes]:
+        path = self._path(self.tags_name)
+        with open(path, 'a+b') as f:
+            f.seek(0)
+            b = f.read()
+        pos = 0
+        while pos + _TAG.size <= len(b):
+            n = _TAG.unpack_from(b, pos)[0]
+            if pos + _TAG.size + n > len(b):
+                break
+            line = str(b[pos + _TAG.size:pos + _TAG.size + n], 'utf-8')
+            self._add_tag(line)
+            pos += _TAG.size + n
+        os.truncate(path, pos)
+        return open(path, 'ab')
+
+    def _add_tag(self, line: str) -> int:
+        if line.startswith(tag.Map.name):
+            t: Union[tag.Key, tag.Map] = tag.Map.loads(line)
+        else:
+            t = tag.Key.loads(line)
+        ref = self._tag_refs[line] = len(self._tags)
+        self._tags.append(t)
+        return ref
+
+    def _open_journal(self) -> IO[bytes]:
+        path = self._path(self.journal_name)
+        f = open(path, 'ab')
+        if f.tell() == 0:
+            f.write(_HEADER.pack(MAGIC, VERSION))
+            f.flush()
+        else:
+            with open(path, 'rb') as r:
+                head = r.read(_HEADER.size)
+            if len(head) < _HEADER.size or \
+                    _HEADER.unpack(head) != (MAGIC, VERSION):
+                f.close()
+                raise RecorderError(f'Not a version {VERSION} journal')
+        return f
+
+    def _recover(self):
+        journal_size = self._journal.tell()
+        index_size = self._index.tell()
+        n = index_size // _ENTRY.size
+        index = self._index_map.get(n * _ENTRY.size)
+        end = _HEADER.size
+        journal = self._journal_map.get(journal_size)
+        # Entries of records that did not reach the journal
+        while n:
+            pos = _ENTRY.unpack_from(index, (n - 1) * _ENTRY.size)[4]
+            record = self._read_record(journal, pos, journal_size)
+            if record is not None:
+                end = pos + record[0][0]
+                break
+            n -= 1
+        self._count = n
+        self._state = None
+        if n:
+            self._load_state(index, journal)
+        if n * _ENTRY.size != index_size:
+            self._index.truncate(n * _ENTRY.size)
+            self._index_map.close()
+        # Records the index misses
+        entries = []
+        while True:
+            record = self._read_record(journal, end, journal_size)
+            if record is None:
+                break
+            fields = record[0]
+            entries.append(self._entry(fields[1], fields[2], fields[3],
+                                       fields[8] & _DISCONTINUITY, end))
+            end += fields[0]
+        if end != journal_size:
+            self._journal.truncate(end)
+            self._journal_map.close()
+        self._journal_end = end
+        self._append_entries(entries)
+
+    def _read_record(self, journal: Any, pos: int, size: int
+                     ) -> Optional[Tuple[Tuple, str, Optional[str]]]:
+        if pos + _RECORD.size > size:
+            return None
+        fields = _RECORD.unpack_from(journal, pos)
+        uri_length, title_length = fields[9], fields[10]
+        if fields[0] != _RECORD.size + uri_length + title_length or \
+                pos + fields[0] > size:
+            return None
+        p = pos + _RECORD.size
+        uri = str(journal[p:p + uri_length], 'utf-8')
+        title = None
+        if fields[8] & _TITLE:
+            p += uri_length
+            title = str(journal[p:p + title_length], 'utf-8')
+        return fields, uri, title
+
+    def _load_state(self, index: Any, journal: Any):
+        msn, offset, wall, sequence, pos = _ENTRY.unpack_from(
+            index, (self._count - 1) * _ENTRY.size)
+        fields = _RECORD.unpack_from(journal, pos)
+        self._set_state(msn, offset, wall, sequence, fields[2],
+                        fields[8] & _DISCONTINUITY)
+
+    def _set_state(self, msn: int, offset: float, wall: float,
+                   sequence: int, duration: float, discontinuity: int):
+        # Next media sequence number, start offset, wall clock time and
+        # discontinuity sequence number
+        self._state = (msn + 1, offset + duration, wall + duration,
+                       sequence + (1 if discontinuity else 0))
+
+    def _entry(self, msn: int, duration: float, program_date_time: float,
+               discontinuity: int, pos: int, sequence: int = 0,
+               wall: float = _UNKNOWN) -> bytes:
+        """Index entry of a new record, ``sequence`` and ``wall`` are the
+        discontinuity sequence number and the derived wall clock time to
+        use if there is no earlier record
+        """
+        offset = 0.0
+        if self._state is not None:
+            _, offset, end_wall, sequence = self._state
+            if wall == _UNKNOWN:
+                wall = end_wall
+        if not math.isnan(program_date_time):
+            wall = program_date_time
+        self._set_state(msn, offset, wall, sequence, duration,
+                        discontinuity)
+        return _ENTRY.pack(msn, offset, wall, sequence, pos)
+
+    def _append_entries(self, entries: List[bytes]):
+        if not entries:
+            return
+        self._index.write(b''.join(entries))
+        self._index.flush()
+        if self.sync:
+            os.fsync(self._index.fileno())
+        self._count += len(entries)
+
+    def _tag_ref(self, t: Optional[Union[tag.Key, tag.Map]]) -> int:
+        if t is None:
+            return -1
+        line = t.dumps()
+        ref = self._tag_refs.get(line, None)
+        if ref is None:
+            b = line.encode('utf-8')
+            self._tags_file.write(_TAG.pack(len(b)) + b)
+            self._tags_file.flush()
+            ref = self._add_tag(line)
+        return ref
+
+    def _update_channel(self, playlist: MediaPlaylist, msn_shift: int):
+        channel = {
+            'version': None if playlist.version is None
+            else playlist.version.version,
+            'target_duration': None if playlist.target_duration is None
+            else playlist.target_duration.duration,
+            'end_list': playlist.end_list is not None,
+            'msn_shift': msn_shift,
+        }
+        if channel == self._channel:
+            return
+        self._channel = channel
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(channel, f)
+        os.replace(tmp, self._path(self.channel_name))
+
+    def _is_reset(self, segments: List[component.MediaSegment],
+                  first: int) -> bool:
+        """Whether the last segment of ``segments`` numbered from
+        ``first`` below the next expected number has another URI than the
+        one recorded with its number or none was
+        """
+        msn = min(self._state[0], first + len(segments)) - 1
+        if msn < first:
+            return False
+        i = bisect.bisect_left(self._column(_MSN), msn)
+        if i == self._count or self._entry_at(i)[0] != msn:
+            return True
+        journal = self._journal_map.get(self._journal_end)
+        _, uri, _ = self._read_record(
+            journal, self._entry_at(i)[4], self._journal_end)
+        return uri != segments[msn - first].uri
+
+    def record(self, playlist: MediaPlaylist) -> int:
+        """Append the segments of ``playlist`` after the last recorded one
+        and return their number
+
+        Segments with a media sequence number below the next expected one
+        are taken as recorded already, unless the media sequence restarted.
+        """
+        with self._lock:
+            segments = playlist.media_segments
+            shift = self._channel['msn_shift']
+            first = playlist.first_sequence_number + shift
+            start = 0
+            reset = False
+            if self._state is not None:
+                reset = self._is_reset(segments, first)
+                if reset:
+                    shift += self._state[0] - first
+                    first = self._state[0]
+                start = max(self._state[0] - first, 0)
+            self._update_channel(playlist, shift)
+            if start >= len(segments):
+                return 0
+            timeline = playlist.timeline
+            sequence = timeline.discontinuities_before(start)
+            if playlist.discontinuity_sequence is not None:
+                sequence += playlist.discontinuity_sequence.number
+            records, entries = [], []
+            pos = self._journal_end
+            for i in range(start, len(segments)):
+                s = segments[i]
+                msn = first + i
+                flags = 0
+                if s.discontinuity is not None:
+                    flags |= _DISCONTINUITY
+                if i == start and self._state is not None and \
+                        msn > self._state[0]:
+                    self.gaps += 1
+                    flags |= _DISCONTINUITY
+                if i == start and reset:
+                    self.resets += 1
+                    flags |= _DISCONTINUITY
+                if s.info.title is not None:
+                    flags |= _TITLE
+                pdt = math.nan
+                if s.program_date_time is not None:
+                    pdt = _timestamp(s.program_date_time.date_time)
+                wall = _UNKNOWN
+                if i == start:
+                    dt = timeline.program_date_time(i)
+                    if dt is not None:
+                        wall = _timestamp(dt)
+                uri = s.uri.encode('utf-8')
+                title = (s.info.title or '').encode('utf-8')
+                length, offset = -1, -1
+                if s.byte_range is not None:
+                    length = s.byte_range.length
+                    if s.byte_range.start is not None:
+                        offset = s.byte_range.start
+                size = _RECORD.size + len(uri) + len(title)
+                records.append(_RECORD.pack(
+                    size, msn, s.info.duration, pdt, length, offset,
+                    self._tag_ref(s.key), self._tag_ref(s.map), flags,
+                    len(uri), len(title)) + uri + title)
+                entries.append(self._entry(
+                    msn, s.info.duration, pdt, flags & _DISCONTINUITY, pos,
+                    sequence=sequence, wall=wall))
+                pos += size
+            self._journal.write(b''.join(records))
+            self._journal.flush()
+            if self.sync:
+                os.fsync(self._journal.fileno())
+            self._journal_end = pos
+            self._append_entries(entries)
+            return len(records)
+
+    def poll(self) -> int:
+        """Reload the playlist and record its new segments
+        """
+        if self.client is None:
+            raise RecorderError('No URL to poll')
+        return self.record(self.client.reload())
+
+    def reload_delay(self, appended: int) -> float:
+        """Seconds to wait before the next reload, the target duration
+        after new segments and half of it otherwise, none when the server
+        blocks reloads
+        """
+        p = self.client.playlist if self.client is not None else None
+        if p is None or p.target_duration is None:
+            return 1.0
+        if self.client.reload_params().get('_HLS_msn') is not None:
+            return 0.0
+        target = p.target_duration.duration
+        return target if appended else target / 2
+
+    def run(self, stop: threading.Event):
+        """Poll until ``stop`` is set or the playlist ends
+
+        Failed reloads are counted in ``errors`` and retried.
+        """
+        while not stop.is_set():
+            try:
+                appended = self.poll()
+            except (requests.RequestException, PlaylistError):
+                self.errors += 1
+                stop.wait(self.reload_delay(0) or 1.0)
+                continue
+            if self._channel['end_list']:
+                return
+            stop.wait(self.reload_delay(appended))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _column(self, field: Tuple[int, struct.Struct]) -> _Column:
+        index = self._index_map.get(self._count * _ENTRY.size)
+        return _Column(index, self._count, *field)
+
+    def _entry_at(self, i: int) -> Tuple[int, float, float, int, int]:
+        index = self._index_map.get(self._count * _ENTRY.size)
+        return _ENTRY.unpack_from(index, i * _ENTRY.size)
+
+    @property
+    def first_sequence_number(self) -> Optional[int]:
+        return self._entry_at(0)[0] if self._count else None
+
+    @property
+    def next_sequence_number(self) -> Optional[int]:
+        return None if self._state is None else self._state[0]
+
+    @property
+    def duration(self) -> float:
+        """Seconds of media recorded
+        """
+        return 0.0 if self._state is None else self._state[1]
+
+    def sequence_at(self, t: Union[float, datetime]) -> Optional[int]:
+        """Media sequence number of the segment playing at offset ``t``
+        from the start of the recording or at wall clock time ``t``
+
+        ``None`` before the first segment, the last segment after the end.
+        """
+        with self._lock:
+            if isinstance(t, datetime):
+                column, t = self._column(_WALL), _timestamp(t)
+            else:
+                column = self._column(_OFFSET)
+            i = bisect.bisect_right(column, t) - 1
+            if i < 0:
+                return None
+            return self._entry_at(i)[0]
+
+    def _position(self, msn: Optional[int], default: int) -> int:
+        if msn is None:
+            return default
+        return bisect.bisect_left(self._column(_MSN), msn)
+
+    def _segment(self, journal: Any, pos: int
+                 ) -> component.MediaSegment:
+        fields, uri, title = self._read_record(
+            journal, pos, self._journal_end)
+        (_, _, duration, pdt, length, start, key, map_, flags, _,
+         _) = fields
+        return component.MediaSegment(
+            info=tag.ExtInf(duration, title),
+            uri=uri,
+            byte_range=None if length < 0 else tag.ByteRange(
+                length, None if start < 0 else start),
+            discontinuity=self._discontinuity
+            if flags & _DISCONTINUITY else None,
+            key=None if key < 0 else self._tags[key],
+            map=None if map_ < 0 else self._tags[map_],
+            program_date_time=None if math.isnan(pdt)
+            else tag.ProgramDateTime(_datetime(pdt)))
+
+    def window(self, start: Optional[int] = None, end: Optional[int] = None,
+               end_list: Optional[bool] = None) -> MediaPlaylist:
+        """Render recorded segments with media sequence numbers from
+        ``start`` up to ``end`` as a playlist
+
+        By default the playlist has an ENDLIST tag if it stops before the
+        last recorded segment or the recorded playlist ended.
+        """
+        with self._lock:
+            i = self._position(start, 0)
+            j = max(self._position(end, self._count), i)
+            journal = self._journal_map.get(self._journal_end)
+            segments = []
+            for k in range(i, j):
+                segments.append(self._segment(journal, self._entry_at(k)[4]))
+            first, sequence, wall = 0, 0, _UNKNOWN
+            if i < self._count:
+                first, _, wall, sequence, _ = self._entry_at(i)
+            elif self._state is not None:
+                first, _, _, sequence = self._state
+            if end_list is None:
+                end_list = j < self._count or self._channel['end_list']
+        if segments and segments[0].program_date_time is None and \
+                wall != _UNKNOWN:
+            segments[0].program_date_time = tag.ProgramDateTime(
+                _datetime(wall))
+        target = self._channel['target_duration'] or 0
+        if segments:
+            target = max(target, max(
+                int(s.info.duration + 0.5) for s in segments))
+        version = self._channel['version']
+        return MediaPlaylist(
+            version=None if version is None else tag.Version(version),
+            media_segments=segments,
+            target_duration=tag.TargetDuration(target),
+            media_sequence=tag.MediaSequence(first),
+            discontinuity_sequence=tag.DiscontinuitySequence(sequence)
+            if sequence else None,
+            end_list=tag.EndList() if end_list else None)
+
+    def live_window(self, duration: float) -> MediaPlaylist:
+        """Render the last ``duration`` seconds as a live DVR playlist
+        """
+        start = self.sequence_at(max(self.duration - duration, 0.0))
+        return self.window(start, end_list=self._channel['end_list'])
+
+    def close(self):
+        with self._lock:
+            for f in (self._journal, self._index, self._tags_file):
+                f.close()
+            self._journal_map.close()
+            self._index_map.close()
+
+    def __enter__(self) -> 'ChannelRecorder':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,316 @@
+import bisect
+import copy
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timedelta
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Optional,
+                    Tuple, Union)
+
+from . import component
+from . import tag
+from .snapshot import SnapshotSegments
+
+
+Piece = Tuple[Sequence, int, int]
+# A piece whose PROGRAM-DATE-TIME tags are moved by some seconds
+ShiftedPiece = Tuple[Sequence, int, int, float]
+
+
+def _shifted(segment: component.MediaSegment,
+             shift: float) -> component.MediaSegment:
+    if not shift or segment.program_date_time is None:
+        return segment
+    s = copy.copy(segment)
+    s.program_date_time = tag.ProgramDateTime(
+        segment.program_date_time.date_time + timedelta(seconds=shift))
+    return s
+
+
+class SegmentRope(Sequence):
+    """Read-only sequence of media segments made of ranges of other
+    sequences
+
+    Slicing and concatenating ropes only touches the list of ranges, the
+    underlying segments are shared and never copied. A range may move the
+    PROGRAM-DATE-TIME of its segments by a number of seconds, such
+    segments are copied with the new date time each time they are read.
+    """
+
+    def __init__(self, pieces: Iterable[Union[Piece, ShiftedPiece]] = ()):
+        self._pieces: List[ShiftedPiece] = []
+        self._offsets: List[int] = [0]
+        for piece in pieces:
+            source, start, stop = piece[:3]
+            shift = piece[3] if len(piece) > 3 else 0.0
+            if isinstance(source, SegmentRope):
+                for s, a, b, d in source._slice_pieces(start, stop):
+                    self._append(s, a, b, d + shift)
+            else:
+                self._append(source, start, stop, shift)
+
+    @classmethod
+    def of(cls, source: Sequence, start: int = 0,
+           stop: Optional[int] = None) -> 'SegmentRope':
+        start, stop, _ = slice(start, stop).indices(len(source))
+        return cls([(source, start, max(start, stop))])
+
+    def _append(self, source: Sequence, start: int, stop: int,
+                shift: float):
+        if stop <= start:
+            return
+        if self._pieces:
+            last, last_start, last_stop, last_shift = self._pieces[-1]
+            if last is source and last_stop == start and \
+                    last_shift == shift:
+                self._pieces[-1] = (source, last_start, stop, shift)
+                self._offsets[-1] += stop - start
+                return
+        self._pieces.append((source, start, stop, shift))
+        self._offsets.append(self._offsets[-1] + stop - start)
+
+    def _slice_pieces(self, start: int, stop: int) -> Iterator[ShiftedPiece]:
+        if stop <= start:
+            return
+        i = bisect.bisect_right(self._offsets, start) - 1
+        while i < len(self._pieces) and self._offsets[i] < stop:
+            source, s, e, shift = self._pieces[i]
+            offset = self._offsets[i]
+            yield (source, s + max(start - offset, 0),
+                   s + min(stop - offset, e - s), shift)
+            i += 1
+
+    @property
+    def pieces(self) -> List[Union[Piece, ShiftedPiece]]:
+        """Ranges of the rope, with their shift in seconds if they have one
+        """
+        return [piece if piece[3] else piece[:3] for piece in self._pieces]
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                return [self[j] for j in range(start, stop, step)]
+            return SegmentRope([(self, start, max(start, stop))])
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('segment index out of range')
+        j = bisect.bisect_right(self._offsets, i) - 1
+        source, start, _, shift = self._pieces[j]
+        return _shifted(source[start + i - self._offsets[j]], shift)
+
+    def __iter__(self) -> Iterator[component.MediaSegment]:
+        for source, start, stop, shift in self._pieces:
+            if shift:
+                for i in range(start, stop):
+                    yield _shifted(source[i], shift)
+            else:
+                for i in range(start, stop):
+                    yield source[i]
+
+    def __add__(self, other: Sequence) -> 'SegmentRope':
+        return SegmentRope([(self, 0, len(self)), (other, 0, len(other))])
+
+    def __repr__(self) -> str:
+        return f'SegmentRope({len(self)} segments, {len(self._pieces)} pieces)'
+
+
+class Span(object):
+    """Segments ``start`` to ``stop``, not included, sharing ``value``
+    """
+
+    def __init__(self, start: int, stop: int, value: Any):
+        self.start = start
+        self.stop = stop
+        self.value = value
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is type(self):
+            return self.__dict__ == other.__dict__
+        return False
+
+    def __repr__(self) -> str:
+        return f'Span({self.start}, {self.stop}, {self.value!r})'
+
+
+class Spans(Sequence):
+    """Run-length encoded attribute of a sequence of media segments
+
+    Consecutive segments with equal values form one span. Span starts are
+    kept sorted for binary search and spans are grouped by value, so the
+    value of a segment is found in O(log n) and the segments with a given
+    value, e.g. all segments encrypted with a key, are enumerated without
+    a scan.
+    """
+
+    def __init__(self, spans: Iterable[Span] = ()):
+        self._spans = list(spans)
+        self.starts = array('q', (s.start for s in self._spans))
+        self._by_value: Dict[Any, List[Span]] = {}
+        for span in self._spans:
+            self._by_value.setdefault(span.value, []).append(span)
+
+    @classmethod
+    def of(cls, segments: Sequence,
+           value: Callable[[component.MediaSegment], Any]) -> 'Spans':
+        spans: List[Span] = []
+        start, last = 0, None
+        for i, segment in enumerate(segments):
+            v = value(segment)
+            if i == 0:
+                last = v
+            elif v is not last and v != last:
+                spans.append(Span(start, i, last))
+                start, last = i, v
+        if len(segments):
+            spans.append(Span(start, len(segments), last))
+        return cls(spans)
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+    def __getitem__(self, i):
+        return self._spans[i]
+
+    def __iter__(self) -> Iterator[Span]:
+        return iter(self._spans)
+
+    def span_at(self, i: int) -> Span:
+        """Span of segment ``i``
+        """
+        j = bisect.bisect_right(self.starts, i) - 1
+        if j < 0 or i >= self._spans[-1].stop:
+            raise IndexError('segment index out of range')
+        return self._spans[j]
+
+    def at(self, i: int) -> Any:
+        return self.span_at(i).value
+
+    def values(self) -> List[Any]:
+        """Distinct values other than ``None`` in order of first use
+        """
+        return [v for v in self._by_value if v is not None]
+
+    def spans_of(self, value: Any) -> List[Span]:
+        return self._by_value.get(value, [])
+
+    def indexes_of(self, value: Any) -> Iterator[int]:
+        for span in self.spans_of(value):
+            yield from range(span.start, span.stop)
+
+
+def column(segments: Sequence, name: str) -> Sequence:
+    """Column ``name`` of ``segments``, one of
+
+    - ``duration``: EXTINF durations
+    - ``length``, ``start``: byte range lengths and offsets, -1 where
+      missing
+    - ``uri``: values that are equal for equal URIs
+    - ``parts``: number of parts
+
+    Columns of snapshot segments are read from the snapshot, those of
+    other segment stores are extracted in one pass over the segments.
+    """
+    if isinstance(segments, SnapshotSegments):
+        lengths, starts, uris = segments.byte_range_columns
+        offsets = segments.part_offsets
+        n = len(segments)
+        if name == 'duration':
+            return segments.durations
+        elif name == 'length':
+            return [-1] * n if lengths is None else lengths
+        elif name == 'start':
+            return [-1] * n if starts is None else starts
+        elif name == 'uri':
+            return uris
+        elif name == 'parts':
+            if offsets is None:
+                return [0] * n
+            return [b - a for a, b in zip(offsets, offsets[1:])]
+    if name == 'duration':
+        return [s.info.duration for s in segments]
+    elif name == 'length':
+        return [-1 if s.byte_range is None else s.byte_range.length
+                for s in segments]
+    elif name == 'start':
+        return [-1 if s.byte_range is None or s.byte_range.start is None
+                else s.byte_range.start for s in segments]
+    elif name == 'uri':
+        return [s.uri for s in segments]
+    elif name == 'parts':
+        return [len(s.parts) for s in segments]
+    raise KeyError(name)
+
+
+class Timeline(object):
+    """Cumulative timing of a sequence of media segments
+
+    ``start_times[i]`` is the offset in seconds of segment ``i`` from the
+    first segment. Discontinuities and program date times are kept as
+    sorted segment indexes for binary search, date ranges in order of first
+    use.
+    """
+
+    def __init__(self, segments: Sequence):
+        self.start_times = array('d', [0.0])
+        self.discontinuities = array('q')
+        self.program_date_time_indexes = array('q')
+        self.program_date_times: List[datetime] = []
+        self.date_ranges: List[tag.DateRange] = []
+        t = 0.0
+        for i, segment in enumerate(segments):
+            date_range = segment.date_range
+            if date_range is not None and (
+                    not self.date_ranges or
+                    date_range is not self.date_ranges[-1]):
+                self.date_ranges.append(date_range)
+            if segment.discontinuity is not None:
+                self.discontinuities.append(i)
+            if segment.program_date_time is not None:
+                self.program_date_time_indexes.append(i)
+                self.program_date_times.append(
+                    segment.program_date_time.date_time)
+            t += segment.info.duration
+            self.start_times.append(t)
+
+    @property
+    def duration(self) -> float:
+        return self.start_times[-1]
+
+    def index_at(self, t: float) -> int:
+        """Index of the segment playing at offset ``t``
+        """
+        return bisect.bisect_right(self.start_times, t, hi=len(
+            self.start_times) - 1) - 1
+
+    def discontinuities_before(self, i: int) -> int:
+        return bisect.bisect_left(self.discontinuities, i)
+
+    def program_date_time(self, i: int) -> Optional[datetime]:
+        """Wall clock time of segment ``i`` derived from the closest earlier
+        program date time
+        """
+        j = bisect.bisect_right(self.program_date_time_indexes, i) - 1
+        if j < 0:
+            return None
+        k = self.program_date_time_indexes[j]
+        return self.program_date_times[j] + timedelta(
+            seconds=self.start_times[i] - self.start_times[k])
+
+    def offset_of(self, date_time: datetime) -> Optional[float]:
+        """Offset from the first segment of wall clock time ``date_time``
+        """
+        j = bisect.bisect_right(self.program_date_times, date_time) - 1
+        if j < 0:
+            if not self.program_date_times:
+                return None
+            j = 0
+        k = self.program_date_time_indexes[j]
+        return self.start_times[k] + \
+            (date_time - self.program_date_times[j]).total_seconds()
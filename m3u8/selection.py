@@ -0,0 +1,158 @@
+import bisect
+from array import array
+from typing import (
+    Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple)
+
+from . import component
+from . import constant
+from . import tag
+
+
+_HDCP_ORDER = {
+    None: 0,
+    constant.HdcpLevel.NONE: 0,
+    constant.HdcpLevel.TYPE_0: 1,
+}
+
+
+def codec_family(codec: str) -> str:
+    """Return the family of an RFC 6381 codec, e.g. ``avc1`` of
+    ``avc1.4d401f``
+    """
+    return codec.strip().split('.', 1)[0]
+
+
+def codec_families(codecs: Optional[str]) -> FrozenSet[str]:
+    if not codecs:
+        return frozenset()
+    return frozenset(codec_family(c) for c in codecs.split(',') if c.strip())
+
+
+def redundancy_key(info: tag.StreamInf) -> Tuple:
+    """Attributes that redundant variant streams share
+
+    Rendition group IDs are left out, since redundant variants usually
+    refer to renditions on their own hosts.
+    """
+    return (info.bandwidth, info.average_bandwidth,
+            frozenset(c.strip() for c in info.codecs.split(','))
+            if info.codecs else None,
+            info.resolution, info.frame_rate, info.hdcp_level)
+
+
+def redundant_groups(variant_streams: Iterable[component.VariantStream]
+                     ) -> List[List[component.VariantStream]]:
+    """Group variant streams with equal ``redundancy_key``, in order of
+    first appearance
+    """
+    groups: Dict[Tuple, List[component.VariantStream]] = {}
+    for v in variant_streams:
+        groups.setdefault(redundancy_key(v.info), []).append(v)
+    return list(groups.values())
+
+
+_Filter = Tuple[Optional[int], Optional[float], Optional[FrozenSet[str]],
+                Optional[int]]
+
+
+class VariantIndex(object):
+    """Variant streams of a master playlist indexed for selection
+
+    Variants are sorted by bandwidth, with resolution, frame rate, codec
+    families and HDCP level kept in parallel tables. The bandwidth-sorted
+    candidates of each distinct filter are computed once, so repeated
+    ``best_variant`` calls for the same device class take O(log n).
+    """
+
+    max_filters = 256
+
+    def __init__(self,
+                 variant_streams: Sequence[component.VariantStream],
+                 rendition_groups: Sequence[component.RenditionGroup] = ()):
+        variants = sorted(variant_streams, key=lambda v: v.info.bandwidth)
+        self.variants: List[component.VariantStream] = variants
+        self.bandwidths = array('q', (v.info.bandwidth for v in variants))
+        self.heights = array('i', (
+            -1 if v.info.resolution is None else v.info.resolution.height
+            for v in variants))
+        self.widths = array('i', (
+            -1 if v.info.resolution is None else v.info.resolution.width
+            for v in variants))
+        self.frame_rates = array('d', (
+            -1.0 if v.info.frame_rate is None else v.info.frame_rate
+            for v in variants))
+        self.codecs: List[FrozenSet[str]] = [
+            codec_families(v.info.codecs) for v in variants]
+        self.hdcp_levels = array('b', (
+            _HDCP_ORDER[v.info.hdcp_level] for v in variants))
+
+        self.rendition_groups: Dict[Tuple[str, constant.MediaType],
+                                    component.RenditionGroup] = {
+            (g.group_id, g.type): g for g in rendition_groups}
+        for v in variants:
+            for group in (v.audio, v.video, v.subtitles, v.closed_captions):
+                if group is not None:
+                    self.rendition_groups[(group.group_id, group.type)] = group
+
+        self._candidates: Dict[_Filter, Tuple[array, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.variants)
+
+    def _match(self, i: int, f: _Filter) -> bool:
+        max_height, max_frame_rate, codecs, hdcp_level = f
+        if max_height is not None and self.heights[i] > max_height:
+            return False
+        if max_frame_rate is not None and \
+                self.frame_rates[i] > max_frame_rate:
+            return False
+        if codecs is not None and not self.codecs[i] <= codecs:
+            return False
+        if hdcp_level is not None and self.hdcp_levels[i] > hdcp_level:
+            return False
+        return True
+
+    def candidates(self, f: _Filter) -> Tuple[array, List[int]]:
+        c = self._candidates.get(f, None)
+        if c is None:
+            positions = [i for i in range(len(self.variants))
+                         if self._match(i, f)]
+            bandwidths = array('q', (self.bandwidths[i] for i in positions))
+            if len(self._candidates) >= self.max_filters:
+                self._candidates.clear()
+            c = self._candidates[f] = (bandwidths, positions)
+        return c
+
+    def best_variant(
+            self,
+            max_bandwidth: Optional[int] = None,
+            max_height: Optional[int] = None,
+            max_frame_rate: Optional[float] = None,
+            codecs: Optional[Iterable[str]] = None,
+            hdcp_level: Optional[constant.HdcpLevel] = None
+    ) -> Optional[component.VariantStream]:
+        """Return the variant with the highest bandwidth that satisfies all
+        given limits
+
+        ``codecs`` lists the supported codecs or codec families, a variant
+        qualifies if all of its codecs belong to them. ``hdcp_level`` is the
+        highest HDCP level the client supports.
+        """
+        f: _Filter = (
+            max_height,
+            max_frame_rate,
+            None if codecs is None else frozenset(
+                codec_family(c) for c in codecs),
+            None if hdcp_level is None else _HDCP_ORDER[hdcp_level],
+        )
+        if f == (None, None, None, None):
+            bandwidths, positions = self.bandwidths, None
+        else:
+            bandwidths, positions = self.candidates(f)
+        if max_bandwidth is None:
+            i = len(bandwidths)
+        else:
+            i = bisect.bisect_right(bandwidths, max_bandwidth)
+        if i == 0:
+            return None
+        return self.variants[i - 1 if positions is None else positions[i - 1]]
@@ -0,0 +1,649 @@
+"""Compact binary snapshots of parsed playlists
+
+Layout (little-endian)::
+
+    MAGIC VERSION KIND
+    [strings] [objects] [attributes] [segments]
+
+Every section is prefixed with its byte length and padded to 8 bytes.
+Strings (URIs, titles, names) are stored once in a string table. Tags and
+components are stored once in an object table and referenced by index, so
+shared ``tag.Key``/``tag.Map`` instances stay shared after loading. Media
+segments are stored as packed columns and decoded lazily on access, which
+makes loading from ``mmap`` nearly free.
+"""
+import bisect
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from . import component
+from . import constant
+from . import tag
+
+
+MAGIC = b'M3U8SNAP'
+VERSION = 3
+
+KIND_MEDIA = 0
+KIND_MASTER = 1
+
+_HEADER = struct.Struct('<8sHH')
+_SECTION = struct.Struct('<Q')
+_U32 = struct.Struct('<I')
+_I64 = struct.Struct('<q')
+_F64 = struct.Struct('<d')
+_DATETIME = struct.Struct('<qiB')
+
+_NONE = 0
+_TRUE = 1
+_FALSE = 2
+_INT = 3
+_BIGINT = 4
+_FLOAT = 5
+_STR = 6
+_ENUM = 7
+_DATETIME_T = 8
+_RESOLUTION = 9
+_OBJECT = 10
+_LIST = 11
+_DICT = 12
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Segment attributes stored as packed columns, everything else goes to extras
+_SEGMENT_COLUMNS = frozenset([
+    'info', 'uri', 'byte_range', 'discontinuity', 'key', 'map',
+    'program_date_time', 'date_range', 'parts',
+])
+
+
+class SnapshotError(Exception):
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+def _class_name(cls: type) -> str:
+    return f'{cls.__module__}.{cls.__qualname__}'
+
+
+def _subclasses(cls: type) -> List[type]:
+    result = []
+    for c in cls.__subclasses__():
+        result.append(c)
+        result.extend(_subclasses(c))
+    return result
+
+
+def _classes() -> Dict[str, type]:
+    classes: List[type] = _subclasses(tag.Tag)
+    classes.extend(v for v in vars(component).values() if
+                   isinstance(v, type) and v.__module__ == component.__name__)
+    classes.extend(v for v in vars(constant).values()
+                   if isinstance(v, type) and issubclass(v, Enum))
+    return {_class_name(c): c for c in classes}
+
+
+def _is_object(v: Any) -> bool:
+    return isinstance(v, tag.Tag) or \
+        type(v).__module__ == component.__name__
+
+
+def _column(mv: memoryview, typecode: str, n: int) -> Sequence:
+    if sys.byteorder == 'little':
+        return mv.cast('B').cast(typecode)
+    a = array(typecode)
+    a.frombytes(mv.tobytes())
+    a.byteswap()
+    return a
+
+
+def _pack(typecode: str, a: array) -> bytes:
+    if sys.byteorder != 'little':
+        a = array(typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+
+def _pad(buf: bytearray):
+    buf.extend(b'\0' * (-len(buf) % 8))
+
+
+class _Encoder(object):
+
+    def __init__(self):
+        self.strings: Dict[str, int] = {}
+        self.objects: Dict[int, int] = {}
+        self.object_blobs: List[bytes] = []
+        # Keep encoded objects alive so that their ids stay unique
+        self._alive: List[Any] = []
+
+    def string(self, s: str) -> int:
+        i = self.strings.get(s, None)
+        if i is None:
+            i = self.strings[s] = len(self.strings)
+        return i
+
+    def object(self, o: Any) -> int:
+        i = self.objects.get(id(o), None)
+        if i is None:
+            buf = bytearray()
+            buf += _U32.pack(self.string(_class_name(type(o))))
+            self.value(buf, o.__dict__)
+            i = self.objects[id(o)] = len(self.object_blobs)
+            self.object_blobs.append(bytes(buf))
+            self._alive.append(o)
+        return i
+
+    def optional_object(self, o: Any) -> int:
+        return -1 if o is None else self.object(o)
+
+    def value(self, buf: bytearray, v: Any):
+        if v is None:
+            buf.append(_NONE)
+        elif v is True:
+            buf.append(_TRUE)
+        elif v is False:
+            buf.append(_FALSE)
+        elif isinstance(v, Enum):
+            buf.append(_ENUM)
+            buf += _U32.pack(self.string(_class_name(type(v))))
+            self.value(buf, v.value)
+        elif isinstance(v, int):
+            if -(1 << 63) <= v < (1 << 63):
+                buf.append(_INT)
+                buf += _I64.pack(v)
+            else:
+                buf.append(_BIGINT)
+                buf += _U32.pack(self.string(str(v)))
+        elif isinstance(v, float):
+            buf.append(_FLOAT)
+            buf += _F64.pack(v)
+        elif isinstance(v, str):
+            buf.append(_STR)
+            buf += _U32.pack(self.string(v))
+        elif isinstance(v, datetime):
+            buf.append(_DATETIME_T)
+            offset = v.utcoffset()
+            if offset is None:
+                delta, seconds, aware = v - _EPOCH, 0, 0
+            else:
+                delta = v - _EPOCH_UTC
+                seconds, aware = int(offset.total_seconds()), 1
+            buf += _DATETIME.pack(delta // timedelta(microseconds=1),
+                                  seconds, aware)
+        elif isinstance(v, constant.Resolution):
+            buf.append(_RESOLUTION)
+            buf += _U32.pack(v.width)
+            buf += _U32.pack(v.height)
+        elif isinstance(v, (list, tuple)):
+            buf.append(_LIST)
+            buf += _U32.pack(len(v))
+            for item in v:
+                self.value(buf, item)
+        elif isinstance(v, dict):
+            buf.append(_DICT)
+            buf += _U32.pack(len(v))
+            for k, item in v.items():
+                buf += _U32.pack(self.string(k))
+                self.value(buf, item)
+        elif _is_object(v):
+            buf.append(_OBJECT)
+            buf += _U32.pack(self.object(v))
+        else:
+            raise SnapshotError(f'Unsupported type {type(v).__name__}')
+
+    def segments(self, segments: Sequence) -> bytes:
+        n = len(segments)
+        duration = array('d')
+        title = array('i')
+        uri = array('I')
+        length = array('q')
+        start = array('q')
+        discontinuity = array('i')
+        key = array('i')
+        map = array('i')
+        program_date_time = array('i')
+        date_range = array('i')
+        extra_index = array('I')
+        extra_offset = array('Q')
+        part_offset = array('I', [0])
+        part = array('i')
+        extras = bytearray()
+        for i, s in enumerate(segments):
+            duration.append(s.info.duration)
+            title.append(-1 if s.info.title is None
+                         else self.string(s.info.title))
+            uri.append(self.string(s.uri))
+            if s.byte_range is None:
+                length.append(-1)
+                start.append(-1)
+            else:
+                length.append(s.byte_range.length)
+                start.append(-1 if s.byte_range.start is None
+                             else s.byte_range.start)
+            discontinuity.append(self.optional_object(s.discontinuity))
+            key.append(self.optional_object(s.key))
+            map.append(self.optional_object(s.map))
+            program_date_time.append(
+                self.optional_object(s.program_date_time))
+            date_range.append(self.optional_object(s.date_range))
+            part.extend(self.object(p) for p in s.parts)
+            part_offset.append(len(part))
+            extra = {k: v for k, v in s.__dict__.items()
+                     if k not in _SEGMENT_COLUMNS}
+            for name in ('custom_tags', 'custom_tag_anchors'):
+                if not extra.get(name, True):
+                    del extra[name]
+            if extra:
+                extra_index.append(i)
+                extra_offset.append(len(extras))
+                self.value(extras, extra)
+        columns = [('d', duration), ('i', title), ('I', uri),
+                   ('q', length), ('q', start), ('i', discontinuity),
+                   ('i', key), ('i', map), ('i', program_date_time),
+                   ('i', date_range), ('I', extra_index), ('Q', extra_offset),
+                   ('I', part_offset), ('i', part)]
+        # Columns without any value are left out, e.g. byte ranges
+        included = [True, any(v >= 0 for v in title), True]
+        included.extend(any(v >= 0 for v in column)
+                        for _, column in columns[3:10])
+        included.extend([bool(extra_index), bool(extra_index),
+                         bool(part), bool(part)])
+        mask = 0
+        for j, b in enumerate(included):
+            if b:
+                mask |= 1 << j
+        buf = bytearray(struct.pack('<IIII', n, len(extra_index), len(part),
+                                    mask))
+        for j, (typecode, column) in enumerate(columns):
+            if mask & (1 << j):
+                _pad(buf)
+                buf += _pack(typecode, column)
+        _pad(buf)
+        buf += extras
+        return bytes(buf)
+
+    def table(self, blobs: List[bytes]) -> bytes:
+        offsets = array('Q', [0])
+        for b in blobs:
+            offsets.append(offsets[-1] + len(b))
+        buf = bytearray(_U32.pack(len(blobs)))
+        _pad(buf)
+        buf += _pack('Q', offsets)
+        buf += b''.join(blobs)
+        return bytes(buf)
+
+
+def dumps(playlist: Any) -> bytes:
+    """Encode a ``MediaPlaylist`` or ``MasterPlaylist`` as a snapshot
+    """
+    from .playlist import MasterPlaylist, MediaPlaylist
+
+    if isinstance(playlist, MediaPlaylist):
+        kind = KIND_MEDIA
+    elif isinstance(playlist, MasterPlaylist):
+        kind = KIND_MASTER
+    else:
+        raise SnapshotError('Unknown playlist type')
+
+    encoder = _Encoder()
+    attributes = {k: v for k, v in playlist.__dict__.items()
+                  if not k.startswith('_') and k != 'media_segments'}
+    attribute_buf = bytearray()
+    encoder.value(attribute_buf, attributes)
+    segment_buf = b''
+    if kind == KIND_MEDIA:
+        segment_buf = encoder.segments(playlist.media_segments)
+
+    objects = encoder.table(encoder.object_blobs)
+    strings = encoder.table(
+        [s.encode('utf-8', errors='surrogatepass') for s in encoder.strings])
+
+    out = bytearray(_HEADER.pack(MAGIC, VERSION, kind))
+    for section in [strings, objects, bytes(attribute_buf), segment_buf]:
+        _pad(out)
+        out += _SECTION.pack(len(section))
+        out += section
+    return bytes(out)
+
+
+class _Table(object):
+
+    def __init__(self, mv: memoryview):
+        n = _U32.unpack_from(mv, 0)[0]
+        self.n = n
+        self.offsets = _column(mv[8:8 + 8 * (n + 1)], 'Q', n + 1)
+        self.data = mv[8 + 8 * (n + 1):]
+
+    def __len__(self) -> int:
+        return self.n
+
+    def blob(self, i: int) -> memoryview:
+        return self.data[self.offsets[i]:self.offsets[i + 1]]
+
+
+class _Decoder(object):
+
+    def __init__(self, mv: memoryview):
+        if len(mv) < _HEADER.size or \
+                bytes(mv[:len(MAGIC)]) != MAGIC:
+            raise SnapshotError('Not a playlist snapshot')
+        _, version, kind = _HEADER.unpack_from(mv, 0)
+        if version != VERSION:
+            raise SnapshotError(f'Unsupported snapshot version {version}')
+        self.kind = kind
+        self.classes = _classes()
+
+        sections = []
+        pos = _HEADER.size
+        for _ in range(4):
+            pos += -pos % 8
+            size = _SECTION.unpack_from(mv, pos)[0]
+            pos += _SECTION.size
+            sections.append(mv[pos:pos + size])
+            pos += size
+        if pos > len(mv):
+            raise SnapshotError('Truncated snapshot')
+        string_mv, object_mv, self.attribute_mv, self.segment_mv = sections
+
+        self.string_table = _Table(string_mv)
+        self.strings: List[Optional[str]] = [None] * len(self.string_table)
+        self.object_table = _Table(object_mv)
+        self.objects: List[Any] = [None] * len(self.object_table)
+
+    def string(self, i: int) -> str:
+        s = self.strings[i]
+        if s is None:
+            s = self.strings[i] = str(
+                self.string_table.blob(i), 'utf-8', 'surrogatepass')
+        return s
+
+    def object(self, i: int) -> Any:
+        o = self.objects[i]
+        if o is None:
+            mv = self.object_table.blob(i)
+            cls = self.cls(_U32.unpack_from(mv, 0)[0])
+            o = cls.__new__(cls)
+            o.__dict__.update(self.value(mv, _U32.size)[0])
+            self.objects[i] = o
+        return o
+
+    def optional_object(self, i: int) -> Any:
+        return None if i < 0 else self.object(i)
+
+    def cls(self, i: int) -> type:
+        name = self.string(i)
+        try:
+            return self.classes[name]
+        except KeyError:
+            raise SnapshotError(f'Unknown class {name}')
+
+    def value(self, mv: memoryview, pos: int) -> Tuple[Any, int]:
+        t = mv[pos]
+        pos += 1
+        if t == _NONE:
+            return None, pos
+        elif t == _TRUE:
+            return True, pos
+        elif t == _FALSE:
+            return False, pos
+        elif t == _INT:
+            return _I64.unpack_from(mv, pos)[0], pos + _I64.size
+        elif t == _BIGINT:
+            return int(self.string(_U32.unpack_from(mv, pos)[0])), \
+                pos + _U32.size
+        elif t == _FLOAT:
+            return _F64.unpack_from(mv, pos)[0], pos + _F64.size
+        elif t == _STR:
+            return self.string(_U32.unpack_from(mv, pos)[0]), pos + _U32.size
+        elif t == _ENUM:
+            cls = self.cls(_U32.unpack_from(mv, pos)[0])
+            v, pos = self.value(mv, pos + _U32.size)
+            return cls(v), pos
+        elif t == _DATETIME_T:
+            micros, seconds, aware = _DATETIME.unpack_from(mv, pos)
+            delta = timedelta(microseconds=micros)
+            if aware:
+                tz = timezone(timedelta(seconds=seconds))
+                v = (_EPOCH_UTC + delta).astimezone(tz)
+            else:
+                v = _EPOCH + delta
+            return v, pos + _DATETIME.size
+        elif t == _RESOLUTION:
+            width = _U32.unpack_from(mv, pos)[0]
+            height = _U32.unpack_from(mv, pos + _U32.size)[0]
+            r = constant.Resolution.__new__(constant.Resolution)
+            r.width, r.height = width, height
+            return r, pos + 2 * _U32.size
+        elif t == _OBJECT:
+            return self.object(_U32.unpack_from(mv, pos)[0]), pos + _U32.size
+        elif t == _LIST:
+            n = _U32.unpack_from(mv, pos)[0]
+            pos += _U32.size
+            items = []
+            for _ in range(n):
+                v, pos = self.value(mv, pos)
+                items.append(v)
+            return items, pos
+        elif t == _DICT:
+            n = _U32.unpack_from(mv, pos)[0]
+            pos += _U32.size
+            d = {}
+            for _ in range(n):
+                k = self.string(_U32.unpack_from(mv, pos)[0])
+                d[k], pos = self.value(mv, pos + _U32.size)
+            return d, pos
+        raise SnapshotError(f'Unknown value type {t}')
+
+    def attributes(self) -> Dict[str, Any]:
+        return self.value(self.attribute_mv, 0)[0]
+
+
+class SnapshotSegments(Sequence):
+    """Media segments decoded lazily from a snapshot buffer
+    """
+
+    def __init__(self, decoder: _Decoder):
+        mv = decoder.segment_mv
+        n, n_extras, n_parts, mask = struct.unpack_from('<IIII', mv, 0)
+        pos = 16
+        columns: List[Optional[Sequence]] = []
+        for j, (typecode, size) in enumerate([
+                ('d', n), ('i', n), ('I', n), ('q', n), ('q', n), ('i', n),
+                ('i', n), ('i', n), ('i', n), ('i', n), ('I', n_extras),
+                ('Q', n_extras), ('I', n + 1), ('i', n_parts)]):
+            if not mask & (1 << j):
+                columns.append(None)
+                continue
+            pos += -pos % 8
+            nbytes = array(typecode).itemsize * size
+            columns.append(_column(mv[pos:pos + nbytes], typecode, size))
+            pos += nbytes
+        pos += -pos % 8
+        (self._duration, self._title, self._uri, self._length, self._start,
+         self._discontinuity, self._key, self._map, self._program_date_time,
+         self._date_range, self._extra_index, self._extra_offset,
+         self._part_offset, self._part) = columns
+        self._extras = mv[pos:]
+        self._decoder = decoder
+        self._n = n
+        self._segments: List[Optional[component.MediaSegment]] = [None] * n
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._n))]
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError('segment index out of range')
+        s = self._segments[i]
+        if s is None:
+            s = self._segments[i] = self._decode(i)
+        return s
+
+    @property
+    def durations(self) -> Sequence:
+        return self._duration
+
+    @property
+    def byte_range_columns(self) -> Tuple[Optional[Sequence],
+                                          Optional[Sequence], Sequence]:
+        """Byte range lengths and starts, -1 where missing, and string ids
+        of the URIs, which are equal for equal URIs
+        """
+        return self._length, self._start, self._uri
+
+    @property
+    def part_offsets(self) -> Optional[Sequence]:
+        """Parts of segment ``i`` are ``part_offsets[i]`` up to
+        ``part_offsets[i + 1]``
+        """
+        return self._part_offset
+
+    def distinct(self, name: str) -> List[Any]:
+        """Distinct objects of the segment attribute ``name``, e.g.
+        ``key``, decoded without decoding the segments
+        """
+        column = {
+            'discontinuity': self._discontinuity,
+            'key': self._key,
+            'map': self._map,
+            'program_date_time': self._program_date_time,
+            'date_range': self._date_range,
+        }[name]
+        if column is None:
+            return []
+        return [self._decoder.object(j) for j in sorted(set(column))
+                if j >= 0]
+
+    def _object(self, column: Optional[Sequence], i: int) -> Any:
+        if column is None:
+            return None
+        return self._decoder.optional_object(column[i])
+
+    def _decode(self, i: int) -> component.MediaSegment:
+        d = self._decoder
+        info = tag.ExtInf.__new__(tag.ExtInf)
+        info.duration = self._duration[i]
+        info.title = None
+        if self._title is not None and self._title[i] >= 0:
+            info.title = d.string(self._title[i])
+        byte_range = None
+        if self._length is not None and self._length[i] >= 0:
+            byte_range = tag.ByteRange.__new__(tag.ByteRange)
+            byte_range.length = self._length[i]
+            byte_range.start = None
+            if self._start is not None and self._start[i] >= 0:
+                byte_range.start = self._start[i]
+        s = component.MediaSegment.__new__(component.MediaSegment)
+        s.info = info
+        s.uri = d.string(self._uri[i])
+        s.byte_range = byte_range
+        s.discontinuity = self._object(self._discontinuity, i)
+        s.key = self._object(self._key, i)
+        s.map = self._object(self._map, i)
+        s.program_date_time = self._object(self._program_date_time, i)
+        s.date_range = self._object(self._date_range, i)
+        s.parts = []
+        s.custom_tags = []
+        s.custom_tag_anchors = []
+        if self._part is not None:
+            s.parts = [d.object(j) for j in self._part[
+                self._part_offset[i]:self._part_offset[i + 1]]]
+        if self._extra_index is not None:
+            j = bisect.bisect_left(self._extra_index, i)
+            if j < len(self._extra_index) and self._extra_index[j] == i:
+                s.__dict__.update(
+                    d.value(self._extras, self._extra_offset[j])[0])
+        return s
+
+
+def loads(buffer: Union[bytes, bytearray, memoryview, mmap.mmap],
+          lazy: bool = True) -> Any:
+    """Decode a snapshot produced by ``dumps``
+
+    ``buffer`` is referenced, not copied, when ``lazy`` is set, so it may be
+    an ``mmap`` of a snapshot file.
+    """
+    from .playlist import MasterPlaylist, MediaPlaylist
+
+    decoder = _Decoder(memoryview(buffer))
+    attributes = decoder.attributes()
+    if decoder.kind == KIND_MEDIA:
+        segments: Sequence = SnapshotSegments(decoder)
+        if not lazy:
+            segments = list(segments)
+        return MediaPlaylist(media_segments=segments, **attributes)
+    elif decoder.kind == KIND_MASTER:
+        return MasterPlaylist(**attributes)
+    raise SnapshotError('Unknown playlist type')
+
+
+def load(file: Union[str, bytes, os.PathLike]) -> Any:
+    """Decode a snapshot file through a read-only ``mmap``
+
+    The mapping, and the file descriptor it holds, stay open as long as
+    the playlist is referenced. Use ``SnapshotFile`` to close them
+    deterministically.
+    """
+    with open(file, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return loads(mm)
+
+
+class SnapshotFile(object):
+    """A snapshot file mapped with ``mmap`` and its ``playlist``
+
+    ``close`` decodes the segments not decoded yet, so the playlist stays
+    usable, and then closes the mapping.
+    """
+
+    def __init__(self, file: Union[str, bytes, os.PathLike]):
+        with open(file, 'rb') as f:
+            self._mmap: Optional[mmap.mmap] = mmap.mmap(
+                f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.playlist = loads(self._mmap)
+        except BaseException:
+            self._mmap.close()
+            raise
+
+    @property
+    def closed(self) -> bool:
+        return self._mmap is None
+
+    def close(self):
+        if self._mmap is None:
+            return
+        segments = getattr(self.playlist, 'media_segments', None)
+        if isinstance(segments, SnapshotSegments):
+            self.playlist.media_segments = list(segments)
+        del segments
+        if hasattr(self.playlist, 'invalidate'):
+            # The timeline, fingerprints and spans may be views of the
+            # mapping
+            self.playlist.invalidate()
+        try:
+            self._mmap.close()
+        except BufferError:
+            raise SnapshotError('Snapshot buffer is still referenced')
+        self._mmap = None
+
+    def __enter__(self) -> 'SnapshotFile':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -1,5 +1,7 @@
+import re
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from dateutil.parser import isoparse as iso8601_parse
 
@@ -17,6 +19,10 @@ class Attr(object):
         self.required = required
 
 
+def hexadecimal(s: str) -> int:
+    return int(s, 16)
+
+
 def unquote(s: str) -> str:
     if len(s) >= 2 and s.startswith('"') and s.endswith('"'):
         return s[1:-1]
@@ -37,52 +43,100 @@ def convert_value(s: str, attr: Attr) -> Any:
 
 
 def convert_list(s: str, attrs: List[Attr]) -> List[Any]:
-    values = [p.strip() for p in s.split(',')]
+    # The last value takes the rest of the line, e.g. an EXTINF title
+    # containing commas
+    values = [p.strip() for p in s.split(',', len(attrs) - 1)]
     for i in range(min(len(values), len(attrs))):
         values[i] = convert_value(values[i], attrs[i])
     return values
 
 
+# A value runs up to the first comma outside a quoted string, an
+# unterminated quoted string runs to the end. The continuation after the
+# repetition always matches, so there is no backtracking.
+_VALUE = r'((?:[^",]+|"[^"]*")*(?:"[^"]*)?)(,?)'
+_ATTRIBUTE = re.compile(r'([A-Z0-9-]*)=' + _VALUE)
+_ATTRIBUTE_VALUE = re.compile(_VALUE)
+
+
+def _check_attribute_name(name: str):
+    if not all(c.isupper() or c.isdigit() or c == '-' for c in name):
+        raise ParseError('Invalid attribute name')
+
+
 def split_kv(s: str) -> List[Tuple[str, str]]:
-    expect_key = True
-    expect_value = False
-    quoted = False
-    tokens: List[str] = []
-    token = ''
-    for c in s:
-        if expect_key:
-            if quoted:
-                raise ParseError('Illegal attribute')
-            if c == '=':
-                tokens.append(token.strip())
-                token, expect_key, expect_value = '', False, True
-            else:
-                if not (c.isupper() or c.isdigit() or c == '-'):
-                    raise ParseError('Invalid attribute name')
-                token += c
-        elif expect_value:
-            if quoted:
-                if c == '"':
-                    quoted = False
-                token += c
-            else:
-                if c == ',':
-                    tokens.append(token.strip())
-                    token, expect_key, expect_value = '', True, False
-                else:
-                    if c == '"':
-                        quoted = True
-                    token += c
-    if expect_value:
-        tokens.append(token)
-    if len(tokens) % 2 != 0:
-        raise ParseError('Illegal attribute')
+    """Split an attribute list into names and raw values, in linear time
+    """
     result: List[Tuple[str, str]] = []
-    for i in range(0, len(tokens), 2):
-        result.append((tokens[i], tokens[i+1]))
+    n = len(s)
+    pos = 0
+    while pos < n:
+        m = _ATTRIBUTE.match(s, pos)
+        if m is not None:
+            name, value, comma = m.groups()
+        else:
+            # Names with non-ASCII upper case letters or digits, or invalid
+            eq = s.find('=', pos)
+            if eq < 0:
+                # A trailing name without value is ignored
+                _check_attribute_name(s[pos:])
+                break
+            name = s[pos:eq]
+            _check_attribute_name(name)
+            m = _ATTRIBUTE_VALUE.match(s, eq + 1)
+            value, comma = m.groups()
+        if not comma:
+            result.append((name, value))
+            break
+        result.append((name, value.strip()))
+        pos = m.end()
     return result
 
 
+def format_float(v: float) -> str:
+    s = repr(float(v))
+    if 'e' in s:
+        s = f'{v:.9f}'.rstrip('0').rstrip('.')
+    return s
+
+
+def format_datetime(dt: datetime) -> str:
+    timespec = 'milliseconds' if dt.microsecond % 1000 == 0 else 'auto'
+    s = dt.isoformat(timespec=timespec)
+    if s.endswith('+00:00'):
+        s = s[:-6] + 'Z'
+    return s
+
+
+def format_value(v: Any, attr: Attr) -> str:
+    t = attr.type
+    if t is str:
+        # CLOSED-CAPTIONS is a quoted group id or the enumerated NONE
+        if attr.attr == 'CLOSED-CAPTIONS' and v == 'NONE':
+            return v
+        return f'"{v}"'
+    elif t is datetime:
+        # Attribute values are quoted-strings, see dumps of ProgramDateTime
+        return f'"{format_datetime(v)}"'
+    elif t is float:
+        return format_float(v)
+    elif t is hexadecimal:
+        return f'0x{v:032x}'
+    elif isinstance(v, Enum):
+        return v.value
+    else:
+        return str(v)
+
+
+def format_dict(tag: 'Tag', attrs: List[Attr]) -> str:
+    values = []
+    for a in attrs:
+        v = getattr(tag, a.name)
+        if v is not None:
+            values.append(f'{a.attr}={format_value(v, a)}')
+    return ','.join(values)
+
+
 def convert_dict(s: str, attrs: List[Attr]) -> Dict[str, Any]:
     attr_map = {a.attr: a for a in attrs}
     values: Dict[str, Any] = {}
@@ -111,11 +165,24 @@ class Tag(object):
     def loads(cls, line: str) -> 'Tag':
         raise NotImplementedError
 
+    def dumps(self) -> str:
+        # Instance attributes may shadow ``name``, e.g. NAME of EXT-X-MEDIA
+        if not self.attrs:
+            return type(self).name
+        return f'{type(self).name}:{format_dict(self, self.attrs)}'
+
     def __eq__(self, other: Any) -> bool:
         if type(other) is type(self):
             return self.__dict__ == other.__dict__
         return False
 
+    def __hash__(self) -> int:
+        return hash((type(self), frozenset(self.__dict__.items())))
+
+
+# Registered custom tags are parsed, unknown tags are kept as raw lines
+CustomTag = Union[Tag, str]
+
 
 class Version(Tag):
     name = constant.EXT_X_VERSION
@@ -130,6 +197,9 @@ class Version(Tag):
     def loads(cls, line: str) -> 'Version':
         return cls(convert_value(cls._extract(line), cls.attrs[0]))
 
+    def dumps(self) -> str:
+        return f'{self.name}:{format_value(self.version, self.attrs[0])}'
+
 
 class ExtInf(Tag):
     name = constant.EXTINF
@@ -147,6 +217,10 @@ class ExtInf(Tag):
     def loads(cls, line: str) -> 'ExtInf':
         return cls(*convert_list(cls._extract(line), cls.attrs))
 
+    def dumps(self) -> str:
+        title = self.title or ''
+        return f'{self.name}:{format_float(self.duration)},{title}'
+
 
 class ByteRange(Tag):
     name = constant.EXT_X_BYTERANGE
@@ -172,6 +246,11 @@ class ByteRange(Tag):
         else:
             raise ParseError('Unknown BYTERANGE')
 
+    def dumps(self) -> str:
+        if self.start is None:
+            return f'{self.name}:{self.length}'
+        return f'{self.name}:{self.length}@{self.start}'
+
 
 class Discontinuity(Tag):
     name = constant.EXT_X_DISCONTINUITY
@@ -191,7 +270,7 @@ class Key(Tag):
     attrs = [
         Attr('method', 'METHOD', constant.EncryptionMethod, required=True),
         Attr('uri', 'URI', str),
-        Attr('iv', 'IV', int),
+        Attr('iv', 'IV', hexadecimal),
         Attr('key_format', 'KEYFORMAT', str),
         Attr('key_format_versions', 'KEYFORMATVERSIONS', str),
     ]
@@ -253,6 +332,9 @@ class ProgramDateTime(Tag):
     def loads(cls, line: str) -> 'ProgramDateTime':
         return cls(convert_value(cls._extract(line), cls.attrs[0]))
 
+    def dumps(self) -> str:
+        return f'{self.name}:{format_datetime(self.date_time)}'
+
 
 class DateRange(Tag):
     name = constant.EXT_X_DATERANGE
@@ -313,6 +395,9 @@ class TargetDuration(Tag):
     def loads(cls, line: str) -> 'TargetDuration':
         return cls(convert_value(cls._extract(line), cls.attrs[0]))
 
+    def dumps(self) -> str:
+        return f'{self.name}:{format_value(self.duration, self.attrs[0])}'
+
 
 class MediaSequence(Tag):
     name = constant.EXT_X_MEDIA_SEQUENCE
@@ -328,6 +413,9 @@ class MediaSequence(Tag):
     def loads(cls, line: str) -> 'MediaSequence':
         return cls(convert_value(cls._extract(line), cls.attrs[0]))
 
+    def dumps(self) -> str:
+        return f'{self.name}:{format_value(self.number, self.attrs[0])}'
+
 
 class DiscontinuitySequence(Tag):
     name = constant.EXT_X_DISCONTINUITY_SEQUENCE
@@ -343,6 +431,9 @@ class DiscontinuitySequence(Tag):
     def loads(cls, line: str) -> 'DiscontinuitySequence':
         return cls(convert_value(cls._extract(line), cls.attrs[0]))
 
+    def dumps(self) -> str:
+        return f'{self.name}:{format_value(self.number, self.attrs[0])}'
+
 
 class EndList(Tag):
     name = constant.EXT_X_ENDLIST
@@ -370,6 +461,9 @@ class PlaylistType(Tag):
     def loads(cls, line: str) -> 'PlaylistType':
         return cls(convert_value(cls._extract(line), cls.attrs[0]))
 
+    def dumps(self) -> str:
+        return f'{self.name}:{format_value(self.type, self.attrs[0])}'
+
 
 class IFramesOnly(Tag):
     name = constant.EXT_X_I_FRAMES_ONLY
@@ -555,7 +649,7 @@ class SessionKey(Tag):
         Attr('method', 'METHOD', constant.SessionEncryptionMethod,
              required=True),
         Attr('uri', 'URI', str, required=True),
-        Attr('iv', 'IV', int),
+        Attr('iv', 'IV', hexadecimal),
         Attr('key_format', 'KEYFORMAT', str),
         Attr('key_format_versions', 'KEYFORMATVERSIONS', str),
     ]
@@ -605,4 +699,146 @@ class Start(Tag):
         return cls(**convert_dict(cls._extract(line), cls.attrs))
 
 
+class ServerControl(Tag):
+    name = constant.EXT_X_SERVER_CONTROL
+    playlist_type = constant.PlaylistType.MEDIA
+    attrs = [
+        Attr('can_skip_until', 'CAN-SKIP-UNTIL', float),
+        Attr('can_skip_date_ranges', 'CAN-SKIP-DATERANGES', constant.Yes),
+        Attr('hold_back', 'HOLD-BACK', float),
+        Attr('part_hold_back', 'PART-HOLD-BACK', float),
+        Attr('can_block_reload', 'CAN-BLOCK-RELOAD', constant.Yes),
+    ]
+
+    def __init__(self,
+                 can_skip_until: Optional[float] = None,
+                 can_skip_date_ranges: Optional[constant.Yes] = None,
+                 hold_back: Optional[float] = None,
+                 part_hold_back: Optional[float] = None,
+                 can_block_reload: Optional[constant.Yes] = None):
+        self.can_skip_until = can_skip_until
+        self.can_skip_date_ranges = can_skip_date_ranges
+        self.hold_back = hold_back
+        self.part_hold_back = part_hold_back
+        self.can_block_reload = can_block_reload
+
+        if self.can_skip_date_ranges is not None and \
+                self.can_skip_until is None:
+            raise ParseError('Missing CAN-SKIP-UNTIL for CAN-SKIP-DATERANGES')
+
+    @classmethod
+    def loads(cls, line: str) -> 'ServerControl':
+        return cls(**convert_dict(cls._extract(line), cls.attrs))
+
+
+class PartInf(Tag):
+    name = constant.EXT_X_PART_INF
+    playlist_type = constant.PlaylistType.MEDIA
+    attrs = [
+        Attr('part_target', 'PART-TARGET', float, required=True),
+    ]
+
+    def __init__(self, part_target: float):
+        self.part_target = part_target
+
+    @classmethod
+    def loads(cls, line: str) -> 'PartInf':
+        return cls(**convert_dict(cls._extract(line), cls.attrs))
+
+
+class Part(Tag):
+    name = constant.EXT_X_PART
+    playlist_type = constant.PlaylistType.MEDIA
+    attrs = [
+        Attr('duration', 'DURATION', float, required=True),
+        Attr('uri', 'URI', str, required=True),
+        Attr('independent', 'INDEPENDENT', constant.Yes),
+        Attr('byte_range', 'BYTERANGE', str),
+        Attr('gap', 'GAP', constant.Yes),
+    ]
+
+    def __init__(self,
+                 duration: float,
+                 uri: str,
+                 independent: Optional[constant.Yes] = None,
+                 byte_range: Optional[str] = None,
+                 gap: Optional[constant.Yes] = None):
+        self.duration = duration
+        self.uri = uri
+        self.independent = independent
+        self.byte_range = byte_range
+        self.gap = gap
+
+    @classmethod
+    def loads(cls, line: str) -> 'Part':
+        return cls(**convert_dict(cls._extract(line), cls.attrs))
+
+
+class PreloadHint(Tag):
+    name = constant.EXT_X_PRELOAD_HINT
+    playlist_type = constant.PlaylistType.MEDIA
+    attrs = [
+        Attr('type', 'TYPE', constant.PreloadHintType, required=True),
+        Attr('uri', 'URI', str, required=True),
+        Attr('byte_range_start', 'BYTERANGE-START', int),
+        Attr('byte_range_length', 'BYTERANGE-LENGTH', int),
+    ]
+
+    def __init__(self,
+                 type: constant.PreloadHintType,
+                 uri: str,
+                 byte_range_start: Optional[int] = None,
+                 byte_range_length: Optional[int] = None):
+        self.type = type
+        self.uri = uri
+        self.byte_range_start = byte_range_start
+        self.byte_range_length = byte_range_length
+
+    @classmethod
+    def loads(cls, line: str) -> 'PreloadHint':
+        return cls(**convert_dict(cls._extract(line), cls.attrs))
+
+
+class RenditionReport(Tag):
+    name = constant.EXT_X_RENDITION_REPORT
+    playlist_type = constant.PlaylistType.MEDIA
+    attrs = [
+        Attr('uri', 'URI', str, required=True),
+        Attr('last_msn', 'LAST-MSN', int),
+        Attr('last_part', 'LAST-PART', int),
+    ]
+
+    def __init__(self,
+                 uri: str,
+                 last_msn: Optional[int] = None,
+                 last_part: Optional[int] = None):
+        self.uri = uri
+        self.last_msn = last_msn
+        self.last_part = last_part
+
+    @classmethod
+    def loads(cls, line: str) -> 'RenditionReport':
+        return cls(**convert_dict(cls._extract(line), cls.attrs))
+
+
+class Skip(Tag):
+    name = constant.EXT_X_SKIP
+    playlist_type = constant.PlaylistType.MEDIA
+    attrs = [
+        Attr('skipped_segments', 'SKIPPED-SEGMENTS', int, required=True),
+        Attr('recently_removed_date_ranges', 'RECENTLY-REMOVED-DATERANGES',
+             str),
+    ]
+
+    def __init__(self,
+                 skipped_segments: int,
+                 recently_removed_date_ranges: Optional[str] = None):
+        self.skipped_segments = skipped_segments
+        self.recently_removed_date_ranges = recently_removed_date_ranges
+
+    @classmethod
+    def loads(cls, line: str) -> 'Skip':
+        return cls(**convert_dict(cls._extract(line), cls.attrs))
+
+
 all_tags = Tag.__subclasses__()
@@ -0,0 +1,327 @@
+"""Trick-play index over the I-frame playlists of a master playlist
+
+Each I-frames only media playlist is reduced to typed arrays of frame
+start times, byte offsets, lengths and URI ids. Nearest, next and previous
+I-frame lookups are binary searches over the start times, and the frames
+of a thumbnail sprite are fetched with few byte-range requests planned
+from the offsets, without touching the segments.
+"""
+import bisect
+import itertools
+from array import array
+from datetime import datetime
+from typing import (
+    Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union)
+
+from . import tag
+from .playlist import MasterPlaylist, MediaPlaylist
+from .segments import column
+
+
+class IFrame(object):
+    """I-frame ``index`` of a track, ``length`` bytes at ``offset`` of
+    ``uri``
+
+    ``offset`` and ``length`` are ``None`` if the frame is the whole
+    resource. ``time`` is the offset in seconds from the first frame.
+    """
+
+    def __init__(self, index: int, sequence: int, time: float,
+                 duration: float, uri: str, offset: Optional[int],
+                 length: Optional[int]):
+        self.index = index
+        self.sequence = sequence
+        self.time = time
+        self.duration = duration
+        self.uri = uri
+        self.offset = offset
+        self.length = length
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is type(self):
+            return self.__dict__ == other.__dict__
+        return False
+
+    def __repr__(self) -> str:
+        if self.offset is None:
+            return f'IFrame({self.sequence}, {self.time}, {self.uri})'
+        return (f'IFrame({self.sequence}, {self.time}, {self.uri}, '
+                f'{self.length}@{self.offset})')
+
+
+class ByteRangeRequest(object):
+    """Bytes ``start`` up to ``stop`` of ``uri`` holding ``frames``, the
+    whole resource if ``start`` is ``None``
+    """
+
+    def __init__(self, uri: str, start: Optional[int], stop: Optional[int],
+                 frames: List[IFrame]):
+        self.uri = uri
+        self.start = start
+        self.stop = stop
+        self.frames = frames
+
+    @property
+    def length(self) -> Optional[int]:
+        if self.start is None:
+            return None
+        return self.stop - self.start
+
+    @property
+    def range(self) -> Optional[str]:
+        """Value of the ``Range`` header of the request
+        """
+        if self.start is None:
+            return None
+        return f'bytes={self.start}-{self.stop - 1}'
+
+    def extract(self, body: bytes) -> List[bytes]:
+        """Bytes of each of ``frames`` in the response ``body``
+        """
+        base = self.start or 0
+        result = []
+        for frame in self.frames:
+            if frame.offset is None:
+                result.append(body)
+            else:
+                offset = frame.offset - base
+                result.append(body[offset:offset + frame.length])
+        return result
+
+    def __repr__(self) -> str:
+        return (f'ByteRangeRequest({self.uri}, {self.range}, '
+                f'{len(self.frames)} frames)')
+
+
+class IFrameTrack(object):
+    """I-frames of one I-frames only playlist
+
+    ``times`` has the start time of each frame and the end time of the
+    last one. ``offsets`` and ``lengths`` are -1 for frames without byte
+    range; offsets of byte ranges that continue the previous one are
+    resolved.
+    """
+
+    def __init__(self, playlist: MediaPlaylist,
+                 stream_inf: Optional[tag.IFrameStreamInf] = None):
+        if playlist.i_frames_only is None:
+            raise ValueError('Not an I-frames only playlist')
+        self.playlist = playlist
+        self.stream_inf = stream_inf
+        segments = playlist.media_segments
+        self.times = array('d', [0.0])
+        self.times.extend(itertools.accumulate(column(segments, 'duration')))
+        self.lengths = array('q', column(segments, 'length'))
+        self.offsets = array('q')
+        uris = column(segments, 'uri')
+        if isinstance(uris, list):
+            ids: Dict[str, int] = {}
+            self.uri_ids: Sequence[int] = array(
+                'I', (ids.setdefault(uri, len(ids)) for uri in uris))
+        else:
+            # String ids of snapshot segments
+            self.uri_ids = uris
+        last_uri, last_stop = -1, -1
+        for length, start, uri in zip(self.lengths,
+                                      column(segments, 'start'),
+                                      self.uri_ids):
+            if length < 0:
+                offset = last_stop = -1
+            else:
+                if start >= 0:
+                    offset = start
+                elif uri == last_uri and last_stop >= 0:
+                    offset = last_stop
+                else:
+                    offset = 0
+                last_stop = offset + length
+            last_uri = uri
+            self.offsets.append(offset)
+
+    def __len__(self) -> int:
+        return len(self.times) - 1
+
+    @property
+    def duration(self) -> float:
+        return self.times[-1]
+
+    def frame(self, i: int) -> IFrame:
+        if not 0 <= i < len(self):
+            raise IndexError('frame index out of range')
+        p = self.playlist
+        offset: Optional[int] = self.offsets[i]
+        length: Optional[int] = self.lengths[i]
+        if offset < 0:
+            offset = length = None
+        return IFrame(i, p.first_sequence_number + i, self.times[i],
+                      self.times[i + 1] - self.times[i],
+                      p.resolve(p.media_segments[i].uri), offset, length)
+
+    def _offset(self, t: Union[float, datetime]) -> float:
+        if isinstance(t, datetime):
+            offset = self.playlist.timeline.offset_of(t)
+            if offset is None:
+                raise ValueError('No PROGRAM-DATE-TIME to locate '
+                                 f'{t.isoformat()}')
+            return offset
+        return t
+
+    def nearest(self, t: Union[float, datetime]) -> Optional[IFrame]:
+        """The frame starting closest to ``t``, the earlier one on a tie
+        """
+        n = len(self)
+        if n == 0:
+            return None
+        t = self._offset(t)
+        i = bisect.bisect_right(self.times, t, 0, n)
+        if i == n or (i > 0 and
+                      t - self.times[i - 1] <= self.times[i] - t):
+            i -= 1
+        return self.frame(i)
+
+    def next(self, t: Union[float, datetime]) -> Optional[IFrame]:
+        """The first frame starting after ``t``
+        """
+        n = len(self)
+        i = bisect.bisect_right(self.times, self._offset(t), 0, n)
+        return self.frame(i) if i < n else None
+
+    def previous(self, t: Union[float, datetime]) -> Optional[IFrame]:
+        """The last frame starting before ``t``
+        """
+        i = bisect.bisect_left(self.times, self._offset(t), 0, len(self))
+        return self.frame(i - 1) if i > 0 else None
+
+    def evenly_spaced(self, count: int, start: float = 0.0,
+                      end: Optional[float] = None) -> List[IFrame]:
+        """The frames nearest to ``count`` times evenly spaced from
+        ``start`` up to ``end``, by default the end of the track
+
+        Frames repeat if the track has fewer frames than asked for.
+        """
+        if count < 1:
+            raise ValueError('count must be positive')
+        if end is None:
+            end = self.duration
+        step = (end - start) / count
+        return [f for f in (self.nearest(start + k * step)
+                            for k in range(count)) if f is not None]
+
+    def plan(self, frames: Iterable[IFrame], max_gap: int = 0,
+             max_request: Optional[int] = None) -> List[ByteRangeRequest]:
+        """Requests fetching ``frames``
+
+        Byte ranges of the same URI are merged into one request when at
+        most ``max_gap`` unneeded bytes separate them, as long as the
+        request stays within ``max_request`` bytes. Requests are ordered
+        by their first frame.
+        """
+        indexes = sorted({f.index for f in frames},
+                         key=lambda i: (self.uri_ids[i], self.offsets[i]))
+        requests: List[ByteRangeRequest] = []
+        current: Optional[ByteRangeRequest] = None
+        current_uri = -1
+        for i in indexes:
+            frame = self.frame(i)
+            uri = self.uri_ids[i]
+            if current is not None and uri == current_uri:
+                if frame.offset is None or current.start is None:
+                    if frame.offset is None and current.start is None:
+                        current.frames.append(frame)
+                        continue
+                else:
+                    stop = max(current.stop, frame.offset + frame.length)
+                    if frame.offset - current.stop <= max_gap and (
+                            max_request is None or
+                            stop - current.start <= max_request):
+                        current.stop = stop
+                        current.frames.append(frame)
+                        continue
+            if frame.offset is None:
+                current = ByteRangeRequest(frame.uri, None, None, [frame])
+            else:
+                current = ByteRangeRequest(
+                    frame.uri, frame.offset, frame.offset + frame.length,
+                    [frame])
+            current_uri = uri
+            requests.append(current)
+        for request in requests:
+            request.frames.sort(key=lambda f: f.index)
+        requests.sort(key=lambda r: r.frames[0].index)
+        return requests
+
+    def sprite(self, count: int, start: float = 0.0,
+               end: Optional[float] = None, max_gap: int = 0,
+               max_request: Optional[int] = None
+               ) -> Tuple[List[IFrame], List[ByteRangeRequest]]:
+        """The frames of a sprite of ``count`` evenly spaced thumbnails,
+        in tile order, and the requests fetching them
+        """
+        frames = self.evenly_spaced(count, start, end)
+        return frames, self.plan(frames, max_gap, max_request)
+
+
+class TrickPlayIndex(object):
+    """I-frame tracks of a master playlist by the URI of their
+    I-FRAME-STREAM-INF
+    """
+
+    def __init__(self):
+        self._tracks: Dict[str, IFrameTrack] = {}
+
+    @classmethod
+    def from_master(cls, master: MasterPlaylist,
+                    load: Optional[Callable[[str], MediaPlaylist]] = None
+                    ) -> 'TrickPlayIndex':
+        """Index the I-frame playlists of ``master``, loaded with
+        ``load(uri)`` from their resolved URIs
+        """
+        if load is None:
+            load = MediaPlaylist.from_url
+        index = cls()
+        for stream_inf in master.i_frame_stream_infs:
+            index.add(stream_inf, load(master.resolve(stream_inf.uri)))
+        return index
+
+    @property
+    def tracks(self) -> List[IFrameTrack]:
+        return list(self._tracks.values())
+
+    def add(self, stream_inf: tag.IFrameStreamInf,
+            playlist: MediaPlaylist) -> IFrameTrack:
+        """Add the I-frame playlist of ``stream_inf`` or replace the
+        previous version of it
+        """
+        track = self._tracks[stream_inf.uri] = IFrameTrack(
+            playlist, stream_inf)
+        return track
+
+    def track(self, uri: str) -> IFrameTrack:
+        return self._tracks[uri]
+
+    def remove(self, uri: str):
+        del self._tracks[uri]
+
+    def for_variant(self, variant: tag.StreamInf) -> Optional[IFrameTrack]:
+        """The track to scrub ``variant`` with
+
+        Tracks of the same VIDEO group and resolution are preferred, among
+        them the one with the highest bandwidth not above that of
+        ``variant``, or else the one with the lowest bandwidth.
+        """
+        candidates: Sequence[IFrameTrack] = self.tracks
+        if variant.video is not None:
+            candidates = [t for t in candidates
+                          if t.stream_inf.video == variant.video] or \
+                candidates
+        if variant.resolution is not None:
+            candidates = [t for t in candidates
+                          if t.stream_inf.resolution == variant.resolution
+                          ] or candidates
+        if not candidates:
+            return None
+        below = [t for t in candidates
+                 if t.stream_inf.bandwidth <= variant.bandwidth]
+        if below:
+            return max(below, key=lambda t: t.stream_inf.bandwidth)
+        return min(candidates, key=lambda t: t.stream_inf.bandwidth)
@@ -0,0 +1,96 @@
+"""Resolution of relative URIs against the URL of a playlist
+
+``URIResolver`` gives the same results as ``urllib.parse.urljoin``. The
+base URL is parsed once, and the common cases, i.e. plain relative paths,
+absolute paths and absolute URLs that ``urljoin`` returns unchanged, are
+handled by string operations. Other URIs go through ``urljoin``.
+"""
+import functools
+import re
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlsplit, uses_relative
+
+_SCHEME = re.compile(r'[A-Za-z][A-Za-z0-9+.-]*:')
+
+# Characters that urlsplit strips, removes or validates specially
+_UNSAFE = frozenset([chr(i) for i in range(33)] + ['\x7f', '[', ']', '\\'])
+
+
+def _scheme(uri: str) -> Optional[str]:
+    m = _SCHEME.match(uri)
+    if m is None:
+        return None
+    return uri[:m.end() - 1].lower()
+
+
+def _plain_tail(uri: str) -> Optional[str]:
+    """Path of ``uri`` if ``urljoin`` rebuilds its query and fragment as
+    they are, else ``None``
+    """
+    path, sep, fragment = uri.partition('#')
+    if sep and not fragment:
+        return None
+    path, sep, query = path.partition('?')
+    if sep and not query:
+        return None
+    if ';' in path:
+        return None
+    return path
+
+
+def _plain_path(path: str) -> bool:
+    """Whether ``path`` has no dot or empty segments
+    """
+    p = '/' + path + '/'
+    return '/./' not in p and '/../' not in p and '//' not in path
+
+
+class URIResolver(object):
+    """Resolves URIs against ``base`` like ``urljoin``
+    """
+
+    def __init__(self, base: str):
+        self.base = base
+        self.scheme = urlsplit(base).scheme
+        self._directory: Optional[str] = None
+        self._origin: Optional[str] = None
+        self._cache: Dict[str, str] = {}
+        if base and self.scheme in uses_relative:
+            directory = urljoin(base, '_')[:-1]
+            origin = urljoin(base, '/_')[:-1]
+            if directory.endswith('/') and origin.endswith('/'):
+                self._directory = directory
+                self._origin = origin[:-1]
+
+    def resolve(self, uri: str) -> str:
+        if not self.base:
+            return uri
+        if uri.isascii() and _UNSAFE.isdisjoint(uri):
+            scheme = _scheme(uri)
+            if scheme is not None and scheme != self.scheme:
+                return uri
+            path = _plain_tail(uri)
+            if path and self._directory is not None:
+                if scheme is None:
+                    if path[:1] != '/':
+                        if ':' not in path and _plain_path(path):
+                            return self._directory + uri
+                    elif path[1:2] != '/' and _plain_path(path[1:]):
+                        return self._origin + uri
+                elif uri[:len(scheme)] == scheme and \
+                        uri[len(scheme):len(scheme) + 3] == '://' and \
+                        uri[len(scheme) + 3:len(scheme) + 4] not in '/?#':
+                    return uri
+        resolved = self._cache.get(uri, None)
+        if resolved is None:
+            resolved = self._cache[uri] = urljoin(self.base, uri)
+        return resolved
+
+    def resolve_all(self, uris: Iterable[str]) -> List[str]:
+        resolve = self.resolve
+        return [resolve(uri) for uri in uris]
+
+
+@functools.lru_cache(maxsize=256)
+def resolver(base: str) -> URIResolver:
+    return URIResolver(base)
@@ -0,0 +1,299 @@
+"""RFC 8216 conformance rules
+
+Rules work on columns of the segment store, e.g. the durations of all
+segments, which are extracted once and shared by the rules that need
+them. Snapshot segments provide their duration column without decoding
+any segment.
+"""
+import time
+from typing import (
+    Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence)
+
+from . import constant
+from .segments import column
+from .snapshot import SnapshotSegments
+
+
+class Violation(object):
+
+    def __init__(self, rule: str, message: str,
+                 sequence: Optional[int] = None):
+        self.rule = rule
+        self.message = message
+        self.sequence = sequence
+
+    def __str__(self) -> str:
+        if self.sequence is None:
+            return f'{self.rule}: {self.message}'
+        return f'{self.rule}: {self.message} (segment {self.sequence})'
+
+    def __repr__(self) -> str:
+        return f'Violation({self})'
+
+
+class Report(object):
+    """Violations found by ``validate`` and the seconds spent per rule
+
+    At most ``limit`` violations are kept per rule, ``counts`` has the
+    totals.
+    """
+
+    def __init__(self):
+        self.violations: List[Violation] = []
+        self.counts: Dict[str, int] = {}
+        self.timings: Dict[str, float] = {}
+
+    @property
+    def valid(self) -> bool:
+        return not self.violations
+
+    def __iter__(self) -> Iterator[Violation]:
+        return iter(self.violations)
+
+    def __len__(self) -> int:
+        return len(self.violations)
+
+
+class Context(object):
+    """A playlist with lazily extracted segment columns
+    """
+
+    def __init__(self, playlist: Any, previous: Optional[Any] = None):
+        self.playlist = playlist
+        self.previous = previous
+        self.segments: Sequence = getattr(playlist, 'media_segments', ())
+        self.timings: Dict[str, float] = {}
+        self._columns: Dict[str, Sequence] = {}
+
+    def column(self, name: str) -> Sequence:
+        """Column ``name`` of the segments, see ``segments.column``
+        """
+        c = self._columns.get(name, None)
+        if c is None:
+            t = time.perf_counter()
+            c = self._columns[name] = column(self.segments, name)
+            self.timings[f'column.{name}'] = time.perf_counter() - t
+        return c
+
+    def indexes(self, name: str) -> List[int]:
+        """Indexes of the segments with a positive value in column ``name``
+        """
+        return [i for i, v in enumerate(self.column(name)) if v > 0]
+
+    def distinct(self, name: str) -> List[Any]:
+        """Distinct ``key`` or ``map`` objects
+        """
+        if isinstance(self.segments, SnapshotSegments):
+            return self.segments.distinct(name)
+        if name == 'key':
+            return self.playlist.key_spans.values()
+        return self.playlist.map_spans.values()
+
+    def sequence(self, i: int) -> int:
+        return self.playlist.first_sequence_number + i
+
+
+Check = Callable[[Context], Iterator[Violation]]
+
+
+class Rule(object):
+
+    def __init__(self, name: str, playlist_type: constant.PlaylistType,
+                 check: Check, description: str):
+        self.name = name
+        self.playlist_type = playlist_type
+        self.check = check
+        self.description = description
+
+
+RULES: Dict[str, Rule] = {}
+
+
+def rule(name: str, playlist_type: constant.PlaylistType):
+    def decorator(check: Check) -> Check:
+        RULES[name] = Rule(name, playlist_type, check,
+                           (check.__doc__ or '').strip())
+        return check
+    return decorator
+
+
+@rule('target-duration', constant.PlaylistType.MEDIA)
+def _target_duration(ctx: Context) -> Iterator[Violation]:
+    """EXTINF durations rounded to the nearest integer must not exceed
+    TARGETDURATION
+    """
+    p = ctx.playlist
+    if p.target_duration is None:
+        yield Violation('target-duration', 'Missing TARGETDURATION')
+        return
+    durations = ctx.column('duration')
+    # round(d) > t, rounding halves up
+    limit = p.target_duration.duration + 0.5
+    if not durations or max(durations) < limit:
+        return
+    for i, d in enumerate(durations):
+        if d >= limit:
+            yield Violation(
+                'target-duration',
+                f'EXTINF {d} exceeds TARGETDURATION '
+                f'{p.target_duration.duration}', ctx.sequence(i))
+
+
+def _required_versions(ctx: Context) -> Iterator[Any]:
+    p = ctx.playlist
+    if any(d % 1 for d in ctx.column('duration')):
+        yield 3, 'floating-point EXTINF'
+    if max(ctx.column('length'), default=-1) >= 0:
+        yield 4, 'BYTERANGE'
+    if p.i_frames_only is not None:
+        yield 4, 'I-FRAMES-ONLY'
+    for key in ctx.distinct('key'):
+        if key.iv is not None:
+            yield 2, 'IV in KEY'
+        if key.key_format is not None or \
+                key.key_format_versions is not None:
+            yield 5, 'KEYFORMAT in KEY'
+    if ctx.distinct('map'):
+        yield (5 if p.i_frames_only is not None else 6), 'MAP'
+    if p.skip is not None:
+        yield 9, 'SKIP'
+
+
+@rule('version', constant.PlaylistType.MEDIA)
+def _version(ctx: Context) -> Iterator[Violation]:
+    """VERSION must be at least the one required by the features used
+    """
+    p = ctx.playlist
+    version = 1 if p.version is None else p.version.version
+    for required, feature in _required_versions(ctx):
+        if version < required:
+            yield Violation(
+                'version',
+                f'{feature} requires VERSION {required}, found {version}')
+
+
+@rule('byte-range', constant.PlaylistType.MEDIA)
+def _byte_range(ctx: Context) -> Iterator[Violation]:
+    """A BYTERANGE without offset must follow a sub-range of the same
+    resource
+    """
+    lengths = ctx.column('length')
+    if max(lengths, default=-1) < 0:
+        return
+    starts, uris = ctx.column('start'), ctx.column('uri')
+    for i, length in enumerate(lengths):
+        if length < 0 or starts[i] >= 0:
+            continue
+        if i == 0 or lengths[i - 1] < 0 or uris[i - 1] != uris[i]:
+            yield Violation('byte-range',
+                            'BYTERANGE without offset and previous sub-range',
+                            ctx.sequence(i))
+
+
+@rule('parts', constant.PlaylistType.MEDIA)
+def _parts(ctx: Context) -> Iterator[Violation]:
+    """Partial segments require PART-INF and must not exceed PART-TARGET
+    """
+    p = ctx.playlist
+    indexes = ctx.indexes('parts')
+    if not indexes and not p.pending_parts:
+        return
+    if p.part_inf is None:
+        yield Violation('parts', 'Partial segments without PART-INF')
+        return
+    target = p.part_inf.part_target
+    segment_parts = [(i, ctx.segments[i].parts) for i in indexes]
+    segment_parts.append((len(ctx.segments), p.pending_parts))
+    for i, parts in segment_parts:
+        for part in parts:
+            if part.duration > target:
+                yield Violation(
+                    'parts', f'PART duration {part.duration} exceeds '
+                    f'PART-TARGET {target}', ctx.sequence(i))
+
+
+@rule('discontinuity-sequence', constant.PlaylistType.MEDIA)
+def _discontinuity_sequence(ctx: Context) -> Iterator[Violation]:
+    """Against the previous version of the playlist, MEDIA-SEQUENCE must
+    not decrease and DISCONTINUITY-SEQUENCE must grow by the
+    discontinuities of the removed segments
+    """
+    p, previous = ctx.playlist, ctx.previous
+    if previous is None:
+        return
+    removed = p.first_sequence_number - previous.first_sequence_number
+    if removed < 0:
+        yield Violation('discontinuity-sequence',
+                        'MEDIA-SEQUENCE decreased')
+        return
+    if removed > len(previous.media_segments):
+        # Removed segments the previous version never listed
+        return
+    number = 0
+    if previous.discontinuity_sequence is not None:
+        number = previous.discontinuity_sequence.number
+    number += previous.timeline.discontinuities_before(removed)
+    found = 0
+    if p.discontinuity_sequence is not None:
+        found = p.discontinuity_sequence.number
+    if found != number:
+        yield Violation('discontinuity-sequence',
+                        f'DISCONTINUITY-SEQUENCE {found}, expected {number}')
+
+
+@rule('rendition-groups', constant.PlaylistType.MASTER)
+def _rendition_groups(ctx: Context) -> Iterator[Violation]:
+    """Group IDs of STREAM-INF must match a group of renditions
+    """
+    p = ctx.playlist
+    groups = {(g.group_id, g.type) for g in p.rendition_groups}
+    for v in p.variant_streams:
+        for group_id, media_type in [
+                (v.info.audio, constant.MediaType.AUDIO),
+                (v.info.video, constant.MediaType.VIDEO),
+                (v.info.subtitles, constant.MediaType.SUBTITLES),
+                (v.info.closed_captions,
+                 constant.MediaType.CLOSED_CAPTIONS)]:
+            if group_id is None or group_id == 'NONE':
+                continue
+            if (group_id, media_type) not in groups:
+                yield Violation(
+                    'rendition-groups',
+                    f'No {media_type.value} group {group_id} for {v.uri}')
+
+
+def validate(playlist: Any, rules: Optional[Iterable[str]] = None,
+             previous: Optional[Any] = None, limit: int = 100) -> Report:
+    """Check ``playlist`` against ``rules``, by default all rules for its
+    type
+    """
+    from .playlist import MediaPlaylist
+
+    playlist_type = constant.PlaylistType.MASTER
+    if isinstance(playlist, MediaPlaylist):
+        playlist_type = constant.PlaylistType.MEDIA
+    if rules is None:
+        names = [r.name for r in RULES.values()
+                 if r.playlist_type == playlist_type]
+    else:
+        names = list(rules)
+        for name in names:
+            if name not in RULES:
+                raise ValueError(f'Unknown rule {name}')
+
+    ctx = Context(playlist, previous)
+    report = Report()
+    for name in names:
+        r = RULES[name]
+        if r.playlist_type != playlist_type:
+            continue
+        t = time.perf_counter()
+        count = 0
+        for violation in r.check(ctx):
+            if count < limit:
+                report.violations.append(violation)
+            count += 1
+        report.timings[name] = time.perf_counter() - t
+        report.counts[name] = count
+    report.timings.update(ctx.timings)
+    return report
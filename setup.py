@@ -19,6 +19,13 @@ setuptools.setup(
         'python-dateutil',
         'requests',
     ],
-    extras_require={},
-    python_requires='>=3.6',
+    extras_require={
+        'brotli': ['brotli'],
+    },
+    entry_points={
+        'console_scripts': [
+            'm3u8=m3u8.cli:main',
+        ],
+    },
+    python_requires='>=3.7',
 )
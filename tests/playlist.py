@@ -54,3 +54,167 @@ http://example.com/hi.m3u8
 #EXT-X-STREAM-INF:BANDWIDTH=65000,CODECS="mp4a.40.5"
 http://example.com/audio-only.m3u8
 '''
+
+FRAGMENTED = '''#EXTM3U
+#EXT-X-VERSION:7
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:100
+#EXT-X-DISCONTINUITY-SEQUENCE:3
+#EXT-X-MAP:URI="init.mp4",BYTERANGE="720@0"
+#EXT-X-PROGRAM-DATE-TIME:2021-06-01T12:00:00.000+08:00
+#EXTINF:6.0,intro
+#EXT-X-BYTERANGE:75232@720
+main.mp4
+#EXTINF:6.0,
+#EXT-X-BYTERANGE:82112
+main.mp4
+#EXT-X-DISCONTINUITY
+#EXT-X-MAP:URI="other-init.mp4"
+#EXT-X-PROGRAM-DATE-TIME:2021-06-01T12:05:00.000+08:00
+#EXTINF:5.5,
+other.mp4
+#EXT-X-ENDLIST
+'''
+
+LOW_LATENCY = '''#EXTM3U
+#EXT-X-TARGETDURATION:4
+#EXT-X-VERSION:6
+#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK=1.0,CAN-SKIP-UNTIL=12.0
+#EXT-X-PART-INF:PART-TARGET=0.33334
+#EXT-X-MEDIA-SEQUENCE:266
+#EXT-X-PROGRAM-DATE-TIME:2019-02-14T02:13:36.106Z
+#EXT-X-MAP:URI="init.mp4"
+#EXTINF:4.00008,
+fileSequence266.mp4
+#EXTINF:4.00008,
+fileSequence267.mp4
+#EXT-X-PART:DURATION=0.33334,URI="filePart268.0.mp4",INDEPENDENT=YES
+#EXT-X-PART:DURATION=0.33334,URI="filePart268.1.mp4"
+#EXT-X-PART:DURATION=0.33334,URI="filePart268.2.mp4"
+#EXTINF:1.00002,
+fileSequence268.mp4
+#EXT-X-PART:DURATION=0.33334,URI="filePart269.0.mp4",INDEPENDENT=YES
+#EXT-X-PART:DURATION=0.33334,URI="filePart269.1.mp4"
+#EXT-X-PRELOAD-HINT:TYPE=PART,URI="filePart269.2.mp4"
+#EXT-X-RENDITION-REPORT:URI="../1M/waitForMSN.php",LAST-MSN=269,LAST-PART=1
+#EXT-X-RENDITION-REPORT:URI="../4M/waitForMSN.php",LAST-MSN=269,LAST-PART=1
+'''
+
+LOW_LATENCY_DELTA = '''#EXTM3U
+#EXT-X-TARGETDURATION:4
+#EXT-X-VERSION:9
+#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK=1.0,CAN-SKIP-UNTIL=12.0
+#EXT-X-PART-INF:PART-TARGET=0.33334
+#EXT-X-MEDIA-SEQUENCE:266
+#EXT-X-SKIP:SKIPPED-SEGMENTS=2
+#EXTINF:1.00002,
+fileSequence268.mp4
+#EXTINF:4.00008,
+fileSequence269.mp4
+#EXT-X-PART:DURATION=0.33334,URI="filePart270.0.mp4",INDEPENDENT=YES
+#EXT-X-PRELOAD-HINT:TYPE=PART,URI="filePart270.1.mp4"
+'''
+
+MASTER_ABR = '''#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="English",LANGUAGE="en",URI="en.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="French",LANGUAGE="fr",URI="fr.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=800000,CODECS="avc1.4d401e,mp4a.40.2",RESOLUTION=640x360,FRAME-RATE=30.000,AUDIO="aac"
+avc-360.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,CODECS="avc1.4d401f,mp4a.40.2",RESOLUTION=1280x720,FRAME-RATE=30.000,AUDIO="aac"
+avc-720.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2000000,CODECS="hvc1.2.4.L93.B0,mp4a.40.2",RESOLUTION=1280x720,FRAME-RATE=60.000,AUDIO="aac"
+hevc-720.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=6000000,CODECS="avc1.640028,mp4a.40.2",RESOLUTION=1920x1080,FRAME-RATE=30.000,HDCP-LEVEL=TYPE-0,AUDIO="aac"
+avc-1080.m3u8
+'''
+
+DVR = '''#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:500
+#EXT-X-PLAYLIST-TYPE:EVENT
+#EXT-X-KEY:METHOD=AES-128,URI="https://example.com/key1"
+#EXT-X-PROGRAM-DATE-TIME:2021-06-01T00:00:00.000Z
+#EXTINF:10.0,
+seg500.ts
+#EXTINF:10.0,
+seg501.ts
+#EXT-X-KEY:METHOD=AES-128,URI="https://example.com/key2"
+#EXTINF:10.0,
+seg502.ts
+#EXT-X-DISCONTINUITY
+#EXTINF:8.0,
+seg503.ts
+#EXTINF:10.0,
+seg504.ts
+#EXT-X-DISCONTINUITY
+#EXT-X-PROGRAM-DATE-TIME:2021-06-01T01:00:00.000Z
+#EXTINF:10.0,
+seg505.ts
+'''
+
+VENDOR = '''#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:10
+#EXT-X-ALLOW-CACHE:NO
+#EXTINF:10.0,
+main0.ts
+#EXT-X-CUE-OUT:30
+#EXTINF:10.0,
+ad0.ts
+#EXT-X-CUE-OUT-CONT:ElapsedTime=10,Duration=30
+#EXT-X-BITRATE:1200
+#EXTINF:10.0,
+ad1.ts
+#EXT-X-CUE-IN
+'''
+
+REDUNDANT = '''#EXTM3U
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac-a",NAME="English",URI="http://a.example.com/en.m3u8"
+#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac-b",NAME="English",URI="http://b.example.com/en.m3u8"
+#EXT-X-STREAM-INF:BANDWIDTH=1280000,CODECS="avc1.4d401f,mp4a.40.2",AUDIO="aac-a"
+http://a.example.com/low.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2560000,CODECS="avc1.4d401f,mp4a.40.2",AUDIO="aac-a"
+http://a.example.com/mid.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=1280000,CODECS="mp4a.40.2, avc1.4d401f",AUDIO="aac-b"
+http://b.example.com/low.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2560000,CODECS="avc1.4d401f,mp4a.40.2",AUDIO="aac-b"
+http://b.example.com/mid.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2560000,CODECS="hvc1.1.6.L93.90,mp4a.40.2"
+http://a.example.com/mid-hevc.m3u8
+'''
+
+MASTER_I_FRAMES = '''#EXTM3U
+#EXT-X-STREAM-INF:BANDWIDTH=1280000,RESOLUTION=640x360
+low.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2560000,RESOLUTION=1280x720
+mid.m3u8
+#EXT-X-I-FRAME-STREAM-INF:BANDWIDTH=86000,RESOLUTION=640x360,URI="low-iframes.m3u8"
+#EXT-X-I-FRAME-STREAM-INF:BANDWIDTH=150000,RESOLUTION=1280x720,URI="mid-iframes.m3u8"
+'''
+
+I_FRAMES = '''#EXTM3U
+#EXT-X-VERSION:4
+#EXT-X-TARGETDURATION:4
+#EXT-X-MEDIA-SEQUENCE:10
+#EXT-X-PLAYLIST-TYPE:VOD
+#EXT-X-I-FRAMES-ONLY
+#EXTINF:2.0,
+#EXT-X-BYTERANGE:9400@376
+segment1.ts
+#EXTINF:2.0,
+#EXT-X-BYTERANGE:7144@121080
+segment1.ts
+#EXTINF:2.5,
+#EXT-X-BYTERANGE:10340@376
+segment2.ts
+#EXTINF:1.5,
+#EXT-X-BYTERANGE:8460
+segment2.ts
+#EXTINF:4.0,
+#EXT-X-BYTERANGE:7708@91744
+segment2.ts
+#EXTINF:2.0,
+segment3.ts
+#EXT-X-ENDLIST
+'''
@@ -0,0 +1,84 @@
+import unittest
+
+from m3u8.alignment import AlignBy, AlignmentIndex, Misalignment
+from m3u8.playlist import MasterPlaylist, MediaPlaylist
+
+
+def rendition(name, first, count, offset=0, discontinuities=(),
+              drift=0.0):
+    """Playlist of 6s segments, segment ``first`` starting ``offset``
+    segments after midnight
+    """
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:6',
+             f'#EXT-X-MEDIA-SEQUENCE:{first}']
+    for i in range(count):
+        if offset + i in discontinuities:
+            lines.append('#EXT-X-DISCONTINUITY')
+        if i == 0:
+            seconds = (offset * 6) % 60 + drift
+            minutes = offset * 6 // 60
+            lines.append(f'#EXT-X-PROGRAM-DATE-TIME:'
+                         f'2021-06-01T00:{minutes:02d}:{seconds:06.3f}Z')
+        lines += ['#EXTINF:6.0,', f'{name}{first + i}.ts']
+    return MediaPlaylist.from_str('\n'.join(lines))
+
+
+class TestAlignmentIndex(unittest.TestCase):
+
+    def test_media_sequence(self):
+        index = AlignmentIndex()
+        index.update('a', rendition('a', 100, 5))
+        index.update('b', rendition('b', 102, 5, offset=2))
+        self.assertEqual(index.find('a', 103, 'b'), 103)
+        self.assertIsNone(index.find('a', 100, 'b'))
+        self.assertEqual(index.equivalent_segment('a', 104, 'b').uri,
+                         'b104.ts')
+
+    def test_program_date_time(self):
+        index = AlignmentIndex(by=AlignBy.PROGRAM_DATE_TIME)
+        index.update('a', rendition('a', 100, 5))
+        index.update('b', rendition('b', 500, 5, offset=1, drift=0.04))
+        self.assertEqual(index.find('a', 101, 'b'), 500)
+        self.assertEqual(index.find('b', 503, 'a'), 104)
+        self.assertIsNone(index.find('a', 100, 'b'))
+        self.assertIsNone(index.find('b', 504, 'a'))
+
+        # Reloads only index the segments that changed
+        index.update('a', rendition('a', 102, 5, offset=2))
+        self.assertEqual(sorted(index._tracks['a'].buckets.values()),
+                         [102, 103, 104, 105, 106])
+        self.assertEqual(index.find('b', 504, 'a'), 105)
+        self.assertIsNone(index.find('b', 500, 'a'))
+
+    def test_misaligned_discontinuities(self):
+        index = AlignmentIndex(by=AlignBy.PROGRAM_DATE_TIME)
+        index.update('a', rendition('a', 100, 6, discontinuities={3}))
+        index.update('b', rendition('b', 200, 6, discontinuities={3}))
+        index.update('c', rendition('c', 300, 6, discontinuities={4}))
+        self.assertEqual(list(index.misaligned_discontinuities()), [
+            Misalignment('a', 103, 'c', 303),
+            Misalignment('b', 203, 'c', 303),
+            Misalignment('c', 304, 'a', 104),
+            Misalignment('c', 304, 'b', 204),
+        ])
+        index.remove('c')
+        index.update('c', rendition('c', 300, 6, discontinuities={3}))
+        self.assertEqual(list(index.misaligned_discontinuities()), [])
+
+    def test_from_master(self):
+        master = MasterPlaylist.from_str('\n'.join([
+            '#EXTM3U',
+            '#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="aac",NAME="en",URI="en.m3u8"',
+            '#EXT-X-STREAM-INF:BANDWIDTH=1000,AUDIO="aac"',
+            'low.m3u8',
+            '#EXT-X-STREAM-INF:BANDWIDTH=2000,AUDIO="aac"',
+            'hi.m3u8',
+        ]))
+        master.base_uri = 'http://example.com/live/master.m3u8'
+        playlists = {
+            f'http://example.com/live/{name}.m3u8': rendition(name, 100, 3)
+            for name in ['low', 'hi', 'en']}
+        index = AlignmentIndex.from_master(master, load=playlists.get)
+        self.assertEqual(index.names, list(playlists))
+        self.assertEqual(index.find('http://example.com/live/low.m3u8', 101,
+                                    'http://example.com/live/en.m3u8'), 101)
@@ -0,0 +1,55 @@
+import os
+import tempfile
+import unittest
+
+from m3u8.cache import PlaylistCache
+from m3u8.playlist import MasterPlaylist, MediaPlaylist, PlaylistError
+
+from . import playlist as test_playlist
+
+
+def _open_fds():
+    if not os.path.isdir('/proc/self/fd'):
+        return None
+    return len(os.listdir('/proc/self/fd'))
+
+
+class TestPlaylistCache(unittest.TestCase):
+
+    def test_hit(self):
+        cache = PlaylistCache()
+        p1 = MediaPlaylist.from_str(test_playlist.SIMPLE, cache=cache)
+        p2 = MediaPlaylist.from_bytes(test_playlist.SIMPLE.encode(),
+                                      cache=cache)
+        self.assertIs(p1, p2)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_type(self):
+        cache = PlaylistCache()
+        MasterPlaylist.from_str(test_playlist.MASTER, cache=cache)
+        with self.assertRaises(PlaylistError):
+            MediaPlaylist.from_str(test_playlist.MASTER, cache=cache)
+
+    def test_eviction(self):
+        cache = PlaylistCache(max_entries=2)
+        a = MediaPlaylist.from_str(test_playlist.SIMPLE, cache=cache)
+        MediaPlaylist.from_str(test_playlist.LIVE, cache=cache)
+        MediaPlaylist.from_str(test_playlist.SIMPLE, cache=cache)
+        MediaPlaylist.from_str(test_playlist.ENCRYPTED, cache=cache)
+        self.assertEqual(len(cache), 2)
+        self.assertIs(
+            MediaPlaylist.from_str(test_playlist.SIMPLE, cache=cache), a)
+        self.assertEqual(cache.misses, 3)
+
+    def test_directory(self):
+        with tempfile.TemporaryDirectory() as d:
+            MediaPlaylist.from_str(test_playlist.ENCRYPTED,
+                                   cache=PlaylistCache(directory=d))
+            cache = PlaylistCache(directory=d)
+            fds = _open_fds()
+            p = MediaPlaylist.from_str(test_playlist.ENCRYPTED, cache=cache)
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+            # Disk hits keep no mapping, or its descriptor, open
+            self.assertEqual(_open_fds(), fds)
+            self.assertEqual(len(p.media_segments), 4)
+            self.assertIs(p.media_segments[0].key, p.media_segments[2].key)
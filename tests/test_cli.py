@@ -0,0 +1,111 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from m3u8 import cli
+from m3u8.cli import expand_paths, main
+
+from . import playlist as test_playlist
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.files = {}
+        for name in ['SIMPLE', 'LIVE', 'MASTER_ABR']:
+            path = os.path.join(self.directory.name, f'{name}.m3u8')
+            with open(path, 'w') as f:
+                f.write(getattr(test_playlist, name))
+            self.files[name] = path
+        self.bad = os.path.join(self.directory.name, 'bad.txt')
+        with open(self.bad, 'w') as f:
+            f.write(test_playlist.SIMPLE.replace(
+                '#EXTINF:3.003,', '#EXTINF:x,'))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_main(self, *argv):
+        out = io.StringIO()
+        with redirect_stdout(out):
+            status = main(list(argv))
+        lines = out.getvalue().splitlines()
+        return status, [json.loads(line) for line in lines]
+
+    def test_expand_paths(self):
+        pattern = os.path.join(self.directory.name, '*.m3u8')
+        self.assertEqual(list(expand_paths([pattern, '-'])),
+                         sorted(self.files.values()) + ['-'])
+
+    def test_stats(self):
+        pattern = os.path.join(self.directory.name, '*.m3u8')
+        for jobs in ['1', '2']:
+            status, results = self.run_main('stats', '-j', jobs, pattern)
+            self.assertEqual(status, 0)
+            self.assertEqual([r['path'] for r in results],
+                             sorted(self.files.values()))
+            by_path = {r['path']: r for r in results}
+            simple = by_path[self.files['SIMPLE']]
+            self.assertEqual(simple['segments'], 3)
+            self.assertAlmostEqual(simple['duration'], 21.021)
+            ladder = by_path[self.files['MASTER_ABR']]['variants']
+            bandwidths = [v['bandwidth'] for v in ladder]
+            self.assertEqual(bandwidths, sorted(bandwidths))
+
+    def test_validate(self):
+        status, results = self.run_main(
+            'validate', '-j', '1', self.files['SIMPLE'], self.bad,
+            os.path.join(self.directory.name, 'missing.m3u8'))
+        self.assertEqual(status, 1)
+        self.assertTrue(results[0]['valid'])
+        self.assertFalse(results[1]['valid'])
+        self.assertEqual(len(results[1]['errors']), 2)
+        self.assertIn('error', results[2])
+
+    def test_unexpected_error(self):
+        stats = cli._COMMANDS['stats']
+
+        def broken(path):
+            if path == self.bad:
+                raise TypeError('broken')
+            return stats(path)
+
+        with mock.patch.dict(cli._COMMANDS, {'stats': broken}):
+            status, results = self.run_main(
+                'stats', '-j', '1', self.bad, self.files['SIMPLE'])
+        self.assertEqual(status, 1)
+        self.assertEqual(results[0]['error'], 'TypeError: broken')
+        self.assertEqual(results[1]['segments'], 3)
+
+    def test_to_json(self):
+        status, results = self.run_main(
+            'to-json', '-j', '1', self.files['SIMPLE'])
+        self.assertEqual(status, 0)
+        playlist = results[0]['playlist']
+        self.assertEqual(playlist['target_duration'], {'duration': 10})
+        self.assertEqual(playlist['media_segments'][2]['info']['duration'],
+                         3.003)
+
+    def test_stdin(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        for argv in [['stats', '-j', '2'], ['stats', '-j', '2', '-']]:
+            out = subprocess.run(
+                [sys.executable, '-m', 'm3u8'] + argv, cwd=root,
+                input=test_playlist.SIMPLE, stdout=subprocess.PIPE,
+                universal_newlines=True, timeout=60)
+            self.assertEqual(out.returncode, 0)
+            result = json.loads(out.stdout)
+            self.assertEqual((result['path'], result['segments']), ('-', 3))
+
+    def test_diff(self):
+        status, results = self.run_main(
+            'diff', self.files['SIMPLE'], self.files['LIVE'])
+        self.assertEqual(status, 0)
+        self.assertIn('ATTRIBUTE-CHANGED', [r['type'] for r in results])
@@ -0,0 +1,75 @@
+import unittest
+
+from m3u8.client import PlaylistClient, add_query
+
+from . import playlist as test_playlist
+from .server import StandInServer
+
+
+class TestAddQuery(unittest.TestCase):
+
+    def test_add_query(self):
+        self.assertEqual(
+            add_query('http://a/b.m3u8?token=x&_HLS_msn=1',
+                      {'_HLS_part': '2', '_HLS_msn': '3'}),
+            'http://a/b.m3u8?token=x&_HLS_msn=3&_HLS_part=2')
+        self.assertEqual(add_query('http://a/b.m3u8', {}), 'http://a/b.m3u8')
+
+    def test_signed_query(self):
+        signed = 'hdnts=exp%3D1~acl%3D/*~hmac%3Dab+cd&x=a%2Fb'
+        self.assertEqual(
+            add_query(f'http://a/b.m3u8?{signed}&_HLS_part=1',
+                      {'_HLS_msn': '3'}),
+            f'http://a/b.m3u8?{signed}&_HLS_msn=3')
+
+
+class TestPlaylistClient(unittest.TestCase):
+
+    def test_blocking_delta_reload(self):
+        def handler(path, query):
+            if not query:
+                return 200, test_playlist.LOW_LATENCY.encode()
+            return 200, test_playlist.LOW_LATENCY_DELTA.encode()
+
+        with StandInServer(handler) as server:
+            client = PlaylistClient(server.url + '/live.m3u8')
+            p = client.reload()
+            self.assertEqual(len(p.media_segments), 3)
+            p = client.reload()
+            self.assertEqual(server.requests[1][1], {
+                '_HLS_msn': '269', '_HLS_part': '2', '_HLS_skip': 'YES'})
+
+        self.assertIsNone(p.skip)
+        self.assertEqual(p.first_sequence_number, 266)
+        self.assertEqual([s.uri for s in p.media_segments], [
+            'fileSequence266.mp4', 'fileSequence267.mp4',
+            'fileSequence268.mp4', 'fileSequence269.mp4'])
+        self.assertIs(p.media_segments[3].map, p.media_segments[0].map)
+        self.assertEqual(p.get_part(270, 0).uri, 'filePart270.0.mp4')
+        self.assertEqual(client.reload_params(), {
+            '_HLS_msn': '270', '_HLS_part': '1', '_HLS_skip': 'YES'})
+
+    def test_delta_fallback(self):
+        def handler(path, query):
+            if '_HLS_skip' in query:
+                return 200, test_playlist.LOW_LATENCY_DELTA.replace(
+                    'MEDIA-SEQUENCE:266', 'MEDIA-SEQUENCE:300').encode()
+            return 200, test_playlist.LOW_LATENCY.encode()
+
+        with StandInServer(handler) as server:
+            client = PlaylistClient(server.url + '/live.m3u8')
+            client.reload()
+            p = client.reload()
+            self.assertEqual(server.requests[2][1], {
+                '_HLS_msn': '269', '_HLS_part': '2'})
+        self.assertIsNone(p.skip)
+        self.assertEqual(len(p.media_segments), 3)
+
+    def test_no_server_control(self):
+        with StandInServer(
+                lambda path, query: (200, test_playlist.LIVE.encode())
+        ) as server:
+            client = PlaylistClient(server.url + '/live.m3u8')
+            client.reload()
+            client.reload()
+            self.assertEqual(server.requests[1][1], {})
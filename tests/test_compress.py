@@ -0,0 +1,97 @@
+import gzip
+import os
+import tempfile
+import unittest
+
+from m3u8 import compress
+from m3u8.playlist import MediaPlaylist, PlaylistError
+
+from . import playlist as test_playlist
+from .server import StandInServer
+
+
+class TestCompress(unittest.TestCase):
+
+    def test_iter_lines(self):
+        b = 'a\r\nb\n\né\r\nlast\r'.encode('utf-8')
+        # Size 2 splits the first CRLF between two chunks
+        for size in [1, 2, 3, 64]:
+            lines = list(compress.iter_lines(compress.iter_chunks(b, size)))
+            self.assertEqual(lines, ['a', 'b', '', 'é', 'last'])
+
+    def test_iter_lines_long(self):
+        b = b'x' * (1 << 20) + b'\nnext\n'
+        chunks = compress.iter_chunks(b, 1024)
+        lines = compress.iter_lines(chunks, max_line_length=4096)
+        self.assertEqual(len(next(lines)), 4096 + 1024)
+        lines = list(compress.iter_lines(compress.iter_chunks(b, 1024)))
+        self.assertEqual([len(line) for line in lines], [1 << 20, 4])
+
+    def test_gzip_round_trip(self):
+        b = test_playlist.DVR.encode()
+        chunks = compress.compress(compress.iter_chunks(b, 7), 'gzip')
+        data = b''.join(chunks)
+        self.assertEqual(gzip.decompress(data), b)
+        # Concatenated members
+        data += gzip.compress(b'#EXTINF:1.0,\nlast.ts\n')
+        self.assertEqual(b''.join(compress.decompress([data], 'gzip')),
+                         b + b'#EXTINF:1.0,\nlast.ts\n')
+
+    def test_detect(self):
+        self.assertEqual(compress.detect(gzip.compress(b'x')), 'gzip')
+        self.assertIsNone(compress.detect(b'\x00binary'))
+        self.assertIsNone(compress.detect(b'#EXTM3U\n', 'br'))
+        self.assertEqual(compress.detect(b'\x00binary', 'br'), 'br')
+        self.assertEqual(compress.from_content_encoding('gzip, BR'), 'br')
+        self.assertIsNone(compress.from_content_encoding('identity'))
+        self.assertEqual(compress.from_extension('index.m3u8.br'), 'br')
+
+    def test_from_bytes(self):
+        p = MediaPlaylist.from_bytes(gzip.compress(test_playlist.DVR.encode()))
+        self.assertEqual(len(p.media_segments), 6)
+        with self.assertRaises(PlaylistError):
+            MediaPlaylist.from_bytes(
+                gzip.compress(test_playlist.DVR.encode())[:-20])
+        with self.assertRaises(PlaylistError):
+            MediaPlaylist.from_bytes(gzip.compress(b'#EXTM3U\n\xff\n'))
+
+    def test_file(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.m3u8.gz')
+            p.write(path)
+            with open(path, 'rb') as f:
+                self.assertEqual(gzip.decompress(f.read()).decode(),
+                                 p.dumps())
+            q = MediaPlaylist.from_file(path)
+            self.assertEqual(q.fingerprints, p.fingerprints)
+
+            path = os.path.join(directory, 'index.m3u8')
+            p.write(path)
+            self.assertEqual(MediaPlaylist.from_file(path).fingerprints,
+                             p.fingerprints)
+
+    def test_from_url(self):
+        body = MediaPlaylist.from_str(test_playlist.LIVE).to_bytes('gzip')
+        with StandInServer(lambda path, query: (200, body)) as server:
+            p = MediaPlaylist.from_url(server.url + '/live.m3u8.gz')
+        self.assertEqual(p.first_sequence_number, 2680)
+
+    @unittest.skipIf(compress.brotli is not None, 'brotli installed')
+    def test_brotli_missing(self):
+        p = MediaPlaylist.from_str(test_playlist.LIVE)
+        with self.assertRaises(PlaylistError):
+            p.to_bytes('br')
+        with self.assertRaises(PlaylistError):
+            MediaPlaylist.from_bytes(b'\x00binary', compression='br')
+
+    @unittest.skipIf(compress.brotli is None, 'brotli not installed')
+    def test_brotli(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        q = MediaPlaylist.from_bytes(p.to_bytes('br'), compression='br')
+        self.assertEqual(q.fingerprints, p.fingerprints)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.m3u8.br')
+            p.write(path)
+            q = MediaPlaylist.from_file(path)
+        self.assertEqual(q.fingerprints, p.fingerprints)
@@ -0,0 +1,70 @@
+import unittest
+
+from m3u8 import diff
+from m3u8.diff import ChangeType
+from m3u8.playlist import MasterPlaylist, MediaPlaylist, PlaylistError
+
+from . import playlist as test_playlist
+
+
+class TestDiff(unittest.TestCase):
+
+    def test_unchanged(self):
+        a = MediaPlaylist.from_str(test_playlist.ENCRYPTED)
+        b = MediaPlaylist.from_str(test_playlist.ENCRYPTED)
+        self.assertFalse(diff(a, b))
+
+    def test_sliding_window(self):
+        old = MediaPlaylist.from_str(test_playlist.LIVE)
+        new = MediaPlaylist.from_str(
+            test_playlist.LIVE
+            .replace('SEQUENCE:2680', 'SEQUENCE:2681')
+            .replace('#EXTINF:7.975,\nhttps://priv.example.com/'
+                     'fileSequence2680.ts\n', '') +
+            '#EXT-X-DISCONTINUITY\n#EXTINF:7.975,\nad.ts\n'
+            '#EXTINF:7.975,\nad2.ts\n')
+        d = diff(old, new)
+        self.assertEqual([(c.type, c.sequence) for c in d], [
+            (ChangeType.SEGMENT_REMOVED, 2680),
+            (ChangeType.SEGMENT_ADDED, 2683),
+            (ChangeType.DISCONTINUITY, 2683),
+            (ChangeType.SEGMENT_ADDED, 2684),
+        ])
+
+    def test_key_rotation(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        d = diff(p.window(0, 2), p.window(0, 3))
+        rotated = d.of_type(ChangeType.KEY_ROTATED)
+        self.assertEqual(len(rotated), 1)
+        self.assertEqual(rotated[0].sequence, 502)
+        self.assertEqual(rotated[0].new.uri, 'https://example.com/key2')
+
+    def test_segment_changed(self):
+        a = MediaPlaylist.from_str(test_playlist.LIVE)
+        b = MediaPlaylist.from_str(
+            test_playlist.LIVE.replace('#EXTINF:7.941,', '#EXTINF:7.942,')
+            .replace('#EXT-X-TARGETDURATION:8', '#EXT-X-TARGETDURATION:9'))
+        d = diff(a, b)
+        self.assertEqual([(c.type, c.sequence, c.name) for c in d], [
+            (ChangeType.ATTRIBUTE_CHANGED, None, 'target_duration'),
+            (ChangeType.SEGMENT_CHANGED, 2681, None),
+        ])
+
+    def test_master(self):
+        a = MasterPlaylist.from_str(test_playlist.MASTER_ABR)
+        b = MasterPlaylist.from_str(
+            test_playlist.MASTER_ABR
+            .replace('BANDWIDTH=800000', 'BANDWIDTH=900000')
+            .replace('NAME="French",LANGUAGE="fr"',
+                     'NAME="French",LANGUAGE="fr-FR"'))
+        d = diff(a, b)
+        self.assertEqual([(c.type, c.name) for c in d], [
+            (ChangeType.VARIANT_CHANGED, 'avc-360.m3u8'),
+            (ChangeType.RENDITION_CHANGED, ('AUDIO', 'aac', 'French')),
+        ])
+        self.assertEqual(d.changes[0].new.info.bandwidth, 900000)
+
+    def test_type_mismatch(self):
+        with self.assertRaises(PlaylistError):
+            diff(MediaPlaylist.from_str(test_playlist.SIMPLE),
+                 MasterPlaylist.from_str(test_playlist.MASTER))
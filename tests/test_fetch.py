@@ -0,0 +1,77 @@
+import time
+import unittest
+
+from m3u8.fetch import FetchError, HedgedFetcher
+from m3u8.playlist import MasterPlaylist, MediaPlaylist
+
+from . import playlist as test_playlist
+from .server import StandInServer
+
+
+def slow(seconds, body=b'slow'):
+    def handler(path, query):
+        time.sleep(seconds)
+        return 200, body
+    return handler
+
+
+class TestRedundantVariants(unittest.TestCase):
+
+    def test_redundant_variants(self):
+        p = MasterPlaylist.from_str(test_playlist.REDUNDANT)
+        self.assertEqual(
+            [[v.uri for v in g] for g in p.redundant_variants], [
+                ['http://a.example.com/low.m3u8',
+                 'http://b.example.com/low.m3u8'],
+                ['http://a.example.com/mid.m3u8',
+                 'http://b.example.com/mid.m3u8'],
+                ['http://a.example.com/mid-hevc.m3u8']])
+        variant = p.variant_streams[3]
+        self.assertEqual(p.alternate_uris(variant), [
+            'http://b.example.com/mid.m3u8', 'http://a.example.com/mid.m3u8'])
+        self.assertEqual(p.alternates(p.variant_streams[4]),
+                         [p.variant_streams[4]])
+
+
+class TestHedgedFetcher(unittest.TestCase):
+
+    def test_hedge(self):
+        with StandInServer(slow(1.0)) as primary, \
+                StandInServer(slow(0, b'fast')) as backup, \
+                HedgedFetcher(default_delay=0.05) as fetcher:
+            t = time.monotonic()
+            res = fetcher.fetch([primary.url + '/a', backup.url + '/a'])
+            self.assertLess(time.monotonic() - t, 0.8)
+            self.assertEqual(res.content, b'fast')
+            self.assertEqual((fetcher.hedges, fetcher.failovers), (1, 0))
+
+            res = fetcher.fetch([backup.url + '/b', primary.url + '/b'])
+            self.assertEqual(res.content, b'fast')
+            self.assertEqual(fetcher.hedges, 1)
+            self.assertEqual(len(primary.requests), 1)
+
+    def test_failover(self):
+        with StandInServer(lambda path, query: (503, b'')) as failing, \
+                StandInServer(lambda path, query: (
+                    200, test_playlist.SIMPLE.encode())) as backup, \
+                HedgedFetcher() as fetcher:
+            p = fetcher.fetch_playlist(
+                [failing.url + '/index.m3u8', backup.url + '/index.m3u8'],
+                MediaPlaylist)
+            self.assertEqual(len(p.media_segments), 3)
+            self.assertEqual(p.base_uri, backup.url + '/index.m3u8')
+            self.assertEqual((fetcher.hedges, fetcher.failovers), (0, 1))
+
+            with self.assertRaises(FetchError) as cm:
+                fetcher.fetch([failing.url + '/a', failing.url + '/b'])
+            self.assertEqual(len(cm.exception.errors), 2)
+
+    def test_hedge_delay(self):
+        fetcher = HedgedFetcher(percentile=90, min_samples=10,
+                                default_delay=2.0)
+        for i in range(9):
+            fetcher.record(i / 10)
+        self.assertEqual(fetcher.hedge_delay(), 2.0)
+        fetcher.record(0.9)
+        self.assertEqual(fetcher.hedge_delay(), 0.8)
+        fetcher.close()
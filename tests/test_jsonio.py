@@ -0,0 +1,115 @@
+import io
+import json
+import unittest
+
+from m3u8 import component, constant, tag
+from m3u8.playlist import (
+    MasterPlaylist, MediaPlaylist, Playlist, PlaylistError)
+
+from . import playlist as test_playlist
+
+
+FIXTURES = [
+    'SIMPLE', 'LIVE', 'ENCRYPTED', 'MASTER', 'FRAGMENTED', 'LOW_LATENCY',
+    'LOW_LATENCY_DELTA', 'MASTER_ABR', 'DVR',
+]
+
+
+class TestJson(unittest.TestCase):
+
+    def test_round_trip(self):
+        for name in FIXTURES:
+            p = Playlist.from_str(getattr(test_playlist, name))
+            for columnar in [False, True]:
+                s = p.to_json(columnar=columnar)
+                self.assertEqual(json.loads(s), p.to_dict(columnar=columnar))
+                q = Playlist.from_json(s)
+                self.assertIs(type(q), type(p))
+                self.assertEqual(q.to_dict(), p.to_dict())
+                if isinstance(p, MediaPlaylist):
+                    self.assertEqual(q.fingerprints, p.fingerprints)
+
+    def test_to_dict(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        d = p.to_dict()
+        self.assertEqual(d['type'], 'MEDIA')
+        self.assertEqual(d['media_playlist_type'], {'type': 'EVENT'})
+        segment = d['media_segments'][0]
+        self.assertEqual(segment['key'], {
+            'method': 'AES-128', 'uri': 'https://example.com/key1'})
+        self.assertEqual(segment['program_date_time'],
+                         {'date_time': '2021-06-01T00:00:00+00:00'})
+        self.assertNotIn('parts', segment)
+
+        columns = p.to_dict(columnar=True)['media_segment_columns']
+        self.assertEqual(columns['uri'][2], 'seg502.ts')
+        self.assertEqual(columns['key']['runs'], [[0, 0], [2, 1]])
+        self.assertEqual(columns['discontinuity']['index'], [3, 5])
+
+    def test_hexadecimal(self):
+        iv = 'FEDCBA9876543210FEDCBA9876543210'
+        p = MediaPlaylist.from_str(test_playlist.DVR.replace(
+            'key1"', f'key1",IV=0x{iv}'))
+        self.assertEqual(p.media_segments[0].key.iv, int(iv, 16))
+        for columnar in [False, True]:
+            s = p.to_json(columnar=columnar)
+            self.assertIn(f'"iv":"0x{iv.lower()}"', s)
+            q = MediaPlaylist.from_json(s)
+            self.assertEqual(q.media_segments[0].key.iv, int(iv, 16))
+            self.assertEqual(q.dumps(), p.dumps())
+
+    def test_shared_tags(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        q = MediaPlaylist.from_json(p.to_json(columnar=True))
+        self.assertIs(q.media_segments[0].key, q.media_segments[1].key)
+        q = MediaPlaylist.from_json(p.to_json())
+        self.assertIs(q.media_segments[0].key, q.media_segments[1].key)
+
+    def test_temporary_tags(self):
+        class Segment(component.MediaSegment):
+            # A new KEY on every read, freed as soon as it is encoded
+            @property
+            def key(self):
+                return tag.Key(constant.EncryptionMethod.AES_128,
+                               uri=f'{self.uri}.key')
+
+            @key.setter
+            def key(self, v):
+                pass
+
+        p = MediaPlaylist.from_str(test_playlist.SIMPLE)
+        p.media_segments = [
+            Segment(info=s.info, uri=s.uri) for s in p.media_segments]
+        for columnar in [False, True]:
+            q = MediaPlaylist.from_json(p.to_json(columnar=columnar))
+            self.assertEqual([s.key.uri for s in q.media_segments],
+                             [f'{s.uri}.key' for s in p.media_segments])
+
+    def test_master(self):
+        p = MasterPlaylist.from_str(test_playlist.MASTER_ABR)
+        q = MasterPlaylist.from_dict(p.to_dict())
+        groups = {(g.group_id, g.type): g for g in q.rendition_groups}
+        for v in q.variant_streams:
+            if v.audio is not None:
+                self.assertIs(groups[(v.audio.group_id, v.audio.type)],
+                              v.audio)
+        self.assertEqual(q.best_variant().uri, p.best_variant().uri)
+
+    def test_stream(self):
+        p = MediaPlaylist.from_str(test_playlist.ENCRYPTED)
+        for columnar in [False, True]:
+            f = io.StringIO()
+            self.assertIsNone(p.to_json(f, columnar=columnar))
+            self.assertEqual(f.getvalue(), p.to_json(columnar=columnar))
+
+    def test_invalid(self):
+        d = MasterPlaylist.from_str(test_playlist.MASTER).to_dict()
+        with self.assertRaises(PlaylistError):
+            MediaPlaylist.from_dict(d)
+        with self.assertRaises(PlaylistError):
+            Playlist.from_dict({'type': 'OTHER'})
+        with self.assertRaises(PlaylistError):
+            Playlist.from_json('{')
+        with self.assertRaises(PlaylistError):
+            Playlist.from_dict({'type': 'MEDIA', 'media_segment_columns': {
+                'duration': [1.0], 'uri': []}})
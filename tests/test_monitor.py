@@ -0,0 +1,194 @@
+import asyncio
+import os
+import threading
+import time
+import unittest
+
+from m3u8.monitor import ChannelMonitor, EventKind, MonitorError
+from m3u8.origin import Origin
+from m3u8.playlist import MediaPlaylist
+
+
+def live(msn, segments=3, end_list=False):
+    lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:1',
+             f'#EXT-X-MEDIA-SEQUENCE:{msn}']
+    for i in range(msn, msn + segments):
+        lines += ['#EXTINF:1.0,', f'seg{i}.ts']
+    if end_list:
+        lines.append('#EXT-X-ENDLIST')
+    return MediaPlaylist.from_str('\n'.join(lines) + '\n')
+
+
+class OriginThread(object):
+    """An ``Origin`` served from the event loop of a background thread
+    """
+
+    def __init__(self):
+        self.origin = Origin()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       daemon=True)
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(5)
+
+    def publish(self, path, playlist):
+        async def publish():
+            self.origin.publish(path, playlist)
+        self.call(publish())
+
+    def url(self, path):
+        return self.origin.url + path
+
+    def __enter__(self):
+        self.thread.start()
+        self.call(self.origin.start())
+        return self
+
+    def __exit__(self, *args):
+        self.call(self.origin.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class TestChannelMonitor(unittest.TestCase):
+
+    def setUp(self):
+        self.server = OriginThread().__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.seen = {}
+        self.urls = []
+        for i in range(8):
+            self.server.publish(f'/ch{i}.m3u8', live(0))
+            self.urls.append(self.server.url(f'/ch{i}.m3u8'))
+
+    def monitor(self, **kwargs):
+        kwargs.setdefault('workers', 2)
+        kwargs.setdefault('interval', 0.02)
+        monitor = ChannelMonitor(**kwargs)
+        monitor.start()
+        self.addCleanup(monitor.close)
+        return monitor
+
+    def wait_for(self, monitor, urls, kind=EventKind.UPDATED, timeout=10,
+                 since=None):
+        """Latest events of kind ``kind`` for all of ``urls``, including
+        those received by earlier calls, ignoring events seen by a worker
+        before wall clock time ``since``
+        """
+        deadline = time.monotonic() + timeout
+        while not all((url, kind) in self.seen for url in urls):
+            event = monitor.get(max(deadline - time.monotonic(), 0))
+            if event is None:
+                self.fail(f'No {kind.value} event for {urls}')
+            if since is None or event.time >= since:
+                self.seen[event.url, event.kind] = event
+        return {url: self.seen[url, kind] for url in urls}
+
+    def test_events(self):
+        monitor = self.monitor(stall_factor=0.2)
+        monitor.add(self.urls + [self.server.url('/missing.m3u8')])
+        events = self.wait_for(monitor, self.urls)
+        status = events[self.urls[0]].status
+        self.assertEqual((status.first_sequence_number,
+                          status.next_sequence_number, status.segments),
+                         (0, 3, 3))
+        self.assertEqual(status.duration, 3.0)
+        error = self.wait_for(monitor, [self.server.url('/missing.m3u8')],
+                              EventKind.ERROR)
+        self.assertEqual(list(error.values())[0].error, 'HTTP 404')
+        self.wait_for(monitor, self.urls, EventKind.STALLED)
+
+        self.seen.clear()
+        self.server.publish('/ch0.m3u8', live(2))
+        event = self.wait_for(monitor, self.urls[:1])[self.urls[0]]
+        self.assertEqual(event.status.next_sequence_number, 5)
+        self.server.publish('/ch1.m3u8', live(0, end_list=True))
+        event = self.wait_for(monitor, self.urls[1:2],
+                              EventKind.ENDED)[self.urls[1]]
+        self.assertTrue(event.status.end_list)
+        self.assertGreater(monitor.counters['not_modified'], 0)
+
+        monitor.remove(self.urls)
+        self.assertEqual(monitor.urls, [self.server.url('/missing.m3u8')])
+
+    def test_backpressure(self):
+        monitor = self.monitor(workers=1, queue_size=2)
+        monitor.add(self.urls)
+        events = [monitor.get(10)]
+        self.server.publish('/ch0.m3u8', live(1))
+        latest = {}
+        while len(latest) < len(self.urls) or \
+                latest[self.urls[0]].status.first_sequence_number != 1:
+            self.assertLessEqual(len(monitor._pending), 2)
+            event = monitor.get(10)
+            self.assertIsNotNone(event)
+            events.append(event)
+            latest[event.url] = event
+        self.assertEqual({e.url for e in events}, set(self.urls))
+        # No event repeats an unchanged playlist
+        self.assertLessEqual(len(events), len(self.urls) + 1)
+
+    def test_resize(self):
+        monitor = self.monitor()
+        monitor.add(self.urls)
+        before = {url: monitor.shard_of(url) for url in self.urls}
+        self.assertEqual(set(before.values()), {0, 1})
+        monitor.resize(3)
+        after = {url: monitor.shard_of(url) for url in self.urls}
+        self.assertEqual({url for url in self.urls
+                          if before[url] != after[url]},
+                         {url for url in self.urls if after[url] == 2})
+        self.wait_for(monitor, [u for u in self.urls if after[u] == 2])
+        monitor.resize(2)
+        self.assertEqual({url: monitor.shard_of(url) for url in self.urls},
+                         before)
+        with self.assertRaises(ValueError):
+            monitor.resize(0)
+
+    def test_restart(self):
+        monitor = self.monitor(max_restarts=1)
+        monitor.add(self.urls)
+        self.wait_for(monitor, self.urls)
+        slot = monitor._slots[0]
+        shard = [url for url in self.urls if monitor.shard_of(url) == 0]
+
+        # Events of the replacement, not those the dead worker sent before
+        self.seen.clear()
+        since = time.time()
+        slot.process.terminate()
+        self.wait_for(monitor, shard, since=since)
+        self.assertEqual(monitor.restarts, 1)
+
+        # Retired after max_restarts, its URLs move to the other worker
+        self.seen.clear()
+        since = time.time()
+        slot.process.terminate()
+        self.wait_for(monitor, shard, since=since)
+        self.assertFalse(slot.active)
+        self.assertEqual({monitor.shard_of(url) for url in self.urls}, {1})
+        monitor._slots[1].process.terminate()
+        monitor._slots[1].process.join()
+        monitor.max_restarts = 0
+        with self.assertRaises(MonitorError):
+            while True:
+                monitor.get(5)
+
+    @unittest.skipIf((os.cpu_count() or 1) < 4, 'needs 4 cores')
+    def test_throughput(self):
+        for i in range(8, 256):
+            self.server.publish(f'/ch{i}.m3u8', live(0, segments=100))
+            self.urls.append(self.server.url(f'/ch{i}.m3u8'))
+        rates = []
+        for workers in (1, 2):
+            self.seen.clear()
+            monitor = self.monitor(workers=workers, interval=0,
+                                   conditional=False)
+            monitor.add(self.urls)
+            self.wait_for(monitor, self.urls)
+            start = monitor.counters['fetches']
+            monitor.get(2)
+            rates.append(monitor.counters['fetches'] - start)
+            monitor.close()
+        self.assertGreater(rates[1], 1.5 * rates[0])
@@ -0,0 +1,193 @@
+import asyncio
+import gzip
+import unittest
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from m3u8 import constant
+from m3u8 import tag
+from m3u8.client import PlaylistClient
+from m3u8.origin import Origin
+from m3u8.playlist import MasterPlaylist, MediaPlaylist
+
+from . import playlist as test_playlist
+
+
+def live(msn: int, segments: int = 10, parts: int = 0) -> MediaPlaylist:
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-TARGETDURATION:4',
+        '#EXT-X-VERSION:6',
+        '#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,PART-HOLD-BACK=1.0,'
+        'CAN-SKIP-UNTIL=12.0',
+        '#EXT-X-PART-INF:PART-TARGET=1.0',
+        f'#EXT-X-MEDIA-SEQUENCE:{msn}',
+        '#EXT-X-MAP:URI="init.mp4"',
+    ]
+    for i in range(msn, msn + segments):
+        lines += ['#EXTINF:4.0,', f'segment{i}.mp4']
+    for j in range(parts):
+        lines.append(f'#EXT-X-PART:DURATION=1.0,'
+                     f'URI="part{msn + segments}.{j}.mp4"')
+    return MediaPlaylist.from_str('\n'.join(lines))
+
+
+async def request(origin: Origin, target: str,
+                  headers: Optional[Dict[str, str]] = None,
+                  method: str = 'GET'
+                  ) -> Tuple[int, Dict[str, str], bytes]:
+    host, port = origin.server.sockets[0].getsockname()[:2]
+    reader, writer = await asyncio.open_connection(host, port)
+    lines = [f'{method} {target} HTTP/1.1', 'Connection: close']
+    lines += [f'{k}: {v}' for k, v in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode().split('\r\n')
+    response_headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        response_headers[name.lower()] = value.strip()
+    return int(status_line.split(' ')[1]), response_headers, body
+
+
+class TestOrigin(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.origin = Origin(block_timeout=0.2)
+        await self.origin.start()
+
+    async def asyncTearDown(self):
+        await self.origin.close()
+
+    async def test_get(self):
+        p = live(100)
+        self.origin.publish('/live.m3u8', p)
+        status, headers, body = await request(self.origin, '/live.m3u8')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, p.to_bytes())
+        self.assertEqual(headers['content-type'],
+                         'application/vnd.apple.mpegurl')
+        self.assertEqual(headers['cache-control'], 'max-age=2')
+
+        status, headers, body = await request(
+            self.origin, '/live.m3u8', {'Accept-Encoding': 'br, gzip'})
+        self.assertEqual(headers['content-encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body), p.to_bytes())
+
+        status, headers, body = await request(
+            self.origin, '/live.m3u8', method='HEAD')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'')
+        self.assertEqual(headers['content-length'], str(len(p.to_bytes())))
+
+        self.origin.publish('/vod.m3u8', MediaPlaylist.from_str(
+            test_playlist.SIMPLE))
+        self.origin.publish('/master.m3u8', MasterPlaylist.from_str(
+            test_playlist.MASTER))
+        _, headers, _ = await request(self.origin, '/vod.m3u8')
+        self.assertEqual(headers['cache-control'], 'max-age=86400')
+        _, headers, _ = await request(self.origin, '/master.m3u8')
+        self.assertEqual(headers['cache-control'], 'max-age=60')
+
+    async def test_conditional(self):
+        self.origin.publish('/live.m3u8', live(100))
+        _, headers, _ = await request(self.origin, '/live.m3u8')
+        etag = headers['etag']
+        status, headers, body = await request(
+            self.origin, '/live.m3u8', {'If-None-Match': etag})
+        self.assertEqual(status, 304)
+        self.assertEqual(headers['etag'], etag)
+        self.assertEqual(body, b'')
+
+        self.origin.publish('/live.m3u8', live(101))
+        status, headers, _ = await request(
+            self.origin, '/live.m3u8', {'If-None-Match': etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers['etag'], etag)
+
+        _, headers, _ = await request(self.origin, '/live.m3u8')
+        etag = headers['etag']
+        _, headers, _ = await request(
+            self.origin, '/live.m3u8', {'Accept-Encoding': 'gzip'})
+        self.assertEqual(headers['etag'], etag[:-1] + '-gz"')
+        self.assertEqual(headers['vary'], 'Accept-Encoding')
+        status, _, _ = await request(
+            self.origin, '/live.m3u8',
+            {'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(status, 200)
+
+    async def test_blocking_reload(self):
+        self.origin.publish('/live.m3u8', live(100, parts=1))
+        blocked = asyncio.ensure_future(request(
+            self.origin, '/live.m3u8?_HLS_msn=110&_HLS_part=2'))
+        await asyncio.sleep(0.02)
+        self.origin.publish('/live.m3u8', live(100, parts=2))
+        await asyncio.sleep(0.02)
+        self.assertFalse(blocked.done())
+        self.origin.publish('/live.m3u8', live(100, parts=3))
+        status, headers, body = await blocked
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['cache-control'], 'max-age=24')
+        self.assertEqual(body, live(100, parts=3).to_bytes())
+
+        # Available versions are served at once
+        status, _, _ = await request(
+            self.origin, '/live.m3u8?_HLS_msn=110&_HLS_part=0')
+        self.assertEqual(status, 200)
+        status, _, _ = await request(
+            self.origin, '/live.m3u8?_HLS_msn=111')
+        self.assertEqual(status, 503)
+
+    async def test_delta_update(self):
+        self.origin.publish('/live.m3u8', live(100))
+        client = PlaylistClient(self.origin.url + '/live.m3u8')
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, client.reload)
+        self.assertEqual(client.reload_params(), {
+            '_HLS_msn': '110', '_HLS_part': '0', '_HLS_skip': 'YES'})
+
+        future = loop.run_in_executor(None, client.reload)
+        await asyncio.sleep(0.02)
+        self.origin.publish('/live.m3u8', live(101, parts=1))
+        p = await future
+        self.assertEqual(p.first_sequence_number, 101)
+        self.assertEqual([s.uri for s in p.media_segments],
+                         [f'segment{i}.mp4' for i in range(101, 111)])
+
+        status, _, body = await request(
+            self.origin, '/live.m3u8?_HLS_skip=YES')
+        delta = MediaPlaylist.from_bytes(body)
+        self.assertEqual(delta.skip.skipped_segments, 7)
+
+        # Date ranges are skipped only with CAN-SKIP-DATERANGES
+        for can_skip, skipped in [(None, 2), (constant.Yes.YES, 7)]:
+            p = live(100)
+            p.media_segments[2].date_range = tag.DateRange(
+                'ad', datetime(2021, 6, 1, tzinfo=timezone.utc))
+            p.server_control.can_skip_date_ranges = can_skip
+            self.origin.publish('/live.m3u8', p)
+            status, _, body = await request(
+                self.origin, '/live.m3u8?_HLS_skip=v2')
+            self.assertEqual(status, 200)
+            delta = MediaPlaylist.from_bytes(body)
+            self.assertEqual(delta.skip.skipped_segments, skipped)
+
+    async def test_errors(self):
+        self.origin.publish('/live.m3u8', live(100))
+        for target, method, expected in [
+                ('/missing.m3u8', 'GET', 404),
+                ('/live.m3u8', 'POST', 405),
+                ('/live.m3u8?_HLS_part=1', 'GET', 400),
+                ('/live.m3u8?_HLS_msn=x', 'GET', 400),
+                ('/live.m3u8?_HLS_msn=112', 'GET', 400)]:
+            status, _, _ = await request(self.origin, target, method=method)
+            self.assertEqual(status, expected, target)
+
+        blocked = asyncio.ensure_future(request(
+            self.origin, '/live.m3u8?_HLS_msn=110'))
+        await asyncio.sleep(0.02)
+        self.origin.unpublish('/live.m3u8')
+        status, _, _ = await blocked
+        self.assertEqual(status, 503)
@@ -1,6 +1,11 @@
+import timeit
 import unittest
 
-from m3u8.parser import Parser
+from m3u8 import constant
+from m3u8 import tag
+from m3u8.error import LimitError, ParseError
+from m3u8.parser import Limits, Parser
+from m3u8.playlist import MediaPlaylist
 
 from . import playlist
 
@@ -22,3 +27,228 @@ class TestParse(unittest.TestCase):
     def test_parse_master(self):
         parser = Parser(playlist.MASTER)
         parser.parse()
+
+    def test_parse_low_latency(self):
+        parser = Parser(playlist.LOW_LATENCY)
+        parser.parse()
+        self.assertEqual(len(parser.media_segments), 3)
+        self.assertEqual(len(parser.media_segments[2].parts), 3)
+        self.assertEqual(len(parser.pending_parts), 2)
+        self.assertEqual(len(parser.preload_hints), 1)
+        self.assertEqual(len(parser.rendition_reports), 2)
+
+    def test_parse_skip(self):
+        parser = Parser(playlist.LOW_LATENCY_DELTA)
+        parser.parse()
+        self.assertEqual(parser.skip.skipped_segments, 2)
+        self.assertEqual(len(parser.media_segments), 2)
+
+    def test_parse_unexpected_part(self):
+        parser = Parser('#EXTM3U\n#EXTINF:4,\n'
+                        '#EXT-X-PART:DURATION=1,URI="a.mp4"\na.mp4\n')
+        with self.assertRaises(ParseError):
+            parser.parse()
+
+    def test_parse_interned(self):
+        key = '#EXT-X-KEY:METHOD=AES-128,URI="https://example.com/k"'
+        parser = Parser('\n'.join([
+            '#EXTM3U', key, '#EXTINF:6.0,', 'main.mp4',
+            key, '#EXTINF:6.0,', 'main.mp4']))
+        parser.parse()
+        a, b = parser.media_segments
+        self.assertIs(a.key, b.key)
+        self.assertIs(a.info, b.info)
+        self.assertIs(a.uri, b.uri)
+
+    def test_parse_duplicated_session_data(self):
+        line = '#EXT-X-SESSION-DATA:DATA-ID="com.example.title",' \
+               'VALUE="Title",LANGUAGE="{}"'
+        parser = Parser('\n'.join(
+            ['#EXTM3U'] + [line.format(i) for i in range(1000)]))
+        parser.parse()
+        self.assertEqual(len(parser.session_datas), 1000)
+        parser = Parser('\n'.join(
+            ['#EXTM3U', line.format('en'), line.format('en')]))
+        with self.assertRaises(ParseError):
+            parser.parse()
+
+    def test_parse_duplicated_session_key(self):
+        line = '#EXT-X-SESSION-KEY:METHOD=AES-128,URI="{}"'
+        parser = Parser('\n'.join(
+            ['#EXTM3U', line.format('a'), line.format('b')]))
+        parser.parse()
+        parser = Parser('\n'.join(
+            ['#EXTM3U', line.format('a'), line.format('a')]))
+        with self.assertRaises(ParseError):
+            parser.parse()
+
+    def test_parse_rendition_groups(self):
+        parser = Parser(playlist.MASTER_ABR)
+        parser.parse()
+        self.assertEqual(len(parser.rendition_groups), 1)
+        group = parser.variant_streams[0].audio
+        self.assertEqual(group.group_id, 'aac')
+        self.assertEqual(len(group.renditions), 2)
+        self.assertIsNone(parser.variant_streams[0].subtitles)
+
+    def test_parse_line_number(self):
+        parser = Parser(playlist.SIMPLE.replace('#EXTINF:9.009,\nhttp://media.'
+                                                'example.com/second.ts',
+                                                '#EXTINF:abc,\nsecond.ts'))
+        with self.assertRaises(ParseError) as cm:
+            parser.parse()
+        self.assertEqual(cm.exception.line_number, 6)
+        self.assertEqual(cm.exception.line, '#EXTINF:abc,')
+        self.assertIn('line 6', str(cm.exception))
+
+    def test_parse_tolerant(self):
+        content = '\n'.join([
+            '#EXTM3U',
+            '#EXT-X-TARGETDURATION:10',
+            '',
+            '#EXTINF:9.009,',
+            'first.ts',
+            '#EXTINF:abc,',
+            '#EXT-X-BYTERANGE:100',
+            'second.ts',
+            '#EXTINF:3.003,',
+            'third.ts',
+        ])
+        parser = Parser(content, strict=False)
+        parser.parse()
+        self.assertEqual([s.uri for s in parser.media_segments],
+                         ['first.ts', 'third.ts'])
+        self.assertIsNone(parser.media_segments[1].byte_range)
+        self.assertEqual([(e.line_number, e.message) for e in parser.errors],
+                         [(6, 'Invalid float: abc'), (8, 'Missing EXTINF')])
+
+
+class CueOut(tag.Tag):
+    name = '#EXT-X-CUE-OUT'
+    playlist_type = constant.PlaylistType.MEDIA
+
+    def __init__(self, duration: float):
+        self.duration = duration
+
+    @classmethod
+    def loads(cls, line: str) -> 'CueOut':
+        return cls(float(cls._extract(line)))
+
+    def dumps(self) -> str:
+        return f'{self.name}:{tag.format_float(self.duration)}'
+
+
+class TestLimits(unittest.TestCase):
+
+    def assertLimit(self, content, line_number=None, **kwargs):
+        for strict in [True, False]:
+            parser = Parser(content, strict=strict, limits=Limits(**kwargs))
+            with self.assertRaises(LimitError) as cm:
+                parser.parse()
+            self.assertEqual(cm.exception.line_number, line_number)
+
+    def test_lines(self):
+        self.assertLimit(playlist.SIMPLE, 1, max_line_length=5)
+        self.assertLimit(playlist.SIMPLE, 4, max_lines=3)
+        long_line = playlist.SIMPLE.replace(
+            'second.ts', 'x' * (Parser.limits.max_line_length + 1))
+        self.assertLimit(long_line, 7)
+        Parser(long_line, limits=Limits(max_line_length=None)).parse()
+
+    def test_attributes(self):
+        key = '#EXT-X-KEY:METHOD=NONE' + ',X=1' * 10
+        content = playlist.SIMPLE.replace('#EXTINF', key + '\n#EXTINF', 1)
+        self.assertLimit(content, 4, max_attributes=10)
+        # Quoted equals signs do not count
+        key = '#EXT-X-KEY:METHOD=NONE,X="' + '=' * 20 + '"'
+        content = playlist.SIMPLE.replace('#EXTINF', key + '\n#EXTINF', 1)
+        Parser(content, limits=Limits(max_attributes=10)).parse()
+
+    def test_counts(self):
+        self.assertLimit(playlist.SIMPLE, 9, max_segments=2)
+        self.assertLimit(playlist.MASTER_ABR, 3, max_renditions=1)
+        self.assertLimit(playlist.MASTER, 4, max_variants=1)
+
+    def test_playlist(self):
+        b = playlist.SIMPLE.encode()
+        with self.assertRaises(LimitError):
+            MediaPlaylist.from_bytes(b, limits=Limits(max_segments=1))
+        with self.assertRaises(LimitError):
+            MediaPlaylist.from_bytes(b, errors=[],
+                                     limits=Limits(max_line_length=5))
+
+    def test_linear(self):
+        def seconds(n):
+            lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:10']
+            for i in range(n):
+                lines.append('#EXT-X-KEY:METHOD=AES-128,URI="k' +
+                             ',=' * (i % 100) + f'",IV=0x{i:x}')
+                lines.append('#EXTINF:10,')
+                lines.append(f's{i}.ts')
+            content = '\n'.join(lines)
+            # The fastest of a few runs is the least disturbed by the load
+            # of the machine
+            return min(timeit.repeat(lambda: Parser(content).parse(),
+                                     number=1, repeat=5))
+
+        # Quadratic time would take 16 times as long
+        self.assertLess(seconds(8000), 10 * seconds(2000) + 0.05)
+
+
+class TestCustomTags(unittest.TestCase):
+
+    def test_unknown_tags(self):
+        parser = Parser(playlist.VENDOR)
+        parser.parse()
+        self.assertEqual(parser.custom_tags, ['#EXT-X-ALLOW-CACHE:NO'])
+        segments = parser.media_segments
+        self.assertEqual(len(segments), 3)
+        self.assertEqual(segments[0].custom_tags, [])
+        self.assertEqual(segments[1].custom_tags, ['#EXT-X-CUE-OUT:30'])
+        self.assertEqual(segments[2].custom_tags, [
+            '#EXT-X-CUE-OUT-CONT:ElapsedTime=10,Duration=30',
+            '#EXT-X-BITRATE:1200'])
+        self.assertEqual(parser.trailing_tags, ['#EXT-X-CUE-IN'])
+
+    def test_register_tag(self):
+        Parser.register_tag(CueOut)
+        try:
+            with self.assertRaises(ValueError):
+                Parser.register_tag(CueOut)
+            parser = Parser(playlist.VENDOR)
+            parser.parse()
+            cue = parser.media_segments[1].custom_tags[0]
+            self.assertIsInstance(cue, CueOut)
+            self.assertEqual(cue.duration, 30.0)
+        finally:
+            Parser.unregister_tag(CueOut)
+        with self.assertRaises(ValueError):
+            Parser.unregister_tag(tag.ExtInf)
+
+    def test_register_tag_error(self):
+        # A tag class raising something other than ParseError fails its
+        # line only
+        Parser.register_tag(CueOut)
+        try:
+            content = playlist.VENDOR.replace('CUE-OUT:30', 'CUE-OUT:x')
+            parser = Parser(content, strict=False)
+            parser.parse()
+            with self.assertRaises(ParseError) as cm:
+                Parser(content).parse()
+        finally:
+            Parser.unregister_tag(CueOut)
+        self.assertEqual(len(parser.media_segments), 3)
+        [error] = parser.errors
+        self.assertEqual(error.line, '#EXT-X-CUE-OUT:x')
+        self.assertEqual(cm.exception.line_number, error.line_number)
+        self.assertIsInstance(error.__cause__, ValueError)
+
+    def test_register_tag_handler(self):
+        cues = []
+        Parser.register_tag(CueOut, lambda parser, t: cues.append(
+            (len(parser.media_segments), t.duration)))
+        try:
+            Parser(playlist.VENDOR).parse()
+        finally:
+            Parser.unregister_tag(CueOut)
+        self.assertEqual(cues, [(1, 30.0)])
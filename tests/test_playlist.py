@@ -1,6 +1,8 @@
+import copy
 import unittest
 
-from m3u8.playlist import MediaPlaylist
+from m3u8 import tag
+from m3u8.playlist import MasterPlaylist, MediaPlaylist, PlaylistError
 
 from . import playlist as test_playlist
 
@@ -10,3 +12,255 @@ class TestMediaPlaylist(unittest.TestCase):
     def test_from_str(self):
         p = MediaPlaylist.from_str(test_playlist.SIMPLE)
         self.assertEqual(len(p.media_segments), 3)
+
+    def test_low_latency(self):
+        p = MediaPlaylist.from_str(test_playlist.LOW_LATENCY)
+        self.assertEqual(p.server_control.part_hold_back, 1.0)
+        self.assertEqual(p.part_inf.part_target, 0.33334)
+        self.assertEqual(p.first_sequence_number, 266)
+        self.assertEqual(p.next_sequence_number, 269)
+        self.assertEqual(p.get_segment(268).uri, 'fileSequence268.mp4')
+        self.assertEqual(p.get_part(268, 2).uri, 'filePart268.2.mp4')
+        self.assertEqual(p.get_part(269, 1).uri, 'filePart269.1.mp4')
+        self.assertIsNone(p.get_part(269, 2))
+        self.assertIsNone(p.get_part(265, 0))
+
+    def test_skip(self):
+        p = MediaPlaylist.from_str(test_playlist.LOW_LATENCY_DELTA)
+        self.assertEqual(p.first_sequence_number, 268)
+        self.assertEqual(p.get_segment(269).uri, 'fileSequence269.mp4')
+
+    def test_delta_update(self):
+        p = MediaPlaylist.from_str(test_playlist.LOW_LATENCY.replace(
+            'CAN-SKIP-UNTIL=12.0', 'CAN-SKIP-UNTIL=5.0'))
+        delta = MediaPlaylist.from_str(p.delta_update().dumps())
+        self.assertEqual(delta.skip.skipped_segments, 1)
+        self.assertEqual(delta.version.version, 9)
+        self.assertEqual(delta.first_sequence_number, 267)
+        merged = p.merge_delta(delta)
+        self.assertEqual([s.uri for s in merged.media_segments],
+                         [s.uri for s in p.media_segments])
+        self.assertEqual(merged.media_segments[2].map.uri, 'init.mp4')
+        q = MediaPlaylist.from_str(test_playlist.LOW_LATENCY)
+        self.assertIs(q.delta_update(), q)
+
+    def test_from_str_errors(self):
+        errors = []
+        p = MediaPlaylist.from_str(
+            test_playlist.SIMPLE.replace('#EXTINF:3.003,', '#EXTINF:x,'),
+            errors=errors)
+        self.assertEqual(len(p.media_segments), 2)
+        self.assertEqual(len(errors), 2)
+
+    def test_window(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        w = p.window(2, 5)
+        self.assertEqual([s.uri for s in w.media_segments],
+                         ['seg502.ts', 'seg503.ts', 'seg504.ts'])
+        self.assertIs(w.media_segments[1], p.media_segments[3])
+        self.assertEqual(w.media_sequence.number, 502)
+        self.assertIsNone(w.discontinuity_sequence)
+        self.assertIsNone(w.media_playlist_type)
+        first = w.media_segments[0]
+        self.assertIsNot(first, p.media_segments[2])
+        self.assertIs(first.key, p.media_segments[2].key)
+        self.assertEqual(first.program_date_time.date_time.isoformat(),
+                         '2021-06-01T00:00:20+00:00')
+        self.assertIsNone(p.media_segments[2].program_date_time)
+
+        w = p.window(4)
+        self.assertEqual(w.media_sequence.number, 504)
+        self.assertEqual(w.discontinuity_sequence.number, 1)
+        self.assertEqual(len(w.window(1).media_segments), 1)
+
+    def test_clip(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        self.assertEqual([s.uri for s in p.clip(15, 30).media_segments],
+                         ['seg501.ts', 'seg502.ts'])
+        self.assertEqual(len(p.clip(58).media_segments), 0)
+        c = p.clip(p.media_segments[0].program_date_time.date_time.replace(
+            second=31))
+        self.assertEqual(c.media_sequence.number, 503)
+
+    def test_splice(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        ad = MediaPlaylist.from_str(test_playlist.SIMPLE)
+        s = p.splice(ad, 20.0, replace=10)
+        self.assertEqual(
+            [x.uri.rsplit('/', 1)[-1] for x in s.media_segments],
+            ['seg500.ts', 'seg501.ts', 'first.ts', 'second.ts', 'third.ts',
+             'seg503.ts', 'seg504.ts', 'seg505.ts'])
+        self.assertEqual(s.media_sequence.number, 500)
+        first, resumed = s.media_segments[2], s.media_segments[5]
+        self.assertIsNot(first, ad.media_segments[0])
+        self.assertIsNotNone(first.discontinuity)
+        self.assertIsNone(ad.media_segments[0].discontinuity)
+        self.assertEqual(first.program_date_time.date_time.isoformat(),
+                         '2021-06-01T00:00:20+00:00')
+        self.assertIs(s.media_segments[3], ad.media_segments[1])
+        # The content resumes after the 21.021s of the ad
+        self.assertEqual(resumed.program_date_time.date_time.isoformat(),
+                         '2021-06-01T00:00:41.021000+00:00')
+        self.assertIsNone(p.media_segments[3].program_date_time)
+        self.assertIs(s.media_segments[6], p.media_segments[4])
+        self.assertEqual(
+            s.media_segments[7].program_date_time.date_time.isoformat(),
+            '2021-06-01T01:00:11.021000+00:00')
+        self.assertEqual(
+            p.media_segments[5].program_date_time.date_time.isoformat(),
+            '2021-06-01T01:00:00+00:00')
+        self.assertEqual(len(p.media_segments), 6)
+        self.assertEqual(s.timeline.offset_of(
+            resumed.program_date_time.date_time), 41.021)
+
+        self.assertEqual(p.splice(ad, 10).dumps(), p.splice(ad, 10.0).dumps())
+        self.assertEqual(p.splice(ad, at_sequence=501).dumps(),
+                         p.splice(ad, 10).dumps())
+        with self.assertRaises(PlaylistError):
+            p.splice(ad)
+        with self.assertRaises(PlaylistError):
+            p.splice(ad, 10, at_sequence=501)
+
+        s = p.splice_many([(ad, tag.MediaSequence(505), 0),
+                           (ad, tag.MediaSequence(501), 0)])
+        self.assertEqual(len(s.media_segments), 12)
+        self.assertEqual(s.media_segments[1].uri, ad.media_segments[0].uri)
+        self.assertIsNotNone(s.media_segments[4].discontinuity)
+        self.assertEqual(s.media_segments[4].uri, 'seg501.ts')
+        times = [x.program_date_time.date_time for x in s.media_segments
+                 if x.program_date_time is not None]
+        self.assertEqual(times, sorted(times))
+
+    def test_splice_dense_program_date_times(self):
+        lines = ['#EXTM3U', '#EXT-X-TARGETDURATION:2']
+        for i in range(10000):
+            lines += [f'#EXT-X-PROGRAM-DATE-TIME:2021-06-01T{i // 1800:02}:'
+                      f'{i // 30 % 60:02}:{i % 30 * 2:02}.000Z',
+                      '#EXTINF:2.0,', f'seg{i}.ts']
+        p = MediaPlaylist.from_str('\n'.join(lines) + '\n')
+        ad = MediaPlaylist.from_str(test_playlist.SIMPLE)
+        s = p.splice(ad, 100.0)
+        # Two boundary segments, no copy of the later dated segments
+        self.assertLessEqual(len(s.media_segments.pieces), 5)
+        self.assertEqual(
+            s.media_segments[-1].program_date_time.date_time.isoformat(),
+            '2021-06-01T05:33:39.021000+00:00')
+        self.assertEqual(
+            p.media_segments[-1].program_date_time.date_time.isoformat(),
+            '2021-06-01T05:33:18+00:00')
+        s = s.splice(ad, at_sequence=5000)
+        self.assertLessEqual(len(s.media_segments.pieces), 9)
+        self.assertEqual(
+            s.media_segments[-1].program_date_time.date_time.isoformat(),
+            '2021-06-01T05:34:00.042000+00:00')
+        times = [x.program_date_time.date_time for x in s.media_segments
+                 if x.program_date_time is not None]
+        self.assertEqual(times, sorted(times))
+
+    def test_cache_invalidation(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        self.assertEqual(p.timeline.duration, 58.0)
+        self.assertEqual(len(p.key_spans), 2)
+        p.media_segments = p.media_segments[:2]
+        self.assertEqual(p.timeline.duration, 20.0)
+        self.assertEqual(len(p.key_spans), 1)
+        p.media_segments.append(copy.copy(p.media_segments[0]))
+        self.assertEqual(p.timeline.duration, 30.0)
+        self.assertEqual(len(p.fingerprints), 3)
+        p.media_segments[0].info = tag.ExtInf(5.0)
+        self.assertEqual(p.timeline.duration, 30.0)
+        p.invalidate()
+        self.assertEqual(p.timeline.duration, 25.0)
+
+    def test_dumps(self):
+        for name in ['SIMPLE', 'LIVE', 'ENCRYPTED', 'FRAGMENTED', 'DVR',
+                     'LOW_LATENCY', 'LOW_LATENCY_DELTA']:
+            p = MediaPlaylist.from_str(getattr(test_playlist, name))
+            s = p.dumps()
+            q = MediaPlaylist.from_str(s)
+            self.assertEqual(q.fingerprints, p.fingerprints)
+            self.assertEqual(q.to_dict(), p.to_dict())
+            self.assertEqual(q.dumps(), s)
+
+        p = MediaPlaylist.from_str(test_playlist.ENCRYPTED)
+        p.media_segments[-1].key = None
+        lines = p.dumps().splitlines()
+        self.assertEqual(lines[-3:-1],
+                         ['#EXT-X-KEY:METHOD=NONE', '#EXTINF:15.0,'])
+        self.assertIsNone(
+            MediaPlaylist.from_str(p.dumps()).media_segments[-1].key.uri)
+
+    def test_custom_tags(self):
+        p = MediaPlaylist.from_str(test_playlist.VENDOR)
+        s = p.dumps()
+        self.assertEqual(
+            [line for line in s.splitlines() if 'CUE' in line or
+             'CACHE' in line or 'BITRATE' in line],
+            [line for line in test_playlist.VENDOR.splitlines()
+             if 'CUE' in line or 'CACHE' in line or 'BITRATE' in line])
+        q = MediaPlaylist.from_str(s)
+        self.assertEqual(q.dumps(), s)
+        self.assertEqual(q.fingerprints, p.fingerprints)
+        for columnar in [False, True]:
+            r = MediaPlaylist.from_json(p.to_json(columnar=columnar))
+            self.assertEqual(r.dumps(), s)
+        self.assertEqual(MediaPlaylist.from_snapshot(p.to_snapshot()).dumps(),
+                         s)
+        self.assertEqual(p.window(0, 2).trailing_tags, [])
+
+    def test_custom_tag_positions(self):
+        content = '\n'.join([
+            '#EXTM3U',
+            '#EXT-X-TARGETDURATION:10',
+            '#EXT-X-X-HEADER:1',
+            '#EXTINF:10.0,',
+            'main0.ts',
+            '#EXT-X-KEY:METHOD=AES-128,URI="key"',
+            '#EXT-X-X-KEY-ROTATION:1',
+            '#EXT-X-PROGRAM-DATE-TIME:2021-06-01T00:00:10.000Z',
+            '#EXTINF:10.0,',
+            '#EXT-X-X-AFTER-EXTINF',
+            'main1.ts',
+            '#EXT-X-X-TRAILING',
+        ]) + '\n'
+        p = MediaPlaylist.from_str(content)
+        self.assertEqual(p.media_segments[1].custom_tag_anchors,
+                         ['#EXT-X-KEY', '#EXTINF'])
+        self.assertEqual(p.dumps(), content)
+        for columnar in [False, True]:
+            r = MediaPlaylist.from_json(p.to_json(columnar=columnar))
+            self.assertEqual(r.dumps(), content)
+        self.assertEqual(MediaPlaylist.from_snapshot(p.to_snapshot()).dumps(),
+                         content)
+
+        content = '\n'.join([
+            '#EXTM3U',
+            '#EXT-X-X-HEADER:1',
+            '#EXT-X-STREAM-INF:BANDWIDTH=1280000',
+            'low.m3u8',
+            '#EXT-X-X-BETWEEN:1',
+            '#EXT-X-STREAM-INF:BANDWIDTH=2560000',
+            'mid.m3u8',
+            '#EXT-X-X-TRAILING',
+        ]) + '\n'
+        m = MasterPlaylist.from_str(content)
+        self.assertEqual(m.custom_tags, ['#EXT-X-X-HEADER:1'])
+        self.assertEqual(m.variant_streams[1].custom_tags,
+                         ['#EXT-X-X-BETWEEN:1'])
+        self.assertEqual(m.dumps(), content)
+        r = MasterPlaylist.from_json(m.to_json())
+        self.assertEqual(r.dumps(), content)
+        self.assertEqual(
+            MasterPlaylist.from_snapshot(m.to_snapshot()).dumps(), content)
+
+    def test_concat(self):
+        p = MediaPlaylist.from_str(test_playlist.LIVE)
+        q = MediaPlaylist.from_str(test_playlist.SIMPLE)
+        c = MediaPlaylist.concat(p, q, q)
+        self.assertEqual(len(c.media_segments), 9)
+        self.assertEqual(c.target_duration.duration, 10)
+        self.assertEqual(c.media_sequence.number, 2680)
+        self.assertIsNotNone(c.end_list)
+        self.assertIsNotNone(c.media_segments[3].discontinuity)
+        self.assertIsNotNone(c.media_segments[6].discontinuity)
+        self.assertIsNone(c.media_segments[4].discontinuity)
@@ -0,0 +1,154 @@
+import os
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timezone
+
+from m3u8.playlist import MediaPlaylist
+from m3u8.recorder import ChannelRecorder, RecorderError
+
+from . import playlist as test_playlist
+from .server import StandInServer
+
+
+def live(first, n, discontinuity_sequence=0):
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:6',
+             f'#EXT-X-MEDIA-SEQUENCE:{first}',
+             f'#EXT-X-DISCONTINUITY-SEQUENCE:{discontinuity_sequence}',
+             '#EXT-X-PROGRAM-DATE-TIME:'
+             f'2021-06-01T00:{first * 6 // 60:02}:{first * 6 % 60:02}Z']
+    for i in range(first, first + n):
+        lines += ['#EXTINF:6.0,', f'seg{i}.ts']
+    return MediaPlaylist.from_str('\n'.join(lines) + '\n')
+
+
+class TestChannelRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'channel')
+
+    def test_record(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        with ChannelRecorder(self.path) as recorder:
+            self.assertEqual(recorder.record(p), 6)
+            self.assertEqual(recorder.record(p), 0)
+            self.assertEqual(len(recorder), 6)
+            window = recorder.window()
+            self.assertEqual(window.dumps(), p.window(0).dumps().replace(
+                '#EXT-X-PLAYLIST-TYPE:EVENT\n', ''))
+            self.assertIs(window.media_segments[0].key,
+                          window.media_segments[1].key)
+
+            clip = recorder.window(502, 505)
+            self.assertEqual(clip.dumps(), p.window(2, 5).dumps().replace(
+                '#EXT-X-PLAYLIST-TYPE:EVENT\n', '') .replace(
+                    '\n#EXTINF:10.0,\nseg505.ts', '') + '#EXT-X-ENDLIST\n')
+            self.assertIsNone(clip.discontinuity_sequence)
+            self.assertEqual(recorder.window(504).discontinuity_sequence
+                             .number, 1)
+
+    def test_lookup(self):
+        with ChannelRecorder(self.path) as recorder:
+            self.assertIsNone(recorder.sequence_at(0.0))
+            recorder.record(live(10, 5))
+            recorder.record(live(13, 5))
+            self.assertEqual(len(recorder), 8)
+            self.assertEqual(recorder.duration, 48.0)
+            self.assertEqual(recorder.sequence_at(0.0), 10)
+            self.assertEqual(recorder.sequence_at(13.0), 12)
+            self.assertEqual(recorder.sequence_at(1000.0), 17)
+            t = datetime(2021, 6, 1, 0, 1, 20, tzinfo=timezone.utc)
+            self.assertEqual(recorder.sequence_at(t), 13)
+            self.assertIsNone(recorder.sequence_at(
+                datetime(2021, 5, 1, tzinfo=timezone.utc)))
+
+            window = recorder.live_window(15)
+            self.assertEqual(window.first_sequence_number, 15)
+            self.assertIsNone(window.end_list)
+            self.assertEqual(
+                window.media_segments[0].program_date_time.date_time,
+                datetime(2021, 6, 1, 0, 1, 30, tzinfo=timezone.utc))
+
+    def test_gap(self):
+        with ChannelRecorder(self.path) as recorder:
+            recorder.record(live(10, 3, discontinuity_sequence=4))
+            recorder.record(live(20, 3, discontinuity_sequence=4))
+            self.assertEqual(recorder.gaps, 1)
+            window = recorder.window()
+            self.assertEqual(window.discontinuity_sequence.number, 4)
+            self.assertIsNotNone(window.media_segments[3].discontinuity)
+            self.assertEqual(recorder.window(21).discontinuity_sequence
+                             .number, 5)
+
+    def test_reset(self):
+        with ChannelRecorder(self.path) as recorder:
+            recorder.record(live(10, 3))
+            # A stale reload is not a reset
+            self.assertEqual(recorder.record(live(9, 3)), 0)
+            restarted = live(0, 2)
+            for i, s in enumerate(restarted.media_segments):
+                s.uri = f'restart{i}.ts'
+            self.assertEqual(recorder.record(restarted), 2)
+            self.assertEqual(recorder.resets, 1)
+            self.assertEqual(recorder.gaps, 0)
+            self.assertEqual(recorder.next_sequence_number, 15)
+            window = recorder.window(13)
+            self.assertIsNotNone(window.media_segments[0].discontinuity)
+            self.assertEqual(window.media_segments[0].uri, 'restart0.ts')
+            self.assertEqual(recorder.window(14).discontinuity_sequence
+                             .number, 1)
+            self.assertEqual(recorder.record(restarted), 0)
+        with ChannelRecorder(self.path) as recorder:
+            restarted.media_segments[1:] = []
+            self.assertEqual(recorder.record(restarted), 0)
+            self.assertEqual(recorder.resets, 0)
+
+    def test_reopen(self):
+        with ChannelRecorder(self.path) as recorder:
+            recorder.record(live(10, 5))
+        with ChannelRecorder(self.path) as recorder:
+            self.assertEqual(len(recorder), 5)
+            self.assertEqual(recorder.next_sequence_number, 15)
+            self.assertEqual(recorder.record(live(12, 5)), 2)
+            expected = recorder.window().dumps()
+
+        # Lost index entries and a torn record
+        journal = os.path.join(self.path, ChannelRecorder.journal_name)
+        index = os.path.join(self.path, ChannelRecorder.index_name)
+        os.truncate(index, os.path.getsize(index) - 50)
+        with open(journal, 'ab') as f:
+            f.write(b'\x40\x00')
+        with ChannelRecorder(self.path) as recorder:
+            self.assertEqual(len(recorder), 7)
+            self.assertEqual(recorder.window().dumps(), expected)
+            self.assertEqual(recorder.record(live(17, 1)), 1)
+
+        with open(journal, 'r+b') as f:
+            f.write(b'NOTAJRNL')
+        with self.assertRaises(RecorderError):
+            ChannelRecorder(self.path)
+
+    def test_run(self):
+        bodies = [live(0, 3).dumps(), live(1, 3).dumps(),
+                  live(2, 3).dumps() + '#EXT-X-ENDLIST\n']
+
+        def handler(path, query):
+            if len(server.requests) == 2:
+                return 500, b''
+            return 200, bodies[min(len(server.requests), 4) // 2].encode()
+
+        stop = threading.Event()
+        timer = threading.Timer(10, stop.set)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        with StandInServer(handler) as server:
+            with ChannelRecorder(self.path, server.url + '/live.m3u8',
+                                 timeout=5) as recorder:
+                recorder.reload_delay = lambda appended: 0.01
+                recorder.run(stop)
+                self.assertFalse(stop.is_set())
+                self.assertEqual(recorder.errors, 1)
+                self.assertEqual(len(recorder), 5)
+                self.assertIsNotNone(recorder.window().end_list)
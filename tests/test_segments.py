@@ -0,0 +1,86 @@
+import unittest
+
+from m3u8 import tag
+from m3u8.constant import EncryptionMethod
+from m3u8.playlist import MediaPlaylist
+from m3u8.segments import SegmentRope, Span, Spans, Timeline
+
+from . import playlist as test_playlist
+
+
+class TestSegmentRope(unittest.TestCase):
+
+    def test_slice(self):
+        base = list(range(10))
+        rope = SegmentRope.of(base, 2, 8)
+        self.assertEqual(list(rope), [2, 3, 4, 5, 6, 7])
+        self.assertEqual(rope[-1], 7)
+        sub = rope[1:4]
+        self.assertIsInstance(sub, SegmentRope)
+        self.assertEqual(list(sub), [3, 4, 5])
+        self.assertEqual(sub.pieces, [(base, 3, 6)])
+        self.assertEqual(rope[::2], [2, 4, 6])
+        with self.assertRaises(IndexError):
+            rope[6]
+
+    def test_concat(self):
+        a, b = list(range(5)), list(range(100, 105))
+        rope = SegmentRope.of(a, 0, 3) + b + SegmentRope.of(a, 3)
+        self.assertEqual(list(rope), [0, 1, 2, 100, 101, 102, 103, 104, 3, 4])
+        self.assertEqual(len(rope.pieces), 3)
+        self.assertEqual(list(rope[2:9]), [2, 100, 101, 102, 103, 104, 3])
+        self.assertEqual(rope[8], 3)
+        rope = SegmentRope.of(a, 0, 2) + SegmentRope.of(a, 2)
+        self.assertEqual(len(rope.pieces), 1)
+
+
+class TestTimeline(unittest.TestCase):
+
+    def test_timeline(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        t = Timeline(p.media_segments)
+        self.assertEqual(t.duration, 58.0)
+        self.assertEqual(t.index_at(0), 0)
+        self.assertEqual(t.index_at(29.9), 2)
+        self.assertEqual(t.index_at(30), 3)
+        self.assertEqual(t.index_at(100), 5)
+        self.assertEqual(t.discontinuities_before(3), 0)
+        self.assertEqual(t.discontinuities_before(4), 1)
+        self.assertEqual(t.program_date_time(4).isoformat(),
+                         '2021-06-01T00:00:38+00:00')
+        self.assertEqual(t.program_date_time(5).isoformat(),
+                         '2021-06-01T01:00:00+00:00')
+
+
+class TestSpans(unittest.TestCase):
+
+    def test_of(self):
+        spans = Spans.of([1, 1, None, None, 2, 1], lambda v: v)
+        self.assertEqual(list(spans), [
+            Span(0, 2, 1), Span(2, 4, None), Span(4, 5, 2), Span(5, 6, 1)])
+        self.assertEqual(spans.at(3), None)
+        self.assertEqual(spans.at(4), 2)
+        self.assertEqual(spans.values(), [1, 2])
+        self.assertEqual(list(spans.indexes_of(1)), [0, 1, 5])
+        self.assertEqual(spans.spans_of(3), [])
+        for i in [-1, 6]:
+            with self.assertRaises(IndexError):
+                spans.at(i)
+        self.assertEqual(len(Spans.of([], lambda v: v)), 0)
+
+    def test_playlist(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        self.assertEqual(
+            [(s.start, s.stop, s.value.uri) for s in p.key_spans], [
+                (0, 2, 'https://example.com/key1'),
+                (2, 6, 'https://example.com/key2')])
+        key2 = tag.Key(EncryptionMethod.AES_128,
+                       uri='https://example.com/key2')
+        self.assertEqual([s.uri for s in p.segments_with_key(key2)],
+                         ['seg502.ts', 'seg503.ts', 'seg504.ts', 'seg505.ts'])
+        self.assertEqual(list(p.segments_with_key(None)), [])
+        self.assertEqual(list(p.map_spans), [Span(0, 6, None)])
+        self.assertEqual(list(p.discontinuity_spans), [
+            Span(0, 3, 0), Span(3, 5, 1), Span(5, 6, 2)])
+        self.assertEqual(p.window(4).discontinuity_spans.at(0), 1)
+        self.assertEqual(p.window(5).discontinuity_spans.at(0), 2)
@@ -0,0 +1,51 @@
+import unittest
+
+from m3u8 import constant
+from m3u8.playlist import MasterPlaylist
+from m3u8.selection import codec_families
+
+from . import playlist as test_playlist
+
+
+class TestCodecFamilies(unittest.TestCase):
+
+    def test_codec_families(self):
+        self.assertEqual(codec_families('avc1.4d401e, mp4a.40.2'),
+                         frozenset(['avc1', 'mp4a']))
+        self.assertEqual(codec_families(None), frozenset())
+
+
+class TestVariantIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.playlist = MasterPlaylist.from_str(test_playlist.MASTER_ABR)
+
+    def best_uri(self, **kwargs):
+        v = self.playlist.best_variant(**kwargs)
+        return None if v is None else v.uri
+
+    def test_bandwidth(self):
+        self.assertEqual(self.best_uri(), 'avc-1080.m3u8')
+        self.assertEqual(self.best_uri(max_bandwidth=2400000),
+                         'hevc-720.m3u8')
+        self.assertEqual(self.best_uri(max_bandwidth=800000),
+                         'avc-360.m3u8')
+        self.assertIsNone(self.best_uri(max_bandwidth=100000))
+
+    def test_filters(self):
+        self.assertEqual(self.best_uri(max_height=720), 'avc-720.m3u8')
+        self.assertEqual(
+            self.best_uri(max_bandwidth=2400000, codecs=['avc1', 'mp4a']),
+            'avc-360.m3u8')
+        self.assertEqual(self.best_uri(max_frame_rate=30.0,
+                                       hdcp_level=constant.HdcpLevel.NONE),
+                         'avc-720.m3u8')
+        self.assertEqual(
+            self.best_uri(hdcp_level=constant.HdcpLevel.TYPE_0),
+            'avc-1080.m3u8')
+
+    def test_rendition_groups(self):
+        index = self.playlist.variant_index
+        group = index.rendition_groups[('aac', constant.MediaType.AUDIO)]
+        self.assertEqual(len(group.renditions), 2)
+        self.assertTrue(all(v.audio is group for v in index.variants))
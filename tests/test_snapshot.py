@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from m3u8 import snapshot
+from m3u8.playlist import (
+    MasterPlaylist, MediaPlaylist, Playlist, PlaylistError)
+
+from . import playlist as test_playlist
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def assertSegmentsEqual(self, a, b):
+        self.assertEqual(len(a), len(b))
+        for x, y in zip(a, b):
+            self.assertEqual(x.__dict__, y.__dict__)
+
+    def test_media(self):
+        for s in [test_playlist.SIMPLE, test_playlist.ENCRYPTED,
+                  test_playlist.FRAGMENTED, test_playlist.LOW_LATENCY]:
+            p = MediaPlaylist.from_str(s)
+            q = MediaPlaylist.from_snapshot(p.to_snapshot())
+            self.assertSegmentsEqual(p.media_segments, q.media_segments)
+            self.assertEqual(p.target_duration, q.target_duration)
+            self.assertEqual(p.media_sequence, q.media_sequence)
+            self.assertEqual(p.end_list, q.end_list)
+            self.assertEqual(p.pending_parts, q.pending_parts)
+
+    def test_shared_tags(self):
+        p = MediaPlaylist.from_str(test_playlist.ENCRYPTED)
+        q = MediaPlaylist.from_snapshot(p.to_snapshot(), lazy=False)
+        segments = q.media_segments
+        self.assertIs(segments[0].key, segments[2].key)
+        self.assertIsNot(segments[2].key, segments[3].key)
+
+    def test_master(self):
+        p = MasterPlaylist.from_str(test_playlist.MASTER)
+        q = Playlist.from_snapshot(p.to_snapshot())
+        self.assertIsInstance(q, MasterPlaylist)
+        self.assertEqual(
+            [v.info for v in p.variant_streams],
+            [v.info for v in q.variant_streams])
+        with self.assertRaises(PlaylistError):
+            MediaPlaylist.from_snapshot(p.to_snapshot())
+
+    def test_file(self):
+        p = MediaPlaylist.from_str(test_playlist.FRAGMENTED)
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, 'index.snap')
+            with open(path, 'wb') as f:
+                f.write(p.to_snapshot())
+            q = MediaPlaylist.from_snapshot_file(path)
+            self.assertSegmentsEqual(p.media_segments, q.media_segments)
+            del q
+
+            with snapshot.SnapshotFile(path) as f:
+                q = f.playlist
+                self.assertEqual(q.media_segments[1].uri,
+                                 p.media_segments[1].uri)
+            self.assertTrue(f.closed)
+            self.assertSegmentsEqual(p.media_segments, q.media_segments)
+            f.close()
+
+            # Columns built from the mapping are released on close
+            with snapshot.SnapshotFile(path) as f:
+                q = f.playlist
+                self.assertEqual(q.key_spans.values(), p.key_spans.values())
+                self.assertEqual(q.fingerprints, p.fingerprints)
+                self.assertEqual(q.timeline.duration, p.timeline.duration)
+                self.assertEqual(len(q.map_spans), len(p.map_spans))
+            self.assertEqual(q.fingerprints, p.fingerprints)
+
+    def test_invalid(self):
+        with self.assertRaises(PlaylistError):
+            Playlist.from_snapshot(b'#EXTM3U\n')
@@ -1,3 +1,5 @@
+import random
+import timeit
 import unittest
 
 from dateutil.parser import isoparse as iso8601_parse
@@ -24,6 +26,10 @@ class TestExtInf(unittest.TestCase):
         self.assertEqual(e.duration, 123)
         self.assertIsNone(e.title)
 
+        e = tag.ExtInf.loads('#EXTINF:10,Hello, world')
+        self.assertEqual(e.title, 'Hello, world')
+        self.assertEqual(e.dumps(), '#EXTINF:10.0,Hello, world')
+
 
 class TestByteRange(unittest.TestCase):
 
@@ -56,6 +62,16 @@ class TestKey(unittest.TestCase):
         self.assertIsNone(k.key_format)
         self.assertIsNone(k.key_format_versions)
 
+        k = tag.Key.loads(f'#EXT-X-KEY:METHOD=AES-128,URI="{uri}",IV=0x1F')
+        self.assertEqual(k.iv, 31)
+
+    def test_dumps(self):
+        line = '#EXT-X-KEY:METHOD=AES-128,URI="k.bin",' \
+            'IV=0x0000000000000000000000000000001f'
+        self.assertEqual(tag.Key.loads(line).dumps(), line)
+        self.assertEqual(tag.Key(constant.EncryptionMethod.NONE).dumps(),
+                         '#EXT-X-KEY:METHOD=NONE')
+
 
 class TestMap(unittest.TestCase):
 
@@ -197,3 +213,137 @@ class TestStart(unittest.TestCase):
         s = tag.Start.loads('#EXT-X-START:TIME-OFFSET=1000,PRECISE=YES')
         self.assertEqual(s.time_offset, 1000)
         self.assertEqual(s.precise, constant.YesNo.YES)
+
+
+class TestServerControl(unittest.TestCase):
+
+    def test_loads(self):
+        s = tag.ServerControl.loads(
+            '#EXT-X-SERVER-CONTROL:CAN-BLOCK-RELOAD=YES,HOLD-BACK=12.0')
+        self.assertEqual(s.can_block_reload, constant.Yes.YES)
+        self.assertEqual(s.hold_back, 12.0)
+        self.assertIsNone(s.can_skip_until)
+
+
+class TestPart(unittest.TestCase):
+
+    def test_loads(self):
+        p = tag.Part.loads(
+            '#EXT-X-PART:DURATION=0.5,URI="part.mp4",INDEPENDENT=YES')
+        self.assertEqual(p.duration, 0.5)
+        self.assertEqual(p.uri, 'part.mp4')
+        self.assertEqual(p.independent, constant.Yes.YES)
+        self.assertIsNone(p.gap)
+
+
+class TestPreloadHint(unittest.TestCase):
+
+    def test_loads(self):
+        p = tag.PreloadHint.loads(
+            '#EXT-X-PRELOAD-HINT:TYPE=MAP,URI="init.mp4",'
+            'BYTERANGE-START=100')
+        self.assertEqual(p.type, constant.PreloadHintType.MAP)
+        self.assertEqual(p.byte_range_start, 100)
+
+
+class TestSkip(unittest.TestCase):
+
+    def test_loads(self):
+        s = tag.Skip.loads('#EXT-X-SKIP:SKIPPED-SEGMENTS=10')
+        self.assertEqual(s.skipped_segments, 10)
+
+
+class TestDumps(unittest.TestCase):
+
+    def test_round_trip(self):
+        tags = {t.name: t for t in tag.all_tags}
+        for line in [
+                '#EXT-X-VERSION:7',
+                '#EXTINF:9.009,',
+                '#EXTINF:10.0,Title',
+                '#EXT-X-BYTERANGE:1234@20',
+                '#EXT-X-BYTERANGE:321',
+                '#EXT-X-DISCONTINUITY',
+                '#EXT-X-MAP:URI="init.mp4",BYTERANGE="720@0"',
+                '#EXT-X-PROGRAM-DATE-TIME:2021-06-01T00:00:00.125Z',
+                '#EXT-X-PROGRAM-DATE-TIME:2021-06-01T00:00:00.000125+08:00',
+                '#EXT-X-DATERANGE:ID="ad",'
+                'START-DATE="2021-06-01T00:00:00.000Z",DURATION=30.0',
+                '#EXT-X-PLAYLIST-TYPE:VOD',
+                '#EXT-X-MEDIA:TYPE=CLOSED-CAPTIONS,GROUP-ID="cc",NAME="En",'
+                'INSTREAM-ID="CC1"',
+                '#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,'
+                'FRAME-RATE=29.97,CLOSED-CAPTIONS=NONE',
+                '#EXT-X-START:TIME-OFFSET=-12.5,PRECISE=YES',
+                '#EXT-X-SKIP:SKIPPED-SEGMENTS=10']:
+            t = tags[line.partition(':')[0]]
+            self.assertEqual(t.loads(line).dumps(), line)
+
+    def test_format_float(self):
+        self.assertEqual(tag.format_float(10), '10.0')
+        self.assertEqual(tag.format_float(1e-05), '0.00001')
+
+
+def reference_split_kv(s):
+    """Character by character split, as RFC 8216 describes it
+    """
+    result, name, value = [], None, ''
+    quoted = False
+    for c in s:
+        if name is None:
+            if c == '=':
+                name = value
+                value = ''
+            elif c.isupper() or c.isdigit() or c == '-':
+                value += c
+            else:
+                raise tag.ParseError('Invalid attribute name')
+        elif c == ',' and not quoted:
+            result.append((name, value.strip()))
+            name, value = None, ''
+        else:
+            if c == '"':
+                quoted = not quoted
+            value += c
+    if name is not None:
+        result.append((name, value))
+    return result
+
+
+class TestSplitKV(unittest.TestCase):
+
+    def test_split(self):
+        self.assertEqual(
+            tag.split_kv('A=1,B="x,y",C-2=0x1F,D= " a ",E=1'),
+            [('A', '1'), ('B', '"x,y"'), ('C-2', '0x1F'), ('D', '" a "'),
+             ('E', '1')])
+        self.assertEqual(tag.split_kv('A="x,y'), [('A', '"x,y')])
+        self.assertEqual(tag.split_kv('A=1,'), [('A', '1')])
+        with self.assertRaises(tag.ParseError):
+            tag.split_kv('A=1,b=2')
+
+    def test_random(self):
+        pieces = ['A', 'B-1', '=', '"', ',', ' ', 'x', 'a', '\u00c9', '""',
+                  '"a,b"']
+        rnd = random.Random(0)
+
+        def split(f, s):
+            try:
+                return f(s)
+            except tag.ParseError as e:
+                return e.message
+
+        for _ in range(20000):
+            s = ''.join(rnd.choice(pieces)
+                        for _ in range(rnd.randint(0, 10)))
+            self.assertEqual(split(tag.split_kv, s),
+                             split(reference_split_kv, s), s)
+
+    def test_linear(self):
+        def seconds(n):
+            s = ','.join([f'A{i}="{"x," * i}"' for i in range(n)])
+            return min(timeit.repeat(lambda: tag.split_kv(s), number=1,
+                                     repeat=5))
+
+        # Quadratic time would take 16 times as long
+        self.assertLess(seconds(1600), 10 * seconds(400) + 0.05)
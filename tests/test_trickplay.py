@@ -0,0 +1,132 @@
+import timeit
+import unittest
+
+from m3u8.playlist import MasterPlaylist, MediaPlaylist
+from m3u8.trickplay import IFrameTrack, TrickPlayIndex
+
+from . import playlist as test_playlist
+
+
+class TestIFrameTrack(unittest.TestCase):
+
+    def setUp(self):
+        self.playlist = MediaPlaylist.from_str(test_playlist.I_FRAMES)
+        self.track = IFrameTrack(self.playlist)
+
+    def test_columns(self):
+        for p in (self.playlist,
+                  MediaPlaylist.from_snapshot(self.playlist.to_snapshot())):
+            track = IFrameTrack(p)
+            self.assertEqual(list(track.times),
+                             [0.0, 2.0, 4.0, 6.5, 8.0, 12.0, 14.0])
+            self.assertEqual(list(track.offsets),
+                             [376, 121080, 376, 10716, 91744, -1])
+            self.assertEqual(list(track.lengths),
+                             [9400, 7144, 10340, 8460, 7708, -1])
+        with self.assertRaises(ValueError):
+            IFrameTrack(MediaPlaylist.from_str(test_playlist.SIMPLE))
+
+    def test_lookup(self):
+        track = self.track
+        self.assertEqual(len(track), 6)
+        frame = track.nearest(7.2)
+        self.assertEqual((frame.index, frame.sequence, frame.time,
+                          frame.duration), (3, 13, 6.5, 1.5))
+        self.assertEqual((frame.uri, frame.offset, frame.length),
+                         ('segment2.ts', 10716, 8460))
+        self.assertEqual(track.nearest(1.0).index, 0)
+        self.assertEqual(track.nearest(-5.0).index, 0)
+        self.assertEqual(track.nearest(100.0).index, 5)
+        self.assertIsNone(track.nearest(100.0).offset)
+        self.assertEqual(track.next(4.0).index, 3)
+        self.assertEqual(track.next(3.9).index, 2)
+        self.assertIsNone(track.next(12.0))
+        self.assertEqual(track.previous(4.0).index, 1)
+        self.assertEqual(track.previous(4.1).index, 2)
+        self.assertIsNone(track.previous(0.0))
+
+    def test_plan(self):
+        track = self.track
+        frames = [track.frame(i) for i in (4, 2, 3, 0, 2)]
+        requests = track.plan(frames)
+        self.assertEqual([(r.uri, r.range, [f.index for f in r.frames])
+                          for r in requests],
+                         [('segment1.ts', 'bytes=376-9775', [0]),
+                          ('segment2.ts', 'bytes=376-19175', [2, 3]),
+                          ('segment2.ts', 'bytes=91744-99451', [4])])
+        requests = track.plan(frames, max_gap=1 << 20)
+        self.assertEqual([r.length for r in requests], [9400, 99452 - 376])
+        requests = track.plan(frames, max_gap=1 << 20, max_request=20000)
+        self.assertEqual(len(requests), 3)
+
+        body = bytes(range(256)) * 100
+        request = track.plan([track.frame(2), track.frame(3)])[0]
+        self.assertEqual(request.extract(body[376:19176]),
+                         [body[376:10716], body[10716:19176]])
+
+        frames, requests = track.sprite(7)
+        self.assertEqual([f.index for f in frames], [0, 1, 2, 3, 4, 4, 5])
+        self.assertEqual(requests[-1].range, None)
+        self.assertEqual(requests[-1].extract(b'ts'), [b'ts'])
+        self.assertEqual(sum(len(r.frames) for r in requests), 6)
+
+    def test_large(self):
+        lines = ['#EXTM3U', '#EXT-X-VERSION:4', '#EXT-X-TARGETDURATION:2',
+                 '#EXT-X-I-FRAMES-ONLY']
+        for i in range(100000):
+            lines += ['#EXTINF:2.0,', f'#EXT-X-BYTERANGE:1000@{i * 5000}',
+                      f'segment{i // 100}.ts']
+        p = MediaPlaylist.from_str('\n'.join(lines) + '\n')
+
+        def run():
+            track = IFrameTrack(p)
+            nearest = [track.nearest(i * 200.0 + 0.5) for i in range(1000)]
+            return nearest, track.sprite(100, max_gap=1 << 20)
+
+        results = []
+        # The fastest of a few runs, with room for slow machines
+        self.assertLess(min(timeit.repeat(
+            lambda: results.append(run()), number=1, repeat=3)), 5.0)
+        nearest, (frames, requests) = results[-1]
+        self.assertEqual([f.index for f in nearest],
+                         [i * 100 for i in range(1000)])
+        self.assertEqual(len(frames), 100)
+        self.assertEqual(len(requests), 100)
+
+
+class TestTrickPlayIndex(unittest.TestCase):
+
+    def test_from_master(self):
+        master = MasterPlaylist.from_str(test_playlist.MASTER_I_FRAMES)
+        master.base_uri = 'http://example.com/'
+        loaded = []
+
+        def load(uri):
+            loaded.append(uri)
+            p = MediaPlaylist.from_str(test_playlist.I_FRAMES)
+            p.base_uri = uri
+            return p
+
+        index = TrickPlayIndex.from_master(master, load)
+        self.assertEqual(loaded, ['http://example.com/low-iframes.m3u8',
+                                  'http://example.com/mid-iframes.m3u8'])
+        self.assertEqual(len(index.tracks), 2)
+        self.assertEqual(index.track('mid-iframes.m3u8').nearest(5.0).uri,
+                         'http://example.com/segment2.ts')
+
+        low, mid = [v.info for v in master.variant_streams]
+        self.assertIs(index.for_variant(low),
+                      index.track('low-iframes.m3u8'))
+        self.assertIs(index.for_variant(mid),
+                      index.track('mid-iframes.m3u8'))
+        mid.resolution = None
+        self.assertIs(index.for_variant(mid),
+                      index.track('mid-iframes.m3u8'))
+        mid.bandwidth = 1000
+        self.assertIs(index.for_variant(mid),
+                      index.track('low-iframes.m3u8'))
+        index.remove('low-iframes.m3u8')
+        self.assertIs(index.for_variant(low),
+                      index.track('mid-iframes.m3u8'))
+        index.remove('mid-iframes.m3u8')
+        self.assertIsNone(index.for_variant(low))
@@ -0,0 +1,99 @@
+import random
+import unittest
+from urllib.parse import urljoin
+
+from m3u8.cache import PlaylistCache
+from m3u8.playlist import MasterPlaylist, MediaPlaylist
+from m3u8.uri import URIResolver
+
+from . import playlist as test_playlist
+from .server import StandInServer
+
+
+BASES = [
+    'http://a/b/c/d;p?q',
+    'https://cdn.example.com/live/index.m3u8?token=1#t',
+    'http://a',
+    'http://u@a:80//b/',
+    'HTTP://A/B/c.m3u8',
+    '',
+    '/local/x.m3u8',
+    'file:///tmp/x.m3u8',
+    'data:abc',
+    'http://[::1]:8080/x/y',
+]
+
+URIS = [
+    'seg1.ts', 'a/seg.ts?t=a:b', '../seg.ts', './a', '.', '..', 'a/',
+    'a//b', '/abs/seg.ts', '/', '//other/x', 'http://a/x', 'HTTP://a/x',
+    'https://b/y?', 'http:x', 'http:///x', 'skd://key', 'data:,hi', '?q',
+    '#f', '', ' seg.ts', 'seg;p.ts', 'C:\\x', 'http://[x/y', 'seg\u00e9.ts',
+]
+
+PIECES = [
+    'a', '/', '.', '..', '?', '#', ';', ':', 'x=1', '%20', ' ', '\t', '[',
+    ']', '@', '\\', '\u00e9', 'http:', 'https://', 'HTTP://', '//',
+    'seg.ts',
+]
+
+
+def urljoin_or_error(base, uri):
+    try:
+        return urljoin(base, uri)
+    except ValueError:
+        return ValueError
+
+
+class TestURIResolver(unittest.TestCase):
+
+    def assertMatchesUrljoin(self, base, uris):
+        r = URIResolver(base)
+        for uri in uris:
+            try:
+                resolved = r.resolve(uri)
+            except ValueError:
+                resolved = ValueError
+            self.assertEqual(resolved, urljoin_or_error(base, uri),
+                             (base, uri))
+
+    def test_cases(self):
+        for base in BASES:
+            self.assertMatchesUrljoin(base, URIS)
+
+    def test_random(self):
+        rnd = random.Random(0)
+        uris = [''.join(rnd.choice(PIECES)
+                        for _ in range(rnd.randint(1, 6)))
+                for _ in range(2000)]
+        for base in BASES:
+            self.assertMatchesUrljoin(base, uris)
+
+
+class TestResolvedURIs(unittest.TestCase):
+
+    def test_from_url(self):
+        body = test_playlist.MASTER.encode()
+        with StandInServer(lambda path, query: (200, body)) as server:
+            url = server.url + '/hls/master.m3u8'
+            p = MasterPlaylist.from_url(url)
+            self.assertEqual(p.base_uri, url)
+            self.assertEqual(p.resolved_uris(), [
+                urljoin(url, v.uri) for v in p.variant_streams])
+            self.assertIs(p.resolved_uris(), p.resolved_uris())
+
+            cache = PlaylistCache()
+            p = MasterPlaylist.from_url(url, cache=cache)
+            self.assertEqual(p.base_uri, url)
+            q = MasterPlaylist.from_bytes(body, cache=cache)
+            self.assertIsNone(q.base_uri)
+
+    def test_resolve(self):
+        p = MediaPlaylist.from_str(test_playlist.DVR)
+        self.assertEqual(p.resolved_uris()[0], 'seg500.ts')
+        p.base_uri = 'https://example.com/live/index.m3u8'
+        self.assertEqual(p.resolved_uris()[0],
+                         'https://example.com/live/seg500.ts')
+        self.assertEqual(p.resolve(p.media_segments[0].key.uri),
+                         'https://example.com/key1')
+        self.assertEqual(p.window(2).resolved_uris()[0],
+                         'https://example.com/live/seg502.ts')
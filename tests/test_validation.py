@@ -0,0 +1,127 @@
+import timeit
+import unittest
+
+from m3u8.playlist import MasterPlaylist, MediaPlaylist
+from m3u8.validation import RULES
+
+from . import playlist as test_playlist
+
+
+def media(lines, version=None, target=10):
+    head = ['#EXTM3U', f'#EXT-X-TARGETDURATION:{target}']
+    if version is not None:
+        head.append(f'#EXT-X-VERSION:{version}')
+    return MediaPlaylist.from_str('\n'.join(head + lines) + '\n')
+
+
+class TestValidation(unittest.TestCase):
+
+    def assertViolations(self, p, rules, expected, **kwargs):
+        report = p.validate(**kwargs)
+        self.assertEqual(
+            [(v.rule, v.sequence) for v in report if v.rule in rules],
+            expected)
+
+    def test_fixtures(self):
+        for name in ['SIMPLE', 'LIVE', 'ENCRYPTED', 'FRAGMENTED',
+                     'LOW_LATENCY', 'LOW_LATENCY_DELTA', 'DVR', 'VENDOR']:
+            p = MediaPlaylist.from_str(getattr(test_playlist, name))
+            self.assertTrue(p.validate().valid, name)
+            snapshot = MediaPlaylist.from_snapshot(p.to_snapshot())
+            self.assertTrue(snapshot.validate().valid, name)
+        for name in ['MASTER', 'MASTER_ABR', 'REDUNDANT']:
+            p = MasterPlaylist.from_str(getattr(test_playlist, name))
+            self.assertTrue(p.validate().valid, name)
+
+    def test_target_duration(self):
+        p = media(['#EXTINF:10.49,', 'a.ts', '#EXTINF:10.5,', 'b.ts',
+                   '#EXTINF:12,', 'c.ts'], version=3)
+        self.assertViolations(p, {'target-duration'},
+                              [('target-duration', 1),
+                               ('target-duration', 2)])
+
+    def test_version(self):
+        p = media(['#EXT-X-BYTERANGE:100@0', '#EXTINF:9.5,', 'a.ts'])
+        report = p.validate(rules=['version'])
+        self.assertEqual(sorted(v.message for v in report), [
+            'BYTERANGE requires VERSION 4, found 1',
+            'floating-point EXTINF requires VERSION 3, found 1'])
+        p = media(['#EXT-X-MAP:URI="init.mp4"', '#EXTINF:9,', 'a.mp4'],
+                  version=5)
+        self.assertEqual([v.message for v in p.validate(rules=['version'])],
+                         ['MAP requires VERSION 6, found 5'])
+        p = media(['#EXT-X-KEY:METHOD=AES-128,URI="k",IV=0x1',
+                   '#EXTINF:9,', 'a.ts'])
+        self.assertEqual(
+            [v.message for v in p.validate(rules=['version'])],
+            ['IV in KEY requires VERSION 2, found 1'])
+
+    def test_byte_range(self):
+        lines = ['#EXT-X-BYTERANGE:100', '#EXTINF:9,', 'a.ts',
+                 '#EXT-X-BYTERANGE:100', '#EXTINF:9,', 'a.ts',
+                 '#EXT-X-BYTERANGE:100', '#EXTINF:9,', 'b.ts',
+                 '#EXTINF:9,', 'c.ts',
+                 '#EXT-X-BYTERANGE:100', '#EXTINF:9,', 'c.ts']
+        p = media(lines, version=4)
+        expected = [('byte-range', 0), ('byte-range', 2),
+                    ('byte-range', 4)]
+        self.assertViolations(p, {'byte-range'}, expected)
+        snapshot = MediaPlaylist.from_snapshot(p.to_snapshot())
+        self.assertViolations(snapshot, {'byte-range'}, expected)
+
+    def test_parts(self):
+        p = MediaPlaylist.from_str(test_playlist.LOW_LATENCY)
+        p.part_inf.part_target = 0.1
+        report = p.validate(rules=['parts'])
+        self.assertFalse(report.valid)
+        self.assertEqual(report.counts['parts'], sum(
+            len(s.parts) for s in p.media_segments) + len(p.pending_parts))
+
+    def test_discontinuity_sequence(self):
+        lines = ['#EXT-X-MEDIA-SEQUENCE:{}',
+                 '#EXT-X-DISCONTINUITY-SEQUENCE:{}',
+                 '#EXTINF:9,', 'a.ts', '#EXT-X-DISCONTINUITY',
+                 '#EXTINF:9,', 'b.ts', '#EXTINF:9,', 'c.ts']
+
+        def version(msn, dsn):
+            return media([line.format(msn if 'MEDIA' in line else dsn)
+                          for line in lines])
+
+        previous = version(10, 3)
+        self.assertTrue(version(11, 3).validate(previous=previous).valid)
+        self.assertTrue(version(12, 4).validate(previous=previous).valid)
+        self.assertViolations(version(12, 3), {'discontinuity-sequence'},
+                              [('discontinuity-sequence', None)],
+                              previous=previous)
+        self.assertViolations(version(9, 3), {'discontinuity-sequence'},
+                              [('discontinuity-sequence', None)],
+                              previous=previous)
+        self.assertTrue(version(20, 0).validate(previous=previous).valid)
+
+    def test_rules(self):
+        p = media(['#EXTINF:11,', 'a.ts'], version=3)
+        report = p.validate(rules=['version'])
+        self.assertTrue(report.valid)
+        self.assertEqual(list(report.counts), ['version'])
+        with self.assertRaises(ValueError):
+            p.validate(rules=['no-such-rule'])
+        self.assertEqual(set(p.validate().counts), {
+            name for name, r in RULES.items()
+            if r.playlist_type.value == 'MEDIA'})
+
+    def test_large(self):
+        lines = ['#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:6']
+        for i in range(100000):
+            lines.append('#EXTINF:6.006,')
+            lines.append(f'seg{i}.ts')
+        p = MediaPlaylist.from_str('#EXTM3U\n' + '\n'.join(lines) + '\n')
+        snapshot = MediaPlaylist.from_snapshot(p.to_snapshot())
+        for q in (p, snapshot):
+            reports = []
+            # The fastest of a few runs, with room for slow machines
+            self.assertLess(min(timeit.repeat(
+                lambda: reports.append(q.validate()), number=1, repeat=3)),
+                5.0)
+            report = reports[-1]
+            self.assertEqual(report.counts['target-duration'], 0)
+            self.assertIn('column.duration', report.timings)